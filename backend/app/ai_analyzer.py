@@ -1,12 +1,13 @@
-import json
-import re
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
-import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from .config import settings
+from .json_repair import PartialJSON, parse_analysis
+from .llm_cache import llm_cache
+from .llm_client import groq_client
 from .models import Incident, LogEntry
+from .prompt_builder import build_sections
 from .vector_store import RagMatch
 
 
@@ -45,13 +46,7 @@ def build_retrieval_query(incident: Incident, logs: List[LogEntry]) -> str:
 
 
 def _build_prompt(incident: Incident, logs: List[LogEntry], rag_matches: Optional[List[RagMatch]] = None) -> str:
-    log_lines = "\n".join(
-        f"[{log.timestamp.isoformat()}] {log.service} {log.level}: {log.message}" for log in logs[-50:]
-    )
-    rag_lines = "\n".join(
-        f"[score={match.score:.3f}] [{match.timestamp}] {match.service} {match.level}: {match.message}"
-        for match in (rag_matches or [])
-    )
+    log_lines, rag_lines = build_sections(logs, rag_matches)
     return (
         "You are an SRE assistant. Analyze the incident and produce STRICT JSON only.\n"
         "Use both the direct incident evidence and the retrieved historical context.\n"
@@ -76,13 +71,7 @@ def _build_prompt(incident: Incident, logs: List[LogEntry], rag_matches: Optiona
 
 def _build_log_selection_prompt(logs: List[LogEntry], rag_matches: Optional[List[RagMatch]] = None) -> str:
     services = sorted({log.service for log in logs})
-    log_lines = "\n".join(
-        f"[{log.timestamp.isoformat()}] {log.service} {log.level}: {log.message}" for log in logs[-50:]
-    )
-    rag_lines = "\n".join(
-        f"[score={match.score:.3f}] [{match.timestamp}] {match.service} {match.level}: {match.message}"
-        for match in (rag_matches or [])
-    )
+    log_lines, rag_lines = build_sections(logs, rag_matches)
     return (
         "You are an SRE assistant. Analyze the selected logs and produce STRICT JSON only.\n"
         "Use both the selected logs and the retrieved historical context.\n"
@@ -111,13 +100,6 @@ def _fix_prompt(raw_response: str) -> str:
     )
 
 
-def _extract_json(text: str) -> Dict[str, Any]:
-    match = re.search(r"\{.*\}", text, re.DOTALL)
-    if not match:
-        raise ValueError("No JSON object found")
-    return json.loads(match.group(0))
-
-
 def _extract_message_content(payload: Dict[str, Any]) -> str:
     choices = payload.get("choices")
     if not isinstance(choices, list) or not choices:
@@ -138,13 +120,8 @@ def _extract_message_content(payload: Dict[str, Any]) -> str:
     return str(content)
 
 
-@retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=1, max=4))
-async def _call_groq(prompt: str) -> str:
-    headers = {
-        "Authorization": f"Bearer {settings.groq_api_key}",
-        "Content-Type": "application/json",
-    }
-    payload = {
+def _payload(prompt: str) -> Dict[str, Any]:
+    return {
         "model": settings.groq_model,
         "messages": [
             {
@@ -154,51 +131,69 @@ async def _call_groq(prompt: str) -> str:
             {"role": "user", "content": prompt},
         ],
         "temperature": 0.2,
-        "response_format": {"type": "json_object"},
     }
 
-    async with httpx.AsyncClient(timeout=settings.ai_timeout) as client:
-        response = await client.post(
-            f"{settings.groq_base_url}/chat/completions",
-            headers=headers,
-            json=payload,
-        )
-        response.raise_for_status()
-        return _extract_message_content(response.json())
+
+@retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=1, max=4))
+async def _call_groq(prompt: str) -> str:
+    payload = {**_payload(prompt), "response_format": {"type": "json_object"}}
+    return _extract_message_content(await groq_client.chat(payload))
+
+
+@retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=1, max=4))
+async def _stream_groq(prompt: str, on_partial: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+    # Groq does not combine JSON mode with streaming; the prompt asks for
+    # JSON and parse_analysis repairs whatever comes back.
+    parser = PartialJSON()
+    summary = None
+    async for delta in groq_client.stream_chat(_payload(prompt)):
+        partial = parser.feed(delta)
+        if partial is None or on_partial is None:
+            continue
+        text = partial.get("summary")
+        if isinstance(text, str) and text != summary:
+            summary = text
+            try:
+                on_partial({"summary": summary})
+            except Exception:
+                pass
+    return parser.buffer
+
+
+async def _complete(prompt: str, on_partial: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    if settings.llm_stream:
+        raw = await _stream_groq(prompt, on_partial)
+    else:
+        raw = await _call_groq(prompt)
+    try:
+        return parse_analysis(raw)
+    except ValueError:
+        # Nothing recoverable locally; ask the model to restate it once
+        return parse_analysis(await _call_groq(_fix_prompt(raw or prompt)))
 
 
 async def analyze_incident(
     incident: Incident,
     logs: List[LogEntry],
     rag_matches: Optional[List[RagMatch]] = None,
+    force: bool = False,
+    on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
 ) -> Dict[str, Any]:
     if not settings.groq_api_key:
         return LLM_NOT_CONFIGURED
 
     prompt = _build_prompt(incident, logs, rag_matches=rag_matches)
-    raw = ""
-
-    try:
-        raw = await _call_groq(prompt)
-        return _extract_json(raw)
-    except Exception:
-        raw_fix = await _call_groq(_fix_prompt(raw or prompt))
-        return _extract_json(raw_fix)
+    return await llm_cache.get_or_compute(settings.groq_model, prompt, lambda: _complete(prompt, on_partial), force=force)
 
 
 async def analyze_log_selection(
     logs: List[LogEntry],
     rag_matches: Optional[List[RagMatch]] = None,
+    force: bool = False,
+    on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
 ) -> Dict[str, Any]:
     if not settings.groq_api_key:
         return LLM_NOT_CONFIGURED
 
     prompt = _build_log_selection_prompt(logs, rag_matches=rag_matches)
-    raw = ""
-
-    try:
-        raw = await _call_groq(prompt)
-        return _extract_json(raw)
-    except Exception:
-        raw_fix = await _call_groq(_fix_prompt(raw or prompt))
-        return _extract_json(raw_fix)
+    return await llm_cache.get_or_compute(settings.groq_model, prompt, lambda: _complete(prompt, on_partial), force=force)
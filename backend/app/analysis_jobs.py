@@ -0,0 +1,304 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from .ai_analyzer import (
+    analyze_incident,
+    analyze_log_selection,
+    build_log_selection_query,
+    build_retrieval_query,
+)
+from .config import settings
+from .db import engine
+from .models import AnalysisJob, Incident, LogEntry
+from .rag_retrieval import retrieve_context
+from .schemas import AnalysisJobRead, IncidentAnalyzeResponse, LogSelectionAnalyzeResponse
+from .vector_store import RagMatch
+
+
+def _load_incident(vector_store, incident_id: int) -> Optional[Tuple[Incident, List[LogEntry], List[RagMatch]]]:
+    with Session(engine) as session:
+        incident = session.get(Incident, incident_id)
+        if not incident:
+            return None
+        logs: List[LogEntry] = []
+        if incident.evidence_log_ids:
+            logs = list(session.exec(select(LogEntry).where(LogEntry.id.in_(incident.evidence_log_ids))).all())
+    # The vector lookup can wait on Qdrant, so it runs after the session is closed
+    rag_matches = retrieve_context(
+        vector_store,
+        query_text=build_retrieval_query(incident, logs),
+        services=incident.services,
+        exclude_ids=set(incident.evidence_log_ids or []),
+    )
+    return incident, logs, rag_matches
+
+
+def _save_incident(incident_id: int, result: Dict[str, Any]) -> Optional[IncidentAnalyzeResponse]:
+    with Session(engine) as session:
+        incident = session.get(Incident, incident_id)
+        if not incident:
+            return None
+        incident.ai_summary = result.get("summary")
+        incident.ai_root_cause = result.get("likely_root_cause")
+        incident.ai_confidence = result.get("confidence")
+        incident.ai_actions = result.get("recommended_actions", [])
+        incident.ai_related_signals = result.get("related_signals", [])
+        session.add(incident)
+        session.commit()
+        session.refresh(incident)
+        return IncidentAnalyzeResponse(
+            id=incident.id,
+            ai_summary=incident.ai_summary,
+            ai_root_cause=incident.ai_root_cause,
+            ai_confidence=incident.ai_confidence,
+            ai_actions=incident.ai_actions,
+            ai_related_signals=incident.ai_related_signals,
+            status=incident.status,
+        )
+
+
+def _load_logs(vector_store, log_ids: List[int]) -> Optional[Tuple[List[LogEntry], List[RagMatch]]]:
+    with Session(engine) as session:
+        logs = list(session.exec(select(LogEntry).where(LogEntry.id.in_(log_ids))).all())
+    if not logs:
+        return None
+    logs = sorted(logs, key=lambda log: log.timestamp)
+    rag_matches = retrieve_context(
+        vector_store,
+        query_text=build_log_selection_query(logs),
+        services={log.service for log in logs},
+        exclude_ids={log.id for log in logs if log.id is not None},
+    )
+    return logs, rag_matches
+
+
+PartialCallback = Callable[[Dict[str, Any]], None]
+
+
+async def run_incident_analysis(
+    vector_store,
+    incident_id: int,
+    force: bool = False,
+    on_partial: Optional[PartialCallback] = None,
+) -> Optional[IncidentAnalyzeResponse]:
+    """Analyze an incident and store the result on it; ``None`` if it does not exist.
+
+    Database work runs on a worker thread in short sessions, so no
+    connection is held while waiting on the LLM. ``on_partial`` receives
+    ``{"summary": ...}`` as the streamed completion grows.
+    """
+    loaded = await asyncio.to_thread(_load_incident, vector_store, incident_id)
+    if loaded is None:
+        return None
+    incident, logs, rag_matches = loaded
+    result = await analyze_incident(incident, logs, rag_matches=rag_matches, force=force, on_partial=on_partial)
+    return await asyncio.to_thread(_save_incident, incident_id, result)
+
+
+async def run_log_analysis(
+    vector_store,
+    log_ids: List[int],
+    force: bool = False,
+    on_partial: Optional[PartialCallback] = None,
+) -> Optional[LogSelectionAnalyzeResponse]:
+    """Analyze a selection of logs; ``None`` if none of them exist."""
+    loaded = await asyncio.to_thread(_load_logs, vector_store, log_ids)
+    if loaded is None:
+        return None
+    logs, rag_matches = loaded
+    result = await analyze_log_selection(logs, rag_matches=rag_matches, force=force, on_partial=on_partial)
+    return LogSelectionAnalyzeResponse(
+        summary=result.get("summary"),
+        likely_root_cause=result.get("likely_root_cause"),
+        confidence=result.get("confidence"),
+        recommended_actions=result.get("recommended_actions", []),
+        related_signals=result.get("related_signals", []),
+    )
+
+
+def job_to_event(job: AnalysisJob) -> Dict[str, Any]:
+    return AnalysisJobRead.model_validate(job, from_attributes=True).model_dump(mode="json")
+
+
+class AnalysisQueueFull(RuntimeError):
+    pass
+
+
+class AnalysisQueue:
+    """Runs AI analyses as background jobs on a bounded pool of workers.
+
+    Jobs are rows in ``analysisjob``, so a restart re-queues whatever was
+    still queued or running. ``ANALYSIS_WORKERS`` tasks on the event loop
+    take job ids from the queue; :meth:`submit` refuses new jobs once
+    ``ANALYSIS_QUEUE_SIZE`` are waiting. Every state change is published on
+    the log broadcaster as an ``analysis`` event, the summary streamed so
+    far as an ``analysis_partial`` event, and the job row can be polled
+    through ``/api/analysis/jobs/{id}``.
+    """
+
+    def __init__(self, vector_store, broadcaster=None, workers: Optional[int] = None, max_queue: Optional[int] = None) -> None:
+        self.vector_store = vector_store
+        self.broadcaster = broadcaster
+        self.workers = max(1, workers or settings.analysis_workers)
+        self.max_queue = max(1, max_queue or settings.analysis_queue_size)
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.recovered = 0
+        self.total_ms = 0.0
+
+    async def start(self) -> None:
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self._recover):
+            self.queue.put_nowait(job_id)
+            self.recovered += 1
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        tasks, self.tasks = self.tasks, []
+        for task in tasks:
+            task.cancel()
+        # Jobs cut off here stay "running" and are re-queued on the next start
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def submit(
+        self,
+        kind: str,
+        incident_id: Optional[int] = None,
+        log_ids: Optional[List[int]] = None,
+        force: bool = False,
+    ) -> AnalysisJob:
+        if self.queue is None or self.queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise AnalysisQueueFull("analysis queue is full")
+        job = await asyncio.to_thread(self._create, kind, incident_id, list(log_ids or []), force)
+        self.queue.put_nowait(job.id)
+        self.submitted += 1
+        self._publish(job)
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_capacity": self.max_queue,
+            "running": self.running,
+            "submitted": self.submitted,
+            "recovered": self.recovered,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_job_ms": round(self.total_ms / finished, 3) if finished else 0.0,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                pass
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: int) -> None:
+        job = await asyncio.to_thread(self._update, job_id, status="running", started_at=datetime.now(timezone.utc))
+        if job is None:
+            return
+        self._publish(job)
+
+        def on_partial(partial: Dict[str, Any]) -> None:
+            if self.broadcaster:
+                self.broadcaster.publish({"event": "analysis_partial", "data": {"job_id": job_id, **partial}})
+
+        self.running += 1
+        started = time.perf_counter()
+        try:
+            if job.kind == "incident":
+                response = await run_incident_analysis(
+                    self.vector_store, job.incident_id, force=job.force, on_partial=on_partial
+                )
+            else:
+                response = await run_log_analysis(self.vector_store, job.log_ids, force=job.force, on_partial=on_partial)
+            if response is None:
+                raise LookupError("Incident not found" if job.kind == "incident" else "Selected logs not found")
+            job = await asyncio.to_thread(
+                self._update,
+                job_id,
+                status="done",
+                result=response.model_dump(mode="json"),
+                finished_at=datetime.now(timezone.utc),
+            )
+            self.completed += 1
+        except Exception as exc:
+            job = await asyncio.to_thread(
+                self._update,
+                job_id,
+                status="failed",
+                error=str(exc) or type(exc).__name__,
+                finished_at=datetime.now(timezone.utc),
+            )
+            self.failed += 1
+        finally:
+            self.running -= 1
+            self.total_ms += (time.perf_counter() - started) * 1000
+        if job is not None:
+            self._publish(job)
+
+    def _publish(self, job: AnalysisJob) -> None:
+        if not self.broadcaster:
+            return
+        try:
+            self.broadcaster.publish({"event": "analysis", "data": job_to_event(job)})
+        except Exception:
+            pass
+
+    def _create(self, kind: str, incident_id: Optional[int], log_ids: List[int], force: bool) -> AnalysisJob:
+        with Session(engine) as session:
+            job = AnalysisJob(
+                kind=kind,
+                incident_id=incident_id,
+                log_ids=log_ids,
+                force=force,
+                created_at=datetime.now(timezone.utc),
+            )
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            return job
+
+    def _update(self, job_id: int, **values: Any) -> Optional[AnalysisJob]:
+        with Session(engine) as session:
+            job = session.get(AnalysisJob, job_id)
+            if job is None:
+                return None
+            for name, value in values.items():
+                setattr(job, name, value)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            return job
+
+    def _recover(self) -> List[int]:
+        with Session(engine) as session:
+            jobs = session.exec(
+                select(AnalysisJob).where(AnalysisJob.status.in_(["queued", "running"])).order_by(AnalysisJob.id)
+            ).all()
+            for job in jobs:
+                job.status = "queued"
+                job.started_at = None
+                session.add(job)
+            session.commit()
+            return [job.id for job in jobs]
@@ -1,11 +1,13 @@
-﻿import re
+﻿import threading
+from collections import deque
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
 
 from sqlmodel import Session, select
 
 from .models import LogEntry
+from .pattern_engine import SIGNATURE_PATTERNS, classify
 
 
 @dataclass
@@ -17,66 +19,211 @@ class DetectedIncident:
     evidence_log_ids: List[int]
 
 
-SIGNATURE_PATTERNS = [
-    (re.compile(r"db connection refused", re.IGNORECASE), "Database connection refused", "high"),
-    (re.compile(r"timeout", re.IGNORECASE), "Upstream timeout", "medium"),
-    (re.compile(r"out of memory|oom", re.IGNORECASE), "Out of memory", "high"),
-    (re.compile(r"address already in use|port .* in use", re.IGNORECASE), "Port binding failure", "high"),
+SIGNATURE_INCIDENTS = [
+    ("db_connection_refused", "Database connection refused", "high"),
+    ("timeout", "Upstream timeout", "medium"),
+    ("out_of_memory", "Out of memory", "high"),
+    ("port_in_use", "Port binding failure", "high"),
 ]
 
+RESTART_SIGNATURE = "restart"
 
-def detect_incidents(session: Session, window_minutes: int = 5) -> List[DetectedIncident]:
-    now = datetime.now(timezone.utc)
-    since = now - timedelta(minutes=window_minutes)
-    logs = session.exec(select(LogEntry).where(LogEntry.timestamp >= since)).all()
-
-    incidents: List[DetectedIncident] = []
-
-    # Error burst detection
-    error_logs: Dict[str, List[LogEntry]] = {}
-    for log in logs:
-        if log.level == "ERROR":
-            error_logs.setdefault(log.service, []).append(log)
-
-    for service, entries in error_logs.items():
-        if len(entries) >= 5:
-            incidents.append(
-                DetectedIncident(
-                    signature=f"error_burst:{service}",
-                    title=f"Error burst detected in {service}",
-                    severity="high" if len(entries) >= 10 else "medium",
-                    services=[service],
-                    evidence_log_ids=[e.id for e in entries[-20:]],
-                )
-            )
-
-    # Signature pattern detection
-    for pattern, title, severity in SIGNATURE_PATTERNS:
-        matched = [log for log in logs if pattern.search(log.message)]
-        if len(matched) >= 3:
-            services = sorted({log.service for log in matched})
-            incidents.append(
-                DetectedIncident(
-                    signature=f"sig:{pattern.pattern}",
-                    title=title,
-                    severity=severity,
-                    services=services,
-                    evidence_log_ids=[e.id for e in matched[-20:]],
-                )
-            )
-
-    # Restart/crash pattern
-    restart_logs = [log for log in logs if re.search(r"restart|crash|exited", log.message, re.IGNORECASE)]
-    if len(restart_logs) >= 3:
-        services = sorted({log.service for log in restart_logs})
-        incidents.append(
-            DetectedIncident(
-                signature="restart_pattern",
-                title="Repeated restarts detected",
-                severity="medium",
-                services=services,
-                evidence_log_ids=[e.id for e in restart_logs[-20:]],
-            )
+EVIDENCE_LIMIT = 20
+
+
+def _epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class _WindowCounter:
+    """Sliding window kept as per-second buckets of ``(ts, log_id)`` entries.
+
+    Whole buckets are dropped once they fall out of the window; only the bucket
+    straddling the cutoff is trimmed entry by entry. Entries are ordered by
+    ``(timestamp, id)``, matching the timestamp index walk of the SQL query.
+    """
+
+    def __init__(self) -> None:
+        self.buckets: Deque[Tuple[int, List[Tuple[float, int]]]] = deque()
+        self.count = 0
+
+    def add(self, ts: float, log_id: int) -> None:
+        second = int(ts)
+        self.count += 1
+        if not self.buckets or self.buckets[-1][0] < second:
+            self.buckets.append((second, [(ts, log_id)]))
+            return
+        # Late arrivals (clock skew between containers) land in an older bucket
+        for index in range(len(self.buckets) - 1, -1, -1):
+            bucket_second, entries = self.buckets[index]
+            if bucket_second == second:
+                entries.append((ts, log_id))
+                return
+            if bucket_second < second:
+                self.buckets.insert(index + 1, (second, [(ts, log_id)]))
+                return
+        self.buckets.appendleft((second, [(ts, log_id)]))
+
+    def expire(self, cutoff: float) -> None:
+        while self.buckets and self.buckets[0][0] + 1 <= cutoff:
+            self.count -= len(self.buckets.popleft()[1])
+        if self.buckets and self.buckets[0][0] < cutoff:
+            second, entries = self.buckets[0]
+            kept = [entry for entry in entries if entry[0] >= cutoff]
+            self.count -= len(entries) - len(kept)
+            if kept:
+                self.buckets[0] = (second, kept)
+            else:
+                self.buckets.popleft()
+
+    def oldest(self) -> Tuple[float, int]:
+        return min(self.buckets[0][1]) if self.buckets else (0.0, 0)
+
+    def newest_ids(self, limit: int = EVIDENCE_LIMIT) -> List[int]:
+        newest: List[Tuple[float, int]] = []
+        for _, entries in reversed(self.buckets):
+            newest = sorted(entries) + newest
+            if len(newest) >= limit:
+                break
+        return [log_id for _, log_id in newest[-limit:]]
+
+
+class _SignatureState:
+    def __init__(self) -> None:
+        self.window = _WindowCounter()
+        self.services: Dict[str, _WindowCounter] = {}
+
+    def add(self, ts: float, log: LogEntry) -> None:
+        self.window.add(ts, log.id)
+        self.services.setdefault(log.service, _WindowCounter()).add(ts, log.id)
+
+    def expire(self, cutoff: float) -> None:
+        self.window.expire(cutoff)
+        for service in list(self.services):
+            counter = self.services[service]
+            counter.expire(cutoff)
+            if not counter.count:
+                del self.services[service]
+
+    def active_services(self) -> List[str]:
+        return sorted(self.services)
+
+
+class StreamingDetector:
+    """Incremental version of :func:`detect_incidents`.
+
+    Logs are fed in once, as they are ingested, into per-service and
+    per-signature window counters. :meth:`detect` only walks the active keys,
+    so a scan no longer re-reads the window from the database.
+    """
+
+    def __init__(self, window_minutes: int = 5) -> None:
+        self.window_seconds = window_minutes * 60
+        self._lock = threading.Lock()
+        self._errors: Dict[str, _WindowCounter] = {}
+        self._signatures: Dict[str, _SignatureState] = {}
+        self._restarts = _SignatureState()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._errors = {}
+            self._signatures = {}
+            self._restarts = _SignatureState()
+
+    def rebuild(self, session: Session, now: Optional[datetime] = None) -> None:
+        since = (now or datetime.now(timezone.utc)) - timedelta(seconds=self.window_seconds)
+        stmt = (
+            select(LogEntry)
+            .where(LogEntry.timestamp >= since)
+            .order_by(LogEntry.timestamp, LogEntry.id)
         )
+        self.reset()
+        self.observe(session.exec(stmt.execution_options(yield_per=1000)))
+
+    def observe(self, logs: Iterable[LogEntry]) -> None:
+        with self._lock:
+            for log in logs:
+                if log.id is None:
+                    continue
+                ts = _epoch(log.timestamp)
+                if log.level == "ERROR":
+                    self._errors.setdefault(log.service, _WindowCounter()).add(ts, log.id)
+                signatures = log.signatures
+                if signatures is None:
+                    # Rows stored before signatures were recorded at ingestion
+                    signatures = classify(log.message)[1]
+                for signature_id in signatures:
+                    if signature_id == RESTART_SIGNATURE:
+                        self._restarts.add(ts, log)
+                    else:
+                        self._signatures.setdefault(signature_id, _SignatureState()).add(ts, log)
+
+    def detect(self, now: Optional[datetime] = None) -> List[DetectedIncident]:
+        cutoff = _epoch(now or datetime.now(timezone.utc)) - self.window_seconds
+        incidents: List[DetectedIncident] = []
+
+        with self._lock:
+            self._expire(cutoff)
 
-    return incidents
+            # Error burst detection, in order of each service's first error in the window
+            for service, window in sorted(self._errors.items(), key=lambda item: item[1].oldest()):
+                if window.count >= 5:
+                    incidents.append(
+                        DetectedIncident(
+                            signature=f"error_burst:{service}",
+                            title=f"Error burst detected in {service}",
+                            severity="high" if window.count >= 10 else "medium",
+                            services=[service],
+                            evidence_log_ids=window.newest_ids(),
+                        )
+                    )
+
+            # Signature pattern detection
+            for signature_id, title, severity in SIGNATURE_INCIDENTS:
+                state = self._signatures.get(signature_id)
+                if state and state.window.count >= 3:
+                    incidents.append(
+                        DetectedIncident(
+                            signature=f"sig:{SIGNATURE_PATTERNS[signature_id]}",
+                            title=title,
+                            severity=severity,
+                            services=state.active_services(),
+                            evidence_log_ids=state.window.newest_ids(),
+                        )
+                    )
+
+            # Restart/crash pattern
+            if self._restarts.window.count >= 3:
+                incidents.append(
+                    DetectedIncident(
+                        signature="restart_pattern",
+                        title="Repeated restarts detected",
+                        severity="medium",
+                        services=self._restarts.active_services(),
+                        evidence_log_ids=self._restarts.window.newest_ids(),
+                    )
+                )
+
+        return incidents
+
+    def _expire(self, cutoff: float) -> None:
+        for service in list(self._errors):
+            window = self._errors[service]
+            window.expire(cutoff)
+            if not window.count:
+                del self._errors[service]
+        for signature_id in list(self._signatures):
+            state = self._signatures[signature_id]
+            state.expire(cutoff)
+            if not state.window.count:
+                del self._signatures[signature_id]
+        self._restarts.expire(cutoff)
+
+
+def detect_incidents(session: Session, window_minutes: int = 5) -> List[DetectedIncident]:
+    now = datetime.now(timezone.utc)
+    detector = StreamingDetector(window_minutes=window_minutes)
+    detector.rebuild(session, now=now)
+    return detector.detect(now=now)
@@ -30,14 +30,61 @@ class Settings:
         self.groq_model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile").strip() or "llama-3.3-70b-versatile"
         self.groq_base_url = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1").strip()
         self.log_stream_batch = int(os.getenv("LOG_STREAM_BATCH", "200"))
+        self.ingest_queue_size = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+        self.ingest_flush_interval_ms = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "250"))
+        self.ingest_write_retries = int(os.getenv("INGEST_WRITE_RETRIES", "5"))
+        self.ingest_retry_backoff_ms = int(os.getenv("INGEST_RETRY_BACKOFF_MS", "100"))
+        self.log_retention_days = int(os.getenv("LOG_RETENTION_DAYS", "14"))
+        self.rollup_retention_days = int(os.getenv("ROLLUP_RETENTION_DAYS", "90"))
+        self.retention_interval = int(os.getenv("RETENTION_INTERVAL", "3600"))
+        self.retention_delete_batch = int(os.getenv("RETENTION_DELETE_BATCH", "5000"))
+        self.export_batch_size = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
         self.ai_timeout = int(os.getenv("AI_TIMEOUT", "30"))
+        self.llm_connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+        self.llm_max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "10"))
+        self.llm_keepalive_seconds = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+        self.llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.llm_requests_per_minute = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+        self.llm_stream = _as_bool(os.getenv("LLM_STREAM"), default=True)
+        self.llm_cache_path = os.getenv("LLM_CACHE_PATH", "./data/llm_cache.db").strip()
+        self.llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", "3600"))
+        self.llm_cache_size = int(os.getenv("LLM_CACHE_SIZE", "2000"))
+        self.sse_queue_size = int(os.getenv("SSE_QUEUE_SIZE", "500"))
+        self.sse_replay_size = int(os.getenv("SSE_REPLAY_SIZE", "2000"))
+        self.sse_replay_limit = int(os.getenv("SSE_REPLAY_LIMIT", "5000"))
+        self.analysis_workers = int(os.getenv("ANALYSIS_WORKERS", "2"))
+        self.analysis_queue_size = int(os.getenv("ANALYSIS_QUEUE_SIZE", "100"))
         self.incident_scan_interval = int(os.getenv("INCIDENT_SCAN_INTERVAL", "20"))
         self.vector_enabled = _as_bool(os.getenv("VECTOR_ENABLED"), default=True)
         self.qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333").strip()
         self.vector_collection = os.getenv("VECTOR_COLLECTION", "lognexa_logs").strip() or "lognexa_logs"
         self.vector_model = os.getenv("VECTOR_MODEL", "BAAI/bge-small-en-v1.5").strip() or "BAAI/bge-small-en-v1.5"
         self.vector_timeout = int(os.getenv("VECTOR_TIMEOUT", "10"))
+        self.vector_pool_size = int(os.getenv("VECTOR_POOL_SIZE", "16"))
+        self.vector_max_reads = int(os.getenv("VECTOR_MAX_READS", "8"))
+        self.vector_max_writes = int(os.getenv("VECTOR_MAX_WRITES", "4"))
+        self.vector_heartbeat_interval = float(os.getenv("VECTOR_HEARTBEAT_INTERVAL", "10"))
+        self.vector_backend = os.getenv("VECTOR_BACKEND", "auto").strip().lower() or "auto"
+        self.local_vector_path = os.getenv("LOCAL_VECTOR_PATH", "./data/vectors").strip() or "./data/vectors"
+        self.embedding_batch = int(os.getenv("EMBEDDING_BATCH", "64"))
+        self.embedding_flush_ms = int(os.getenv("EMBEDDING_FLUSH_MS", "500"))
+        self.embedding_queue_size = int(os.getenv("EMBEDDING_QUEUE_SIZE", "5000"))
+        self.embedding_workers = int(os.getenv("EMBEDDING_WORKERS", "2"))
+        self.embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+        self.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", "").strip()
+        self.vector_backfill_batch = int(os.getenv("VECTOR_BACKFILL_BATCH", "256"))
+        self.vector_backfill_retry = int(os.getenv("VECTOR_BACKFILL_RETRY", "30"))
         self.rag_context_limit = int(os.getenv("RAG_CONTEXT_LIMIT", "6"))
+        self.rag_mode = os.getenv("RAG_MODE", "hybrid").strip().lower() or "hybrid"
+        self.rag_candidates = int(os.getenv("RAG_CANDIDATES", "20"))
+        self.rag_rrf_k = int(os.getenv("RAG_RRF_K", "60"))
+        self.prompt_token_budget = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+        self.prompt_max_line_chars = int(os.getenv("PROMPT_MAX_LINE_CHARS", "400"))
+        self.collector_mode = os.getenv("COLLECTOR_MODE", "threads").strip().lower() or "threads"
+        self.collector_concurrency = int(os.getenv("COLLECTOR_CONCURRENCY", "64"))
+        self.container_cache_ttl = float(os.getenv("CONTAINER_CACHE_TTL", "10"))
+        self.container_cache_swr = _as_bool(os.getenv("CONTAINER_CACHE_SWR"), default=True)
+        self.docker_host = os.getenv("DOCKER_HOST", "unix:///var/run/docker.sock").strip()
         self.collector_exclude_services = set(
             _split_csv(os.getenv("COLLECTOR_EXCLUDE_SERVICES", "backend,qdrant,frontend"))
         )
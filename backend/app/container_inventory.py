@@ -0,0 +1,125 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+
+
+class ContainerInventory:
+    """Cached ``/api/containers`` listing.
+
+    Entries are rebuilt from one lightweight ``containers`` API call (no
+    per-container inspect) and are fresh for ``CONTAINER_CACHE_TTL`` seconds.
+    Image tags are memoized per image id, so a refresh only hits the daemon for
+    images it has not seen before. With stale-while-revalidate enabled an
+    expired listing is served immediately while a single background refresh
+    runs. The collector calls :meth:`invalidate` on Docker start/die/destroy
+    events.
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl: Optional[float] = None,
+        stale_while_revalidate: Optional[bool] = None,
+    ) -> None:
+        self.client = client
+        self.ttl = settings.container_cache_ttl if ttl is None else ttl
+        self.stale_while_revalidate = (
+            settings.container_cache_swr if stale_while_revalidate is None else stale_while_revalidate
+        )
+        self.entries: Optional[List[Dict[str, Any]]] = None
+        self.loaded_at = 0.0
+        self.image_labels: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self.last_refresh_ms = 0.0
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = self.entries
+            fresh = entries is not None and time.monotonic() - self.loaded_at < self.ttl
+            if fresh:
+                self.hits += 1
+                return entries
+            if entries is not None and self.stale_while_revalidate:
+                self.stale_hits += 1
+                self._refresh_in_background()
+                return entries
+            self.misses += 1
+        return self.refresh()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.loaded_at = 0.0
+            self.invalidations += 1
+
+    def refresh(self) -> List[Dict[str, Any]]:
+        with self._refresh_lock:
+            started = time.perf_counter()
+            entries = []
+            for container in self.client.api.containers():
+                labels = container.get("Labels") or {}
+                name = (container.get("Names") or ["/"])[0].lstrip("/")
+                entries.append(
+                    {
+                        "id": container["Id"][:12],
+                        "name": name,
+                        "service": labels.get("com.docker.compose.service", name),
+                        "image": self.image_label(container.get("ImageID", "")),
+                        "status": container.get("State", ""),
+                    }
+                )
+            with self._lock:
+                self.entries = entries
+                self.loaded_at = time.monotonic()
+                self.refreshes += 1
+                self.last_refresh_ms = (time.perf_counter() - started) * 1000
+            return entries
+
+    def image_label(self, image_id: str) -> str:
+        label = self.image_labels.get(image_id)
+        if label is None:
+            image = self.client.images.get(image_id)
+            label = image.tags[0] if image.tags else image.short_id
+            self.image_labels[image_id] = label
+        return label
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cached": self.entries is not None,
+                "age_seconds": round(time.monotonic() - self.loaded_at, 3) if self.entries is not None else None,
+                "ttl_seconds": self.ttl,
+                "stale_while_revalidate": self.stale_while_revalidate,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "invalidations": self.invalidations,
+                "image_labels": len(self.image_labels),
+                "last_refresh_ms": round(self.last_refresh_ms, 3),
+            }
+
+    def _refresh_in_background(self) -> None:
+        # Caller holds self._lock
+        if self._refreshing:
+            return
+        self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
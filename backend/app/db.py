@@ -1,5 +1,10 @@
-﻿from sqlmodel import SQLModel, Session, create_engine
+﻿from datetime import datetime, timezone
+
+from sqlalchemy import exists, func, inspect, text
+from sqlmodel import SQLModel, Session, create_engine, select
 from .config import settings
+from .models import Incident, IncidentService, IndexCheckpoint
+from .search_index import ensure_search_index
 
 
 connect_args = {}
@@ -8,11 +13,66 @@ if settings.database_url.startswith("sqlite"):
 
 engine = create_engine(settings.database_url, echo=False, connect_args=connect_args)
 
+INCIDENT_SERVICES_CHECKPOINT = "incident_services"
+
 
 def init_db() -> None:
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _create_missing_indexes()
+    _backfill_incident_services()
+    ensure_search_index(engine)
+
+
+def _add_missing_columns() -> None:
+    # create_all() never alters existing tables, so nullable columns added to
+    # the models later are appended here for databases created before them.
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
 
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+def _create_missing_indexes() -> None:
+    # Same story for indexes declared after a table was first created
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _backfill_incident_services() -> None:
+    # Incidents stored before the association table existed only carry the JSON
+    # list. The checkpoint records the highest id already covered, so incidents
+    # with no services are not rescanned on every startup.
+    with Session(engine) as session:
+        checkpoint = session.get(IndexCheckpoint, INCIDENT_SERVICES_CHECKPOINT)
+        if checkpoint is None:
+            checkpoint = IndexCheckpoint(name=INCIDENT_SERVICES_CHECKPOINT)
+        last_id = session.exec(select(func.max(Incident.id))).one() or 0
+        if last_id <= checkpoint.last_id:
+            return
+        missing = select(Incident).where(
+            Incident.id > checkpoint.last_id,
+            Incident.id <= last_id,
+            ~exists().where(IncidentService.incident_id == Incident.id),
+        )
+        for incident in session.exec(missing.execution_options(yield_per=500)):
+            session.add_all(
+                IncidentService(incident_id=incident.id, service=service) for service in set(incident.services or [])
+            )
+        checkpoint.last_id = last_id
+        checkpoint.updated_at = datetime.now(timezone.utc)
+        session.add(checkpoint)
+        session.commit()
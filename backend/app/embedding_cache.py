@@ -0,0 +1,154 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .config import settings
+
+
+Vector = List[float]
+EmbedFn = Callable[[List[str]], List[Vector]]
+
+
+def _key(model: str, text: str) -> str:
+    return hashlib.sha1(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """LRU of embedding vectors keyed on ``(model, text)``.
+
+    Holds up to ``EMBEDDING_CACHE_SIZE`` vectors in memory. With
+    ``EMBEDDING_CACHE_PATH`` set, vectors are also written to a small SQLite
+    file and read back on a memory miss, so a restart does not re-embed the
+    templates it has already seen. :meth:`embed` only sends texts that are
+    in neither tier to the model, once per distinct text.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, path: Optional[str] = None) -> None:
+        self.capacity = settings.embedding_cache_size if capacity is None else capacity
+        self.path = settings.embedding_cache_path if path is None else path
+        self._entries: "OrderedDict[str, Vector]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        if self.path:
+            self._open_disk()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.embedded = 0
+
+    def embed(self, model: str, texts: Sequence[str], embed_fn: EmbedFn) -> List[Vector]:
+        keys = [_key(model, text) for text in texts]
+        vectors: Dict[str, Vector] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    vectors[key] = vector
+                    self.hits += 1
+
+        unresolved: Dict[str, str] = {}
+        repeats = 0
+        for key, text in zip(keys, texts):
+            if key in vectors:
+                continue
+            if key in unresolved:
+                # The same text twice in one call is only looked up once
+                repeats += 1
+            else:
+                unresolved[key] = text
+        if repeats:
+            with self._lock:
+                self.hits += repeats
+        if unresolved:
+            for key, vector in self._read_disk(list(unresolved)).items():
+                vectors[key] = vector
+                del unresolved[key]
+                self._remember(key, vector)
+                with self._lock:
+                    self.disk_hits += 1
+
+        if unresolved:
+            computed = embed_fn(list(unresolved.values()))
+            fresh = dict(zip(unresolved, computed))
+            for key, vector in fresh.items():
+                vectors[key] = vector
+                self._remember(key, vector)
+            self._write_disk(fresh)
+            with self._lock:
+                self.misses += len(unresolved)
+                self.embedded += len(fresh)
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "persistent": self._disk is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "embedded": self.embedded,
+            }
+
+    def _remember(self, key: str, vector: Vector) -> None:
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _open_disk(self) -> None:
+        try:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("CREATE TABLE IF NOT EXISTS embedding (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            connection.commit()
+            self._disk = connection
+        except Exception:
+            self._disk = None
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, Vector]:
+        if self._disk is None or not keys:
+            return {}
+        found: Dict[str, Vector] = {}
+        try:
+            with self._disk_lock:
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start : start + 500]
+                    placeholders = ",".join("?" for _ in chunk)
+                    rows = self._disk.execute(
+                        f"SELECT key, vector FROM embedding WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = array("f", blob).tolist()
+        except Exception:
+            return {}
+        return found
+
+    def _write_disk(self, vectors: Dict[str, Vector]) -> None:
+        if self._disk is None or not vectors:
+            return
+        try:
+            with self._disk_lock:
+                self._disk.executemany(
+                    "INSERT OR REPLACE INTO embedding (key, vector) VALUES (?, ?)",
+                    [(key, array("f", vector).tobytes()) for key, vector in vectors.items()],
+                )
+                self._disk.commit()
+        except Exception:
+            pass
@@ -0,0 +1,207 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from .config import settings
+from .models import LogEntry
+
+
+IndexedCallback = Callable[[List[LogEntry], bool], None]
+
+
+class EmbeddingWorker:
+    """Embeds and upserts logs off the ingestion path.
+
+    :meth:`submit` only enqueues, so ingestion never waits on the embedding
+    model or Qdrant. A batching thread coalesces queued logs into batches of
+    ``EMBEDDING_BATCH`` (or whatever arrived within ``EMBEDDING_FLUSH_MS``)
+    and hands them to a pool of ``EMBEDDING_WORKERS`` threads that embed and
+    upsert with ``wait=False``. At most two batches per worker are in flight;
+    beyond that the queue fills and further logs are dropped and counted
+    rather than buffered without bound. Dropped and failed batches are
+    reported as not indexed, so the vector backfill picks them up on the next
+    start.
+
+    ``on_indexed`` is called with each batch and whether it was indexed.
+    Indexed and failed batches are reported in submission order. Dropped
+    logs are not: once the queue refuses one, :meth:`submit` sheds the rest
+    of its call too and reports them straight away, before any later
+    (higher) id can be queued. ``VectorBackfill.advance`` freezes its
+    checkpoint on the first failure it sees, so the checkpoint never moves
+    past a dropped id even though the drop may be reported ahead of older
+    batches still in flight.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        on_indexed: Optional[IndexedCallback] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        self.vector_store = vector_store
+        self.on_indexed = on_indexed
+        self.batch_size = max(1, batch_size or settings.embedding_batch)
+        self.flush_interval = flush_interval if flush_interval is not None else settings.embedding_flush_ms / 1000
+        self.workers = max(1, workers or settings.embedding_workers)
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue or settings.embedding_queue_size)
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.workers * 2)
+        self._pending: Deque[Tuple[List[LogEntry], Future]] = deque()
+        self._pending_lock = threading.Lock()
+        self._report_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.indexed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+        self.total_batch_ms = 0.0
+
+    def start(self) -> None:
+        if self.thread and self.thread.is_alive():
+            return
+        if not settings.vector_enabled:
+            return
+        self.stop_event.clear()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embedding")
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, entries: Sequence[LogEntry]) -> int:
+        """Queue logs for indexing without blocking; returns how many were accepted."""
+        if not self.thread:
+            return 0
+        accepted = 0
+        dropped: List[LogEntry] = []
+        entries = [entry for entry in entries if entry.id is not None]
+        for index, entry in enumerate(entries):
+            try:
+                self.queue.put_nowait(entry)
+                accepted += 1
+            except queue.Full:
+                # Shed the tail as well: a later entry slipping into a queue
+                # that just drained could be reported indexed before this drop
+                dropped = entries[index:]
+                break
+        with self._stats_lock:
+            self.enqueued += accepted
+            self.dropped += len(dropped)
+        if dropped:
+            self._notify(dropped, False)
+        return accepted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._pending_lock:
+            in_flight = len(self._pending)
+        with self._stats_lock:
+            return {
+                "running": bool(self.thread and self.thread.is_alive()),
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "batch_size": self.batch_size,
+                "workers": self.workers,
+                "in_flight": in_flight,
+                "enqueued": self.enqueued,
+                "indexed": self.indexed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "last_batch_ms": round(self.last_batch_ms, 3),
+                "avg_batch_ms": round(self.total_batch_ms / self.batches, 3) if self.batches else 0.0,
+            }
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                if self.stop_event.is_set():
+                    return
+                continue
+            # Wait for a free slot here, on our own thread; meanwhile submit() keeps failing fast
+            while not self._slots.acquire(timeout=0.5):
+                if self.stop_event.is_set():
+                    return
+            try:
+                future = self.executor.submit(self._index, batch)
+            except RuntimeError:
+                self._slots.release()
+                return
+            with self._pending_lock:
+                self._pending.append((batch, future))
+            future.add_done_callback(self._on_done)
+
+    def _collect_batch(self) -> List[LogEntry]:
+        batch: List[LogEntry] = []
+        try:
+            batch.append(self.queue.get(timeout=0.5))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self.stop_event.is_set():
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _index(self, batch: List[LogEntry]) -> bool:
+        started = time.perf_counter()
+        try:
+            indexed = self.vector_store.index_logs(batch, wait=False) == len(batch)
+        except Exception:
+            indexed = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self.batches += 1
+            self.last_batch_ms = elapsed_ms
+            self.total_batch_ms += elapsed_ms
+            if indexed:
+                self.indexed += len(batch)
+            else:
+                self.failed += len(batch)
+        return indexed
+
+    def _on_done(self, _future: Future) -> None:
+        self._slots.release()
+        # Report finished batches strictly in submission order
+        with self._report_lock:
+            while True:
+                with self._pending_lock:
+                    if not self._pending or not self._pending[0][1].done():
+                        return
+                    batch, future = self._pending.popleft()
+                try:
+                    indexed = bool(future.result())
+                except BaseException:
+                    indexed = False
+                self._notify(batch, indexed)
+
+    def _notify(self, batch: List[LogEntry], indexed: bool) -> None:
+        if not self.on_indexed:
+            return
+        try:
+            self.on_indexed(batch, indexed)
+        except Exception:
+            pass
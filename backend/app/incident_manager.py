@@ -1,18 +1,26 @@
 ﻿from datetime import datetime, timezone
-from typing import List
+from typing import Iterable, List
 
 from sqlmodel import Session, select
 
-from .models import Incident
-from .anomaly_detector import detect_incidents, DetectedIncident
+from .models import Incident, IncidentService, LogEntry
+from .anomaly_detector import DetectedIncident, StreamingDetector
 
 
 class IncidentManager:
     def __init__(self) -> None:
         self.last_scan_at = None
+        self.detector = StreamingDetector()
+
+    def rebuild(self, session: Session) -> None:
+        self.detector.rebuild(session)
+
+    def observe(self, logs: Iterable[LogEntry]) -> None:
+        self.detector.observe(logs)
 
     def scan(self, session: Session) -> List[Incident]:
-        detected = detect_incidents(session)
+        detected = self.detector.detect()
+        self.last_scan_at = datetime.now(timezone.utc)
         incidents: List[Incident] = []
         for item in detected:
             incident = self._create_or_update(session, item)
@@ -29,9 +37,11 @@ class IncidentManager:
         now = datetime.now(timezone.utc)
         if existing:
             existing.updated_at = now
+            added = sorted(set(item.services) - set(existing.services))
             existing.services = sorted(set(existing.services + item.services))
             existing.evidence_log_ids = sorted(set(existing.evidence_log_ids + item.evidence_log_ids))
             session.add(existing)
+            session.add_all(IncidentService(incident_id=existing.id, service=service) for service in added)
             session.commit()
             session.refresh(existing)
             return existing
@@ -47,6 +57,8 @@ class IncidentManager:
             status="open",
         )
         session.add(incident)
+        session.flush()
+        session.add_all(IncidentService(incident_id=incident.id, service=service) for service in set(incident.services))
         session.commit()
         session.refresh(incident)
         return incident
@@ -0,0 +1,251 @@
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlmodel import Session
+
+from .config import settings
+from .db import engine
+from .log_preprocessor import ensure_utc, timestamp_ns
+from .models import CollectorCursor, LogEntry
+
+
+BatchListener = Callable[[List[LogEntry]], None]
+
+
+# OperationalError also covers schema problems ("no such table") that no retry will fix
+_TRANSIENT_MARKERS = ("locked", "busy", "deadlock", "could not serialize", "connection", "timeout", "timed out")
+
+
+def _is_transient(exc: Exception) -> bool:
+    # "database is locked" / "database is busy" and dropped connections clear up on their own
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    if not isinstance(exc, OperationalError):
+        return False
+    message = str(exc.orig).lower()
+    return any(marker in message for marker in _TRANSIENT_MARKERS)
+
+
+class IngestionPipeline:
+    """Bounded queue between the collectors and the database.
+
+    Collectors call :meth:`submit` for every normalized log. A single writer
+    thread drains the queue and flushes rows with one multi-row insert once
+    ``settings.log_stream_batch`` rows are buffered or the flush interval
+    elapses, whichever comes first. Flushed batches are then handed to the
+    registered listeners (SSE, vector indexing, incident detection). When a
+    ``LogStorage`` is given, its partitions and rollups are updated in the
+    same transaction as the rows.
+
+    A write that fails with a transient error (a locked SQLite database, a
+    dropped connection) is retried up to ``INGEST_WRITE_RETRIES`` times
+    with exponential backoff before the batch is counted as failed, since
+    the collectors' cursors have already moved past those lines. Any other
+    error means the database rejected some row (a NUL byte on Postgres,
+    say), so the batch is split in halves until the rejected rows are
+    isolated; only those are dropped and counted as failed.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+        storage=None,
+    ) -> None:
+        self.batch_size = max(1, batch_size or settings.log_stream_batch)
+        self.flush_interval = flush_interval if flush_interval is not None else settings.ingest_flush_interval_ms / 1000
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue or settings.ingest_queue_size)
+        self.listeners: List[BatchListener] = []
+        self.storage = storage
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.listener_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.last_batch_size = 0
+
+    def add_listener(self, listener: BatchListener) -> None:
+        self.listeners.append(listener)
+
+    def start(self) -> None:
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def submit(self, log_data: Dict[str, Any]) -> bool:
+        # Blocking put: a full queue pushes back on the collector threads
+        # instead of growing memory without bound.
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(log_data, timeout=0.5)
+            except queue.Full:
+                continue
+            with self._stats_lock:
+                self.enqueued += 1
+            return True
+        return False
+
+    def offer(self, log_data: Dict[str, Any]) -> bool:
+        # Non-blocking variant for the asyncio collector, which must never block the event loop
+        try:
+            self.queue.put_nowait(log_data)
+        except queue.Full:
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "batch_size": self.batch_size,
+                "flush_interval_ms": round(self.flush_interval * 1000, 1),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "failed": self.failed,
+                "retries": self.retries,
+                "batches": self.batches,
+                "listener_errors": self.listener_errors,
+                "last_batch_size": self.last_batch_size,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "avg_flush_ms": round(self.total_flush_ms / self.batches, 3) if self.batches else 0.0,
+                "max_flush_ms": round(self.max_flush_ms, 3),
+            }
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self.flush(batch)
+            elif self.stop_event.is_set():
+                return
+
+    def _collect_batch(self) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        try:
+            batch.append(self.queue.get(timeout=0.5))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self.stop_event.is_set():
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self, batch: List[Dict[str, Any]]) -> List[LogEntry]:
+        started = time.perf_counter()
+        entries, failed = self._write_batch(batch)
+        if failed:
+            with self._stats_lock:
+                self.failed += failed
+        if not entries:
+            return []
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._stats_lock:
+            self.written += len(entries)
+            self.batches += 1
+            self.last_batch_size = len(entries)
+            self.last_flush_ms = elapsed_ms
+            self.total_flush_ms += elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+        for listener in self.listeners:
+            try:
+                listener(entries)
+            except Exception:
+                # A failing consumer must not stall ingestion for the others
+                with self._stats_lock:
+                    self.listener_errors += 1
+        return entries
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> Tuple[List[LogEntry], int]:
+        # Returns the stored entries and how many rows were dropped
+        try:
+            return self._write_with_retry(batch), 0
+        except Exception as exc:
+            if _is_transient(exc) or len(batch) == 1:
+                return [], len(batch)
+        middle = len(batch) // 2
+        left, left_failed = self._write_batch(batch[:middle])
+        right, right_failed = self._write_batch(batch[middle:])
+        return left + right, left_failed + right_failed
+
+    def _write_with_retry(self, batch: List[Dict[str, Any]]) -> List[LogEntry]:
+        delay = settings.ingest_retry_backoff_ms / 1000
+        for attempt in range(settings.ingest_write_retries + 1):
+            try:
+                return self._write(batch)
+            except Exception as exc:
+                if not _is_transient(exc) or attempt == settings.ingest_write_retries:
+                    raise
+            with self._stats_lock:
+                self.retries += 1
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> List[LogEntry]:
+        with Session(engine) as session:
+            ids = session.scalars(
+                insert(LogEntry).returning(LogEntry.id, sort_by_parameter_order=True),
+                batch,
+            ).all()
+            entries = [LogEntry(id=log_id, **row) for log_id, row in zip(ids, batch)]
+            self._advance_cursors(session, batch)
+            if self.storage:
+                self.storage.record(session, entries)
+            session.commit()
+        return entries
+
+    def _advance_cursors(self, session: Session, batch: List[Dict[str, Any]]) -> None:
+        # Committed together with the rows, so a restart resumes exactly after the last stored line
+        latest: Dict[str, Tuple[int, datetime]] = {}
+        for row in batch:
+            seen_ns = timestamp_ns(row["raw"], row["timestamp"])
+            if row["container_id"] not in latest or seen_ns > latest[row["container_id"]][0]:
+                latest[row["container_id"]] = (seen_ns, ensure_utc(row["timestamp"]))
+
+        now = datetime.now(timezone.utc)
+        for container_id, (seen_ns, seen_at) in latest.items():
+            cursor = session.get(CollectorCursor, container_id)
+            if cursor is None:
+                session.add(
+                    CollectorCursor(
+                        container_id=container_id, last_timestamp=seen_at, last_timestamp_ns=seen_ns, updated_at=now
+                    )
+                )
+            elif seen_ns > (cursor.last_timestamp_ns or timestamp_ns("", cursor.last_timestamp)):
+                cursor.last_timestamp = seen_at
+                cursor.last_timestamp_ns = seen_ns
+                cursor.updated_at = now
+                session.add(cursor)
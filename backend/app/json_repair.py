@@ -0,0 +1,188 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+# A number at the very end may still be growing ("0.8" of "0.85")
+_OPEN_NUMBER = re.compile(r"[:\[,]\s*-?\d[\d.eE+-]*$")
+
+
+def _scan(fragment: str):
+    """Open containers, string state and the end of the top-level object in ``fragment``.
+
+    For an unterminated string, also returns where a trailing escape that
+    cannot be closed as it is begins: a lone backslash, a partial ``\\uXXXX``
+    or a high surrogate still waiting for its pair.
+    """
+    stack: List[str] = []
+    in_string = False
+    escape_at: Optional[int] = None
+    hex_digits = 0
+    surrogate_at: Optional[int] = None
+    for index, ch in enumerate(fragment):
+        if in_string:
+            if escape_at is None:
+                if ch == "\\":
+                    escape_at = index
+                    continue
+                surrogate_at = None
+                if ch == '"':
+                    in_string = False
+            elif ch == "u" and index == escape_at + 1:
+                hex_digits = 4
+            elif hex_digits:
+                hex_digits -= 1
+                if not hex_digits:
+                    high = "d800" <= fragment[escape_at + 2 : index + 1].lower() <= "dbff"
+                    surrogate_at = escape_at if high else None
+                    escape_at = None
+            else:
+                escape_at = None
+                surrogate_at = None
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return stack, False, None, index + 1
+    cut = surrogate_at if surrogate_at is not None else escape_at
+    return stack, in_string, cut if in_string else None, None
+
+
+def _close(fragment: str) -> str:
+    stack, in_string, cut, _ = _scan(fragment)
+    if in_string:
+        fragment = (fragment if cut is None else fragment[:cut]) + '"'
+    return fragment + "".join("}" if ch == "{" else "]" for ch in reversed(stack))
+
+
+def _loads(text: str) -> Any:
+    # strict=False lets raw newlines and tabs through inside strings
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text), strict=False)
+
+
+def parse_partial(text: str) -> Optional[Dict[str, Any]]:
+    """Best-effort object from ``text``, which may be cut off anywhere.
+
+    Skips prose or code fences before the first ``{``, ignores anything after
+    the object closes, and otherwise closes open strings and containers. A
+    member that is still too incomplete to parse (``"confidence": 0.``) is
+    dropped back to the previous comma, and so is a number the text ends in,
+    since more digits may follow. Returns ``None`` if no object can be
+    recovered.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    fragment = text[start:]
+    _, in_string, _, end = _scan(fragment)
+    if end is not None:
+        fragment = fragment[:end]
+        try:
+            value = _loads(fragment)
+            return value if isinstance(value, dict) else None
+        except ValueError:
+            pass
+
+    candidate = fragment
+    number = None if in_string else _OPEN_NUMBER.search(candidate)
+    if number:
+        candidate = candidate[: number.start() + 1]
+    while candidate:
+        try:
+            value = _loads(_close(candidate))
+            if isinstance(value, dict):
+                return value
+        except ValueError:
+            pass
+        cut = candidate.rfind(",")
+        if cut <= 0:
+            return None
+        candidate = candidate[:cut]
+    return None
+
+
+class PartialJSON:
+    """Accumulates streamed text and re-parses the object it holds so far."""
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self.value: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Add ``chunk``; returns the parsed object when it changed, else ``None``."""
+        self.buffer += chunk
+        value = parse_partial(self.buffer)
+        if value is None or value == self.value:
+            return None
+        self.value = value
+        return value
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, list):
+        return " ".join(str(item) for item in value)
+    return str(value)
+
+
+def _string_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        # "1. restart the pool\n2. raise the limit" -> two actions
+        items = [re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line) for line in value.splitlines()]
+        return [item for item in items if item.strip()]
+    if isinstance(value, list):
+        return [_text(item) for item in value if _text(item)]
+    return [str(value)]
+
+
+def _confidence(value: Any) -> Optional[float]:
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if 1.0 < number <= 100.0:
+        number /= 100.0
+    return max(0.0, min(1.0, number))
+
+
+def coerce_analysis(value: Dict[str, Any]) -> Dict[str, Any]:
+    """Fit a parsed model response to the analysis shape.
+
+    Missing fields get empty defaults, ``confidence`` becomes a float in
+    ``[0, 1]`` (``"85%"`` and ``85`` both read as 0.85), and the two list
+    fields accept a single string or a numbered list in one string.
+    """
+    return {
+        "summary": _text(value.get("summary")),
+        "likely_root_cause": _text(value.get("likely_root_cause") or value.get("root_cause")),
+        "confidence": _confidence(value.get("confidence")),
+        "recommended_actions": _string_list(value.get("recommended_actions") or value.get("actions")),
+        "related_signals": _string_list(value.get("related_signals") or value.get("signals")),
+    }
+
+
+def parse_analysis(text: str) -> Dict[str, Any]:
+    """Repair and coerce a model response locally; ``ValueError`` if nothing usable is in it."""
+    value = parse_partial(text)
+    if value is None:
+        raise ValueError("No JSON object found")
+    analysis = coerce_analysis(value)
+    if not analysis["summary"] and not analysis["likely_root_cause"]:
+        raise ValueError("Response has neither a summary nor a root cause")
+    return analysis
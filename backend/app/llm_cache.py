@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .config import settings
+
+
+Result = Dict[str, Any]
+
+
+def prompt_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Analysis results keyed on a hash of ``(model, prompt)``.
+
+    Results are kept in a small SQLite file (``LLM_CACHE_PATH``) for
+    ``LLM_CACHE_TTL`` seconds; beyond ``LLM_CACHE_SIZE`` entries the least
+    recently read ones are evicted. An incident whose evidence has not
+    changed builds a byte-identical prompt, so re-analyzing it is answered
+    from here. Identical calls that arrive while one is already running
+    wait for that call instead of starting their own, and ``force`` skips
+    the lookup but still stores the fresh result.
+
+    The file is opened by :meth:`open` on startup, not on import; until
+    then only the coalescing applies. SQLite reads and writes run on a
+    worker thread.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None, capacity: Optional[int] = None) -> None:
+        self.path = settings.llm_cache_path if path is None else path
+        self.ttl = settings.llm_cache_ttl if ttl is None else ttl
+        self.capacity = settings.llm_cache_size if capacity is None else capacity
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._inflight: Dict[str, "asyncio.Future[Result]"] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.forced = 0
+        self.evictions = 0
+
+    async def get_or_compute(
+        self,
+        model: str,
+        prompt: str,
+        compute: Callable[[], Awaitable[Result]],
+        force: bool = False,
+    ) -> Result:
+        key = prompt_key(model, prompt)
+        if force:
+            self.forced += 1
+        elif key not in self._inflight:
+            cached = await asyncio.to_thread(self._read, key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+        while True:
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only swallow the cancellation of the call we joined, not our own
+                if not pending.cancelled():
+                    raise
+
+        self.misses += 1
+        future: "asyncio.Future[Result]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Waiters re-raise it; mark it retrieved so a lone caller does not log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            await asyncio.to_thread(self._write, key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "persistent": self._db is not None,
+            "size": self._size(),
+            "capacity": self.capacity,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "forced": self.forced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "in_flight": len(self._inflight),
+        }
+
+    def open(self) -> None:
+        if self._db is not None or not self.path or self.capacity <= 0:
+            return
+        try:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_result ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_llm_result_accessed_at ON llm_result (accessed_at)")
+            connection.commit()
+            self._db = connection
+        except Exception:
+            self._db = None
+
+    def close(self) -> None:
+        with self._db_lock:
+            db, self._db = self._db, None
+            if db is not None:
+                db.close()
+
+    def _read(self, key: str) -> Optional[Result]:
+        if self._db is None:
+            return None
+        now = time.time()
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM llm_result WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                value, created_at = row
+                if now - created_at > self.ttl:
+                    self._db.execute("DELETE FROM llm_result WHERE key = ?", (key,))
+                    self._db.commit()
+                    return None
+                self._db.execute("UPDATE llm_result SET accessed_at = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            return json.loads(value)
+        except Exception:
+            return None
+
+    def _write(self, key: str, result: Result) -> None:
+        if self._db is None:
+            return
+        now = time.time()
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_result (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(result), now, now),
+                )
+                expired = self._db.execute("DELETE FROM llm_result WHERE created_at < ?", (now - self.ttl,)).rowcount
+                overflow = self._db.execute(
+                    "DELETE FROM llm_result WHERE key IN ("
+                    "SELECT key FROM llm_result ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.capacity,),
+                ).rowcount
+                self._db.commit()
+            self.evictions += max(0, expired) + max(0, overflow)
+        except Exception:
+            pass
+
+    def _size(self) -> int:
+        if self._db is None:
+            return 0
+        try:
+            with self._db_lock:
+                return self._db.execute("SELECT COUNT(*) FROM llm_result").fetchone()[0]
+        except Exception:
+            return 0
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from .config import settings
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds in a Groq reset header such as ``"7.66s"`` or ``"2m59.56s"``."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English prose and log lines
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Request pacing: ``capacity`` requests at once, refilled at ``rate`` per second."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns seconds waited."""
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.tokens -= 1
+        return waited
+
+
+class GroqClient:
+    """Application-lifetime HTTP client for the Groq chat completions API.
+
+    One ``httpx.AsyncClient`` (HTTP/2 when ``h2`` is installed, keep-alive,
+    at most ``LLM_MAX_CONNECTIONS`` sockets) is opened on startup and closed
+    on shutdown, so analyses and their retries reuse warm connections. At
+    most ``LLM_MAX_CONCURRENCY`` completions run at once, and requests are
+    paced by a token bucket of ``LLM_REQUESTS_PER_MINUTE``.
+
+    Groq's ``x-ratelimit-*`` response headers are folded back in: when the
+    remaining request quota is exhausted, or the remaining token quota is
+    smaller than the next prompt, calls wait for the advertised reset, and a
+    429 blocks everyone for its ``retry-after`` instead of letting each
+    caller retry into the limit.
+
+    :meth:`stream_chat` makes the same request with ``stream: true`` and
+    yields content deltas from the server-sent events as they arrive.
+    """
+
+    def __init__(self) -> None:
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max(1, settings.llm_max_concurrency))
+        per_minute = max(1, settings.llm_requests_per_minute)
+        self._bucket = TokenBucket(rate=per_minute / 60.0, capacity=min(per_minute, max(1, settings.llm_max_concurrency)))
+        self._blocked_until = 0.0
+        self._requests_reset_at = 0.0
+        self._tokens_remaining: Optional[int] = None
+        self._tokens_reset_at = 0.0
+
+        self.in_flight = 0
+        self.requests = 0
+        self.streams = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.http_version: Optional[str] = None
+        self.requests_remaining: Optional[int] = None
+
+    def start(self) -> None:
+        if self._client is not None:
+            return
+        try:
+            import h2  # noqa: F401
+
+            http2 = True
+        except ImportError:
+            http2 = False
+        self._client = httpx.AsyncClient(
+            base_url=settings.groq_base_url,
+            http2=http2,
+            timeout=httpx.Timeout(settings.ai_timeout, connect=settings.llm_connect_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_connections,
+                keepalive_expiry=settings.llm_keepalive_seconds,
+            ),
+        )
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    async def chat(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST ``payload`` to ``/chat/completions`` and return the decoded body."""
+        if self._client is None:
+            self.start()
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in payload.get("messages", []))
+        async with self._semaphore:
+            await self._wait_for_quota(prompt_tokens)
+            self.in_flight += 1
+            try:
+                response = await self._client.post(
+                    "/chat/completions",
+                    headers={"Authorization": f"Bearer {settings.groq_api_key}"},
+                    json=payload,
+                )
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.in_flight -= 1
+            self.requests += 1
+            self.http_version = response.http_version
+            self._observe(response)
+            if response.is_error:
+                self.failures += 1
+            response.raise_for_status()
+            return response.json()
+
+    async def stream_chat(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """POST ``payload`` with ``stream: true`` and yield the content deltas."""
+        if self._client is None:
+            self.start()
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in payload.get("messages", []))
+        async with self._semaphore:
+            await self._wait_for_quota(prompt_tokens)
+            self.in_flight += 1
+            failed = False
+            try:
+                async with self._client.stream(
+                    "POST",
+                    "/chat/completions",
+                    headers={"Authorization": f"Bearer {settings.groq_api_key}"},
+                    json={**payload, "stream": True},
+                ) as response:
+                    self.requests += 1
+                    self.streams += 1
+                    self.http_version = response.http_version
+                    self._observe(response)
+                    if response.is_error:
+                        failed = True
+                        self.failures += 1
+                        await response.aread()
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            chunk = json.loads(data)
+                        except ValueError:
+                            continue
+                        choices = chunk.get("choices") or []
+                        if choices:
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                yield delta
+            except Exception:
+                if not failed:
+                    self.failures += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+    async def _wait_for_quota(self, prompt_tokens: int) -> None:
+        waited = await self._bucket.acquire()
+        now = time.monotonic()
+        resume_at = self._blocked_until
+        if self.requests_remaining == 0:
+            resume_at = max(resume_at, self._requests_reset_at)
+        if self._tokens_remaining is not None and self._tokens_remaining < prompt_tokens:
+            resume_at = max(resume_at, self._tokens_reset_at)
+        if resume_at > now:
+            await asyncio.sleep(resume_at - now)
+            waited += resume_at - now
+            # The reset has passed; the next response reports fresh quotas
+            self.requests_remaining = None
+            self._tokens_remaining = None
+        if waited > 0:
+            self.throttled += 1
+            self.throttled_seconds += waited
+
+    def _observe(self, response: httpx.Response) -> None:
+        headers = response.headers
+        now = time.monotonic()
+        remaining = _parse_int(headers.get("x-ratelimit-remaining-requests"))
+        if remaining is not None:
+            self.requests_remaining = remaining
+            self._requests_reset_at = now + (_parse_reset(headers.get("x-ratelimit-reset-requests")) or 0.0)
+        tokens = _parse_int(headers.get("x-ratelimit-remaining-tokens"))
+        if tokens is not None:
+            self._tokens_remaining = tokens
+            self._tokens_reset_at = now + (_parse_reset(headers.get("x-ratelimit-reset-tokens")) or 0.0)
+        if response.status_code == 429:
+            self.rate_limited += 1
+            retry_after = _parse_reset(headers.get("retry-after")) or _parse_reset(
+                headers.get("x-ratelimit-reset-requests")
+            )
+            self._blocked_until = max(self._blocked_until, now + (retry_after or 1.0))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "open": self._client is not None,
+            "http_version": self.http_version,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "streams": self.streams,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "throttled": self.throttled,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "requests_remaining": self.requests_remaining,
+            "tokens_remaining": self._tokens_remaining,
+            "blocked_for": round(max(0.0, self._blocked_until - now), 3),
+        }
+
+
+groq_client = GroqClient()
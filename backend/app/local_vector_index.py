@@ -0,0 +1,240 @@
+import heapq
+import json
+import os
+import threading
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .log_preprocessor import ensure_utc
+
+
+_INITIAL_CAPACITY = 4096
+
+
+class LocalVectorIndex:
+    """Brute-force cosine index persisted to memory-mapped files.
+
+    Used when Qdrant is not deployed (``VECTOR_BACKEND=local``) or as the
+    fallback next to it (``auto``). Under ``path`` it keeps parallel arrays
+    for the normalized vectors, log ids, epoch timestamps and service codes,
+    each a ``np.memmap`` that doubles in size when full, plus ``meta.json``
+    (dimension, row count, service names). Re-indexing an id overwrites its
+    row, and :meth:`delete_before` compacts away rows that retention has
+    removed from ``logentry``. ``pending.i64`` lists ids that still have to
+    be pushed to Qdrant.
+
+    Searches score every row with one matrix-vector product, so they stay
+    fast up to a few million logs without any server process.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self.dim = 0
+        self.count = 0
+        self.capacity = 0
+        self.services: List[str] = []
+        self._service_codes: Dict[str, int] = {}
+        self._rows: Dict[int, int] = {}
+        self._pending: Set[int] = set()
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._timestamps: Optional[np.memmap] = None
+        self._service_index: Optional[np.memmap] = None
+        self._load()
+
+    # -- persistence -------------------------------------------------------
+
+    def _file(self, name: str) -> Path:
+        return self.path / name
+
+    def _load(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta_file = self._file("meta.json")
+        if meta_file.exists():
+            meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            self.dim = meta["dim"]
+            self.count = meta["count"]
+            self.capacity = meta["capacity"]
+            self.services = meta["services"]
+            self._service_codes = {service: code for code, service in enumerate(self.services)}
+            self._map_arrays("r+")
+            self._rows = {int(log_id): row for row, log_id in enumerate(self._ids[: self.count])}
+        pending_file = self._file("pending.i64")
+        if pending_file.exists():
+            self._pending = set(array("q", pending_file.read_bytes()))
+
+    def _map_arrays(self, mode: str) -> None:
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode=mode, shape=(self.capacity, self.dim))
+        self._ids = np.memmap(self._file("ids.i64"), dtype=np.int64, mode=mode, shape=(self.capacity,))
+        self._timestamps = np.memmap(self._file("timestamps.f64"), dtype=np.float64, mode=mode, shape=(self.capacity,))
+        self._service_index = np.memmap(self._file("services.i32"), dtype=np.int32, mode=mode, shape=(self.capacity,))
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(self.capacity, _INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        self._flush_arrays()
+        # Extending the files keeps existing rows; the new tail reads as zeros
+        for name, itemsize in (("vectors.f32", 4 * self.dim), ("ids.i64", 8), ("timestamps.f64", 8), ("services.i32", 4)):
+            with open(self._file(name), "ab") as handle:
+                handle.truncate(capacity * itemsize)
+        self.capacity = capacity
+        self._map_arrays("r+")
+
+    def _flush_arrays(self) -> None:
+        for mapped in (self._vectors, self._ids, self._timestamps, self._service_index):
+            if mapped is not None:
+                mapped.flush()
+
+    def _write_meta(self) -> None:
+        meta = {"dim": self.dim, "count": self.count, "capacity": self.capacity, "services": self.services}
+        tmp = self._file("meta.json.tmp")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, self._file("meta.json"))
+
+    def _write_pending(self) -> None:
+        tmp = self._file("pending.i64.tmp")
+        tmp.write_bytes(array("q", sorted(self._pending)).tobytes())
+        os.replace(tmp, self._file("pending.i64"))
+
+    # -- writes ------------------------------------------------------------
+
+    def add(self, items: Sequence[Tuple[int, datetime, str, Sequence[float]]]) -> int:
+        """Store ``(log_id, timestamp, service, vector)`` rows; returns how many were written."""
+        if not items:
+            return 0
+        with self._lock:
+            if not self.dim:
+                self.dim = len(items[0][3])
+            new_ids = {log_id for log_id, _, _, _ in items if log_id not in self._rows}
+            self._grow(self.count + len(new_ids))
+
+            for log_id, timestamp, service, vector in items:
+                row = self._rows.get(log_id)
+                if row is None:
+                    row = self.count
+                    self.count += 1
+                    self._rows[log_id] = row
+                code = self._service_codes.get(service)
+                if code is None:
+                    code = self._service_codes[service] = len(self.services)
+                    self.services.append(service)
+                values = np.asarray(vector, dtype=np.float32)
+                norm = float(np.linalg.norm(values))
+                self._vectors[row] = values / norm if norm else values
+                self._ids[row] = log_id
+                self._timestamps[row] = ensure_utc(timestamp).timestamp()
+                self._service_index[row] = code
+
+            self._flush_arrays()
+            self._write_meta()
+        return len(items)
+
+    def delete_before(self, cutoff: datetime) -> int:
+        """Drop rows timestamped before ``cutoff``, compacting the arrays; returns how many went."""
+        with self._lock:
+            count = self.count
+            if not count:
+                return 0
+            kept = self._timestamps[:count] >= ensure_utc(cutoff).timestamp()
+            keep = np.flatnonzero(kept)
+            removed = count - len(keep)
+            if not removed:
+                return 0
+            removed_ids = set(self._ids[:count][~kept].tolist())
+            for mapped in (self._vectors, self._ids, self._timestamps, self._service_index):
+                mapped[: len(keep)] = mapped[keep]
+            self.count = len(keep)
+            self._rows = {int(log_id): row for row, log_id in enumerate(self._ids[: self.count])}
+            self._flush_arrays()
+            self._write_meta()
+            if self._pending & removed_ids:
+                self._pending -= removed_ids
+                self._write_pending()
+        return removed
+
+    def vectors_for(self, ids: Iterable[int]) -> Dict[int, List[float]]:
+        with self._lock:
+            return {log_id: self._vectors[self._rows[log_id]].tolist() for log_id in ids if log_id in self._rows}
+
+    def contains(self, ids: Iterable[int]) -> Set[int]:
+        with self._lock:
+            return {log_id for log_id in ids if log_id in self._rows}
+
+    def mark_pending(self, ids: Iterable[int]) -> None:
+        with self._lock:
+            before = len(self._pending)
+            self._pending.update(ids)
+            if len(self._pending) != before:
+                self._write_pending()
+
+    def clear_pending(self, ids: Iterable[int]) -> None:
+        with self._lock:
+            before = len(self._pending)
+            self._pending.difference_update(ids)
+            if len(self._pending) != before:
+                self._write_pending()
+
+    def pending(self, limit: int) -> List[int]:
+        with self._lock:
+            return heapq.nsmallest(limit, self._pending)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # -- reads -------------------------------------------------------------
+
+    def search(
+        self,
+        vector: Sequence[float],
+        limit: int,
+        services: Optional[Set[str]] = None,
+        exclude_ids: Optional[Set[int]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Tuple[int, float]]:
+        """Top ``limit`` ``(log_id, cosine score)`` pairs matching the filters."""
+        with self._lock:
+            count = self.count
+            if not count or not self.dim:
+                return []
+            query = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(query))
+            if norm:
+                query = query / norm
+            scores = self._vectors[:count] @ query
+            mask = np.ones(count, dtype=bool)
+            if services:
+                codes = [self._service_codes[service] for service in services if service in self._service_codes]
+                mask &= np.isin(self._service_index[:count], codes)
+            if start:
+                mask &= self._timestamps[:count] >= ensure_utc(start).timestamp()
+            if end:
+                mask &= self._timestamps[:count] <= ensure_utc(end).timestamp()
+            if exclude_ids:
+                mask &= ~np.isin(self._ids[:count], list(exclude_ids))
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            top = min(limit, len(candidates))
+            best = candidates[np.argpartition(-scores[candidates], top - 1)[:top]]
+            best = best[np.argsort(-scores[best])]
+            return [(int(self._ids[row]), float(scores[row])) for row in best]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "dim": self.dim,
+                "count": self.count,
+                "capacity": self.capacity,
+                "pending_sync": len(self._pending),
+            }
@@ -1,25 +1,101 @@
-﻿import random
+﻿import asyncio
+import json
+import random
+import struct
 import threading
 import time
 from datetime import datetime, timezone
-from typing import Callable, Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 import docker
-from docker.errors import DockerException
+import httpx
+from docker.errors import DockerException, NotFound
+from sqlmodel import Session, select
 
 from .config import settings
-from .log_preprocessor import normalize_log, split_docker_line
+from .container_inventory import ContainerInventory
+from .db import engine
+from .log_preprocessor import normalize_log, split_docker_line, timestamp_ns
+from .models import CollectorCursor
+
+
+CONTAINER_EVENT_FILTERS = {"type": ["container"], "event": ["start", "die", "destroy"]}
+
+
+def _docker_transport() -> Dict[str, Any]:
+    host = settings.docker_host
+    if host.startswith("unix://"):
+        return {"transport": httpx.AsyncHTTPTransport(uds=host[len("unix://"):]), "base_url": "http://docker"}
+    if host.startswith("tcp://"):
+        return {"base_url": "http://" + host[len("tcp://"):]}
+    return {"base_url": host}
+
+
+def _load_cursors() -> Dict[str, int]:
+    try:
+        with Session(engine) as session:
+            rows = session.exec(select(CollectorCursor)).all()
+    except Exception:
+        return {}
+    # Cursors stored before nanoseconds were kept cover their whole microsecond
+    return {
+        row.container_id: row.last_timestamp_ns
+        if row.last_timestamp_ns is not None
+        else timestamp_ns("", row.last_timestamp) + 999
+        for row in rows
+    }
+
+
+def _event_target(event: Dict[str, Any]) -> Tuple[str, str]:
+    action = event.get("Action") or event.get("status") or ""
+    container_id = event.get("id") or event.get("Actor", {}).get("ID", "")
+    return action, container_id
 
 
 class DockerLogCollector:
-    def __init__(self, on_log: Callable[[Dict[str, Any]], None]) -> None:
+    """Follows container logs and hands each normalized line to ``on_log``.
+
+    ``COLLECTOR_MODE=threads`` (default) runs one blocking Docker SDK stream per
+    container. ``COLLECTOR_MODE=async`` multiplexes every container's log
+    stream over the Docker API socket on the event loop, with at most
+    ``COLLECTOR_CONCURRENCY`` streams being opened at once (an open stream
+    does not hold a slot, so every container is followed). In async mode
+    container discovery runs off the loop and ``try_log``
+    is used as a non-blocking fast path; when it refuses (ingestion queue
+    full) the reader waits on ``on_log`` off the loop, so a slow writer
+    throttles socket reads instead of buffering lines in memory.
+
+    Readers are attached and detached from the Docker events stream as
+    containers start and stop. Each container resumes from its last seen
+    timestamp (persisted by the ingestion writer as ``CollectorCursor`` rows,
+    to the nanosecond Docker stamps lines with). Only the replayed start of a
+    reconnected stream is filtered: lines up to the cursor held when the
+    stream opened are skipped so reconnects never insert duplicates, and from
+    the first line past it everything is kept, including live lines that tie
+    with or precede the one before them.
+    """
+
+    def __init__(
+        self,
+        on_log: Callable[[Dict[str, Any]], Any],
+        try_log: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> None:
         self.on_log = on_log
+        self.try_log = try_log
         self.stop_event = threading.Event()
         self.threads: List[threading.Thread] = []
+        self.tasks: List[asyncio.Task] = []
+        self.readers: Dict[str, Any] = {}
+        self.cursors: Dict[str, int] = {}
         self.client = None
+        self.async_client: Optional[httpx.AsyncClient] = None
+        self.connect_slots: Optional[asyncio.Semaphore] = None
+        self.event_stream = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         self.available = False
-        self.container_cache: List[Dict[str, Any]] = []
+        self.inventory: Optional[ContainerInventory] = None
         self.excluded_services = {service.lower() for service in settings.collector_exclude_services}
+        self._readers_lock = threading.Lock()
 
     def start(self) -> None:
         try:
@@ -31,65 +107,242 @@ class DockerLogCollector:
             self._start_fallback()
             return
 
-        self._refresh_container_cache()
+        self.cursors = _load_cursors()
+        self.inventory = ContainerInventory(self.client)
+        if settings.collector_mode == "async":
+            self.loop = asyncio.get_running_loop()
+            self.async_client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=10.0), **_docker_transport())
+            self.connect_slots = asyncio.Semaphore(max(1, settings.collector_concurrency))
+            self.tasks.append(self.loop.create_task(self._watch_events_async()))
+            self.tasks.append(self.loop.create_task(self._attach_running_async()))
+            return
+
+        self.inventory.refresh()
+        thread = threading.Thread(target=self._watch_events, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
         for container in self.client.containers.list():
-            service = container.labels.get("com.docker.compose.service", container.name).lower()
-            if service in self.excluded_services:
-                continue
-            thread = threading.Thread(target=self._stream_container_logs, args=(container,), daemon=True)
-            thread.start()
-            self.threads.append(thread)
+            self.attach(container)
 
     def stop(self) -> None:
         self.stop_event.set()
+        if self.event_stream is not None:
+            try:
+                self.event_stream.close()
+            except Exception:
+                pass
+        for task in self.tasks:
+            task.cancel()
+        if self.async_client:
+            asyncio.get_running_loop().create_task(self.async_client.aclose())
 
-    def _refresh_container_cache(self) -> None:
-        if not self.client:
+    def attach(self, container, source: Optional[Dict[str, Any]] = None) -> None:
+        service = container.labels.get("com.docker.compose.service", container.name)
+        if service.lower() in self.excluded_services or self.stop_event.is_set():
             return
-        self.container_cache = []
-        for container in self.client.containers.list():
-            service = container.labels.get("com.docker.compose.service", container.name)
-            self.container_cache.append(
-                {
-                    "id": container.id[:12],
-                    "name": container.name,
-                    "service": service,
-                    "image": container.image.tags[0] if container.image.tags else container.image.short_id,
-                    "status": container.status,
-                }
-            )
+        with self._readers_lock:
+            if container.id in self.readers:
+                return
+            source = source or self._describe(container)
+            if self.async_client:
+                reader = self.loop.create_task(self._stream_container_logs_async(source))
+                self.tasks.append(reader)
+            else:
+                reader = threading.Thread(target=self._stream_container_logs, args=(source,), daemon=True)
+                reader.start()
+                self.threads.append(reader)
+            self.readers[container.id] = reader
 
-    def _stream_container_logs(self, container) -> None:
-        service = container.labels.get("com.docker.compose.service", container.name)
-        tags = {
-            "image": container.image.tags[0] if container.image.tags else container.image.short_id,
-            "compose_project": container.labels.get("com.docker.compose.project", ""),
-            "container_name": container.name,
+    def detach(self, container_id: str) -> None:
+        # The reader itself ends with the container's log stream; forgetting it
+        # here lets a quick restart attach a fresh reader straight away.
+        with self._readers_lock:
+            self.readers.pop(container_id, None)
+
+    def _release(self, container_id: str, reader: Any) -> None:
+        with self._readers_lock:
+            if self.readers.get(container_id) is reader:
+                del self.readers[container_id]
+            if isinstance(reader, asyncio.Task) and reader in self.tasks:
+                self.tasks.remove(reader)
+            if isinstance(reader, threading.Thread) and reader in self.threads:
+                self.threads.remove(reader)
+
+    def _describe(self, container) -> Dict[str, Any]:
+        return {
+            "container": container,
+            "id": container.id,
+            "short_id": container.id[:12],
+            "service": container.labels.get("com.docker.compose.service", container.name),
+            "tty": container.attrs.get("Config", {}).get("Tty", False),
+            "tags": {
+                "image": self.inventory.image_label(container.attrs.get("Image", "")),
+                "compose_project": container.labels.get("com.docker.compose.project", ""),
+                "container_name": container.name,
+            },
         }
+
+    def _stream_window(self, source: Dict[str, Any]) -> Dict[str, Any]:
+        # Called each time a stream opens: the cursor at that moment marks
+        # where the replayed part of the new stream ends
+        cursor = self.cursors.get(source["short_id"])
+        source["replay_until"] = cursor
+        if cursor is None:
+            return {"tail": 10}
+        # Docker's ``since`` has whole-second granularity here; _normalize_line
+        # drops the already-seen part of that second.
+        return {"tail": "all", "since": max(1, cursor // 1_000_000_000)}
+
+    def _normalize_line(self, source: Dict[str, Any], line: bytes) -> Optional[Dict[str, Any]]:
+        timestamp, message, raw = split_docker_line(line)
+        seen_ns = timestamp_ns(raw, timestamp)
+        replay_until = source.get("replay_until")
+        if replay_until is not None:
+            if seen_ns <= replay_until:
+                return None
+            source["replay_until"] = None
+        short_id = source["short_id"]
+        self.cursors[short_id] = max(seen_ns, self.cursors.get(short_id, seen_ns))
+        return normalize_log(
+            timestamp=timestamp,
+            service=source["service"],
+            container_id=source["short_id"],
+            message=message,
+            raw=raw,
+            tags=source["tags"],
+        )
+
+    def _watch_events(self) -> None:
+        since = None
+        while not self.stop_event.is_set():
+            try:
+                self.event_stream = self.client.events(decode=True, filters=CONTAINER_EVENT_FILTERS, since=since)
+                for event in self.event_stream:
+                    since = event.get("time", since)
+                    action, container_id = _event_target(event)
+                    self.inventory.invalidate()
+                    if action == "start":
+                        self.attach(self.client.containers.get(container_id))
+                    elif action in {"die", "destroy"}:
+                        self.detach(container_id)
+            except Exception:
+                pass
+            # Reconnect with ``since`` so events emitted while disconnected are replayed
+            self.stop_event.wait(2.0)
+
+    async def _watch_events_async(self) -> None:
+        since = None
+        while not self.stop_event.is_set():
+            params = {"filters": json.dumps(CONTAINER_EVENT_FILTERS)}
+            if since:
+                params["since"] = since
+            try:
+                async with self.async_client.stream("GET", "/events", params=params) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        event = json.loads(line)
+                        since = event.get("time", since)
+                        action, container_id = _event_target(event)
+                        self.inventory.invalidate()
+                        if action == "start":
+                            container = await asyncio.to_thread(self.client.containers.get, container_id)
+                            source = await asyncio.to_thread(self._describe, container)
+                            self.attach(container, source)
+                        elif action in {"die", "destroy"}:
+                            self.detach(container_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            await asyncio.sleep(2.0)
+
+    async def _attach_running_async(self) -> None:
+        # Listing and inspecting containers are blocking Docker SDK calls, so
+        # keep them off the event loop like the events path does
         try:
-            logs = container.logs(stream=True, follow=True, timestamps=True, tail=10)
-            for line in logs:
-                if self.stop_event.is_set():
-                    break
-                timestamp, message, raw = split_docker_line(line)
-                log = normalize_log(
-                    timestamp=timestamp,
-                    service=service,
-                    container_id=container.id[:12],
-                    message=message,
-                    raw=raw,
-                    tags=tags,
-                )
-                self.on_log(log)
+            await asyncio.to_thread(self.inventory.refresh)
+            containers = await asyncio.to_thread(self.client.containers.list)
         except Exception:
-            # If a container log stream fails, we don't stop the collector
             return
+        for container in containers:
+            try:
+                source = await asyncio.to_thread(self._describe, container)
+            except Exception:
+                continue
+            self.attach(container, source)
+
+    def _stream_container_logs(self, source: Dict[str, Any]) -> None:
+        reader = threading.current_thread()
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    logs = source["container"].logs(
+                        stream=True, follow=True, timestamps=True, **self._stream_window(source)
+                    )
+                    for line in logs:
+                        if self.stop_event.is_set():
+                            break
+                        log = self._normalize_line(source, line)
+                        if log:
+                            self.on_log(log)
+                    # The stream ends when the container stops
+                    return
+                except NotFound:
+                    return
+                except Exception:
+                    # If a container log stream fails, we don't stop the collector; resume from the cursor
+                    self.stop_event.wait(1.0)
+        finally:
+            self._release(source["id"], reader)
+
+    async def _stream_container_logs_async(self, source: Dict[str, Any]) -> None:
+        reader = asyncio.current_task()
+        # Without a TTY the Docker API multiplexes stdout/stderr into framed chunks
+        framed = not source["tty"]
+        try:
+            while not self.stop_event.is_set():
+                params = {"follow": 1, "stdout": 1, "stderr": 1, "timestamps": 1}
+                params.update(self._stream_window(source))
+                request = self.async_client.build_request("GET", f"/containers/{source['id']}/logs", params=params)
+                try:
+                    # Only opening the stream takes a slot: follow streams never
+                    # end, so holding one for the stream's life would leave every
+                    # container past the limit uncollected
+                    async with self.connect_slots:
+                        response = await self.async_client.send(request, stream=True)
+                    try:
+                        if response.status_code == 404:
+                            return
+                        response.raise_for_status()
+                        async for line in _iter_log_lines(response.aiter_bytes(), framed):
+                            if self.stop_event.is_set():
+                                break
+                            log = self._normalize_line(source, line)
+                            if log:
+                                await self._emit(log)
+                    finally:
+                        await response.aclose()
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # Same policy as the threaded reader: resume from the cursor after a pause
+                    await asyncio.sleep(1.0)
+        finally:
+            self._release(source["id"], reader)
+
+    async def _emit(self, log: Dict[str, Any]) -> None:
+        if self.try_log and self.try_log(log):
+            return
+        await asyncio.to_thread(self.on_log, log)
 
     def list_containers(self) -> List[Dict[str, Any]]:
         if self.available and self.client:
             try:
-                self._refresh_container_cache()
-                return self.container_cache
+                return self.inventory.list()
             except Exception:
                 pass
         return self._fallback_containers()
@@ -143,3 +396,31 @@ class DockerLogCollector:
                 tags={"fallback": True},
             )
             self.on_log(log)
+
+
+_FRAME_HEADER = struct.Struct(">BxxxL")
+
+
+async def _iter_log_lines(chunks, framed: bool):
+    """Yield newline-terminated log lines from a raw or multiplexed Docker log stream."""
+    buffer = b""
+    pending = b""
+    async for chunk in chunks:
+        if framed:
+            buffer += chunk
+            payload = b""
+            while len(buffer) >= _FRAME_HEADER.size:
+                _, size = _FRAME_HEADER.unpack_from(buffer)
+                end = _FRAME_HEADER.size + size
+                if len(buffer) < end:
+                    break
+                payload += buffer[_FRAME_HEADER.size:end]
+                buffer = buffer[end:]
+        else:
+            payload = chunk
+        pending += payload
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+    if pending:
+        yield pending
@@ -0,0 +1,262 @@
+import json
+import zlib
+from datetime import datetime
+from json.encoder import encode_basestring
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, tuple_, type_coerce
+from sqlalchemy.sql import Select
+from sqlmodel import Session, select
+
+from .config import settings
+from .db import engine
+from .models import LogEntry
+from .search_index import apply_log_search
+
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+COMPRESSIONS = {
+    # format -> compressions it accepts
+    "ndjson": {"gzip", "zstd"},
+    "arrow": {"zstd"},
+    "parquet": {"gzip", "zstd"},
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def export_statement(
+    service: Optional[str] = None,
+    level: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    q: Optional[str] = None,
+) -> Select:
+    """Bare columns of the matching logs, unordered; :func:`iter_batches` pages it.
+
+    ``tags`` is read as its stored JSON text, so NDJSON rows embed it as-is
+    instead of decoding and re-encoding it.
+    """
+    stmt = select(
+        LogEntry.id,
+        LogEntry.timestamp,
+        LogEntry.service,
+        LogEntry.container_id,
+        LogEntry.level,
+        LogEntry.message,
+        LogEntry.raw,
+        type_coerce(LogEntry.tags, String).label("tags"),
+    )
+    if service:
+        stmt = stmt.where(LogEntry.service == service)
+    if level:
+        stmt = stmt.where(LogEntry.level == level)
+    if start:
+        stmt = stmt.where(LogEntry.timestamp >= start)
+    if end:
+        stmt = stmt.where(LogEntry.timestamp <= end)
+    if q and q.strip():
+        stmt = apply_log_search(stmt, q)
+    return stmt
+
+
+def iter_batches(stmt: Select, batch_size: Optional[int] = None, limit: Optional[int] = None) -> Iterator[Sequence[Any]]:
+    """Rows of ``stmt`` oldest first, in lists of ``batch_size``.
+
+    Each batch is its own short query and transaction, seeking past the
+    last ``(timestamp, id)`` sent on the ``ix_logentry_timestamp_id``
+    index. No read transaction stays open while a slow client downloads,
+    so on SQLite the ingestion writer is never locked out by an export.
+    """
+    batch_size = batch_size or settings.export_batch_size
+    last: Optional[Tuple[datetime, int]] = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        page = stmt
+        if last is not None:
+            page = page.where(tuple_(LogEntry.timestamp, LogEntry.id) > last)
+        with Session(engine) as session:
+            rows = session.exec(page.order_by(LogEntry.timestamp, LogEntry.id).limit(size)).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < size:
+            return
+        last = (rows[-1][1], rows[-1][0])
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def _tags_text(tags: Any) -> str:
+    if tags is None:
+        return "{}"
+    return tags if isinstance(tags, str) else json.dumps(tags)
+
+
+def ndjson_lines(rows: Sequence[Any]) -> str:
+    # Written by hand: one format string per row instead of a dict and json.dumps
+    return "".join(
+        '{"id":%d,"timestamp":%s,"service":%s,"container_id":%s,"level":%s,"message":%s,"raw":%s,"tags":%s}\n'
+        % (
+            row_id,
+            encode_basestring(timestamp.isoformat()),
+            encode_basestring(service),
+            encode_basestring(container_id),
+            encode_basestring(level),
+            encode_basestring(message),
+            encode_basestring(raw),
+            _tags_text(tags),
+        )
+        for row_id, timestamp, service, container_id, level, message, raw, tags in rows
+    )
+
+
+def _compressor(compression: Optional[str]):
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compressobj()
+    return None
+
+
+def _ndjson(batches: Iterator[Sequence[Any]], compression: Optional[str]) -> Iterator[bytes]:
+    compressor = _compressor(compression)
+    for rows in batches:
+        chunk = ndjson_lines(rows).encode("utf-8")
+        if compressor is None:
+            yield chunk
+            continue
+        chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+class _Drain:
+    """Write-only file object whose contents are taken out after each batch."""
+
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _arrow_schema(pa):
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("service", pa.string()),
+            ("container_id", pa.string()),
+            ("level", pa.string()),
+            ("message", pa.string()),
+            ("raw", pa.string()),
+            ("tags", pa.string()),
+        ]
+    )
+
+
+def _record_batch(pa, schema, rows: Sequence[Any]):
+    columns = list(zip(*rows))
+    columns[7] = [_tags_text(tags) for tags in columns[7]]
+    return pa.RecordBatch.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema)
+
+
+def _arrow(batches: Iterator[Sequence[Any]], fmt: str, compression: Optional[str]) -> Iterator[bytes]:
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    sink = _Drain()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(sink, schema, compression=compression or "snappy")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+        write = writer.write_batch
+    try:
+        for rows in batches:
+            # Each batch becomes one record batch or row group, flushed straight to the client
+            write(_record_batch(pa, schema, rows))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def check_export(fmt: str, compression: Optional[str]) -> None:
+    """Raise :class:`ExportError` for unknown options or a missing optional package."""
+    if fmt not in FORMATS:
+        raise ExportError(f"format must be one of {', '.join(FORMATS)}")
+    if compression and compression not in COMPRESSIONS[fmt]:
+        raise ExportError(f"{fmt} export supports compression {', '.join(sorted(COMPRESSIONS[fmt]))}")
+    packages = []
+    if fmt != "ndjson":
+        packages.append("pyarrow")
+    elif compression == "zstd":
+        packages.append("zstandard")
+    for package in packages:
+        try:
+            __import__(package)
+        except ImportError:
+            raise ExportError(f"{fmt} export{' with ' + compression if compression else ''} requires the {package} package")
+
+
+def export_media(fmt: str, compression: Optional[str]):
+    """Media type and file extension for an export."""
+    media_type, extension = FORMATS[fmt]
+    if fmt == "ndjson" and compression == "gzip":
+        return "application/gzip", f"{extension}.gz"
+    if fmt == "ndjson" and compression == "zstd":
+        return "application/zstd", f"{extension}.zst"
+    return media_type, extension
+
+
+def export_logs(
+    stmt: Select,
+    fmt: str = "ndjson",
+    compression: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Iterator[bytes]:
+    """Encoded chunks of ``stmt``'s rows, one per fetched batch, in constant memory.
+
+    Rows never become ORM objects or Pydantic models: NDJSON lines are
+    formatted straight from the result tuples, and Arrow/Parquet batches
+    are built column-wise from them.
+    """
+    batches = iter_batches(stmt, limit=limit)
+    if fmt == "ndjson":
+        return _ndjson(batches, compression)
+    return _arrow(batches, fmt, compression)
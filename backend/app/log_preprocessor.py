@@ -1,21 +1,12 @@
 ﻿import re
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Tuple
 
-LEVEL_PATTERNS = {
-    "ERROR": [r"\bERROR\b", r"\bERR\b", r"Exception", r"Traceback", r"panic", r"fatal"],
-    "WARN": [r"\bWARN\b", r"\bWARNING\b", r"timeout", r"timed out"],
-    "DEBUG": [r"\bDEBUG\b"],
-    "INFO": [r"\bINFO\b"],
-}
+from .pattern_engine import LEVEL_PATTERNS, classify
 
 
 def infer_level(message: str) -> str:
-    for level, patterns in LEVEL_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, message, re.IGNORECASE):
-                return level
-    return "INFO"
+    return classify(message)[0]
 
 
 def parse_timestamp(ts: str) -> datetime:
@@ -27,6 +18,32 @@ def parse_timestamp(ts: str) -> datetime:
         return datetime.now(timezone.utc)
 
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Docker's RFC3339Nano stamp; trailing zeros of the fraction are trimmed
+_DOCKER_STAMP = re.compile(r"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d{1,9}))?Z ")
+
+
+def timestamp_ns(raw: str, timestamp: datetime) -> int:
+    """Nanoseconds since the epoch of a log line.
+
+    Read from the Docker stamp ``raw`` starts with when there is one, since
+    ``timestamp`` only keeps microseconds and lines from the same microsecond
+    would otherwise tie.
+    """
+    match = _DOCKER_STAMP.match(raw)
+    if match is None:
+        return (ensure_utc(timestamp) - _EPOCH) // timedelta(microseconds=1) * 1000
+    seconds = (datetime.fromisoformat(match.group(1)).replace(tzinfo=timezone.utc) - _EPOCH) // timedelta(seconds=1)
+    return seconds * 1_000_000_000 + int((match.group(2) or "").ljust(9, "0"))
+
+
+def ensure_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything we store is UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
 def normalize_log(
     *,
     timestamp: datetime,
@@ -36,15 +53,17 @@ def normalize_log(
     raw: str,
     tags: Dict[str, Any],
 ) -> Dict[str, Any]:
-    level = infer_level(message)
+    message = message.strip()
+    level, signatures = classify(message)
     return {
         "timestamp": timestamp,
         "service": service,
         "container_id": container_id,
         "level": level,
-        "message": message.strip(),
+        "message": message,
         "raw": raw,
         "tags": tags,
+        "signatures": signatures,
     }
 
 
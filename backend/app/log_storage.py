@@ -0,0 +1,291 @@
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+from .config import settings
+from .db import engine
+from .log_preprocessor import ensure_utc
+from .models import LogEntry, LogPartition, LogRollup
+
+
+RollupKey = Tuple[datetime, str, str]
+
+
+def _minute(value: datetime) -> datetime:
+    return ensure_utc(value).replace(second=0, microsecond=0)
+
+
+def _as_date(value: Any) -> date:
+    # SQLite returns date() as text, Postgres as a date
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _as_datetime(value: Any) -> datetime:
+    return ensure_utc(datetime.fromisoformat(value) if isinstance(value, str) else value)
+
+
+class LogStorage:
+    """Day catalog, retention and per-minute rollups for ``logentry``.
+
+    Logs stay in one table so the FTS index, keyset paging and the ORM keep
+    working; ``logpartition`` only catalogs the id range each UTC day of
+    timestamps occupies, it is not a physical partition. Retention deletes
+    the rows of days older than ``LOG_RETENTION_DAYS`` by walking that range
+    in ``RETENTION_DELETE_BATCH`` sized primary-key range deletes, so it
+    never scans the rows it keeps or holds the write lock for long. It is
+    not a partition drop: every row is deleted (and fires the FTS delete
+    trigger) one by one, so its cost is proportional to the rows removed.
+    The expired logs' vectors are removed from the vector store in the same
+    run. Runs that fail are counted, with the last error, in :meth:`stats`.
+
+    ``logrollup`` keeps row counts per minute, service and level. Both tables
+    are updated by :meth:`record` inside the ingestion transaction, so they
+    always agree with the stored rows; dashboards read rollups instead of
+    paging through raw logs.
+    """
+
+    def __init__(
+        self,
+        retention_days: Optional[int] = None,
+        rollup_retention_days: Optional[int] = None,
+        delete_batch: Optional[int] = None,
+        vector_store=None,
+    ) -> None:
+        self.retention_days = settings.log_retention_days if retention_days is None else retention_days
+        self.rollup_retention_days = (
+            settings.rollup_retention_days if rollup_retention_days is None else rollup_retention_days
+        )
+        self.delete_batch = max(1, delete_batch or settings.retention_delete_batch)
+        self.vector_store = vector_store
+
+        self._stats_lock = threading.Lock()
+        self.retention_runs = 0
+        self.expired_days = 0
+        self.dropped_rows = 0
+        self.dropped_rollups = 0
+        self.dropped_vectors = 0
+        self.last_retention_at: Optional[datetime] = None
+        self.last_retention_ms = 0.0
+        self.retention_failures = 0
+        self.last_retention_error: Optional[str] = None
+
+    def record(self, session: Session, entries: Iterable[LogEntry]) -> None:
+        # Called by the ingestion writer before it commits the batch
+        days: Dict[date, Tuple[int, int, int]] = {}
+        rollups: Counter = Counter()
+        for entry in entries:
+            ts = ensure_utc(entry.timestamp)
+            first_id, last_id, count = days.get(ts.date(), (entry.id, entry.id, 0))
+            days[ts.date()] = (min(first_id, entry.id), max(last_id, entry.id), count + 1)
+            rollups[(_minute(ts), entry.service, entry.level)] += 1
+
+        now = datetime.now(timezone.utc)
+        for day, (first_id, last_id, count) in days.items():
+            partition = session.get(LogPartition, day)
+            if partition is None:
+                partition = LogPartition(day=day, first_id=first_id, last_id=last_id, row_count=0)
+            partition.first_id = min(partition.first_id, first_id)
+            partition.last_id = max(partition.last_id, last_id)
+            partition.row_count += count
+            partition.updated_at = now
+            session.add(partition)
+
+        self._add_rollups(session, rollups)
+
+    def backfill(self) -> None:
+        """Build partitions and rollups for rows stored before they were tracked."""
+        with Session(engine) as session:
+            if session.exec(select(LogPartition.day).limit(1)).first() is not None:
+                return
+            if session.exec(select(LogEntry.id).limit(1)).first() is None:
+                return
+
+            day = func.date(LogEntry.timestamp)
+            partitions = session.exec(
+                select(day, func.min(LogEntry.id), func.max(LogEntry.id), func.count()).group_by(day)
+            )
+            now = datetime.now(timezone.utc)
+            for value, first_id, last_id, count in partitions:
+                session.add(
+                    LogPartition(
+                        day=_as_date(value),
+                        first_id=first_id,
+                        last_id=last_id,
+                        row_count=count,
+                        updated_at=now,
+                    )
+                )
+
+            rollups: Counter = Counter()
+            minute = self._minute_expression()
+            if minute is not None:
+                stmt = select(minute, LogEntry.service, LogEntry.level, func.count()).group_by(
+                    minute, LogEntry.service, LogEntry.level
+                )
+                for bucket, service, level, count in session.exec(stmt):
+                    rollups[(_as_datetime(bucket), service, level)] += count
+            else:
+                stmt = select(LogEntry.timestamp, LogEntry.service, LogEntry.level)
+                for ts, service, level in session.exec(stmt.execution_options(yield_per=5000)):
+                    rollups[(_minute(ts), service, level)] += 1
+            self._add_rollups(session, rollups)
+            session.commit()
+
+    def apply_retention(self, now: Optional[datetime] = None) -> int:
+        """Delete logs and rollups past their retention; returns log rows deleted."""
+        now = now or datetime.now(timezone.utc)
+        started = time.perf_counter()
+        expired_days = dropped_rows = dropped_rollups = dropped_vectors = 0
+
+        if self.retention_days > 0:
+            cutoff_day = (now - timedelta(days=self.retention_days)).date()
+            cutoff = datetime.combine(cutoff_day, datetime.min.time(), tzinfo=timezone.utc)
+            with Session(engine) as session:
+                expired = session.exec(
+                    select(LogPartition).where(LogPartition.day < cutoff_day).order_by(LogPartition.day)
+                ).all()
+            for partition in expired:
+                dropped_rows += self._delete_day(partition, cutoff)
+                expired_days += 1
+            if self.vector_store:
+                # By timestamp rather than by the ids just deleted, so a run
+                # that could not reach the vector store is caught up by the next
+                dropped_vectors = self.vector_store.delete_before(cutoff)
+
+        if self.rollup_retention_days > 0:
+            rollup_cutoff = now - timedelta(days=self.rollup_retention_days)
+            with Session(engine) as session:
+                result = session.exec(delete(LogRollup).where(LogRollup.bucket < rollup_cutoff))
+                session.commit()
+                dropped_rollups = result.rowcount or 0
+
+        with self._stats_lock:
+            self.retention_runs += 1
+            self.expired_days += expired_days
+            self.dropped_rows += dropped_rows
+            self.dropped_rollups += dropped_rollups
+            self.dropped_vectors += dropped_vectors
+            self.last_retention_at = now
+            self.last_retention_ms = (time.perf_counter() - started) * 1000
+        return dropped_rows
+
+    def record_retention_failure(self, exc: Exception) -> None:
+        with self._stats_lock:
+            self.retention_failures += 1
+            self.last_retention_error = f"{type(exc).__name__}: {exc}"
+
+    def stats(self) -> Dict[str, Any]:
+        with Session(engine) as session:
+            oldest, newest, partitions, rows = session.exec(
+                select(
+                    func.min(LogPartition.day),
+                    func.max(LogPartition.day),
+                    func.count(),
+                    func.coalesce(func.sum(LogPartition.row_count), 0),
+                )
+            ).one()
+        with self._stats_lock:
+            return {
+                "retention_days": self.retention_days,
+                "rollup_retention_days": self.rollup_retention_days,
+                "partitions": partitions,
+                "oldest_partition": _as_date(oldest).isoformat() if oldest else None,
+                "newest_partition": _as_date(newest).isoformat() if newest else None,
+                "rows": rows,
+                "retention_runs": self.retention_runs,
+                "expired_days": self.expired_days,
+                "dropped_rows": self.dropped_rows,
+                "dropped_rollups": self.dropped_rollups,
+                "dropped_vectors": self.dropped_vectors,
+                "last_retention_at": self.last_retention_at.isoformat() if self.last_retention_at else None,
+                "last_retention_ms": round(self.last_retention_ms, 3),
+                "retention_failures": self.retention_failures,
+                "last_retention_error": self.last_retention_error,
+            }
+
+    def _delete_day(self, partition: LogPartition, cutoff: datetime) -> int:
+        # Walk the day's id range in chunks; the timestamp guard keeps late
+        # rows of newer days that were assigned ids inside the range.
+        deleted = 0
+        low = partition.first_id
+        while low <= partition.last_id:
+            high = min(low + self.delete_batch - 1, partition.last_id)
+            with Session(engine) as session:
+                result = session.exec(
+                    delete(LogEntry).where(
+                        LogEntry.id >= low,
+                        LogEntry.id <= high,
+                        LogEntry.timestamp < cutoff,
+                    )
+                )
+                session.commit()
+                deleted += result.rowcount or 0
+            low = high + 1
+
+        with Session(engine) as session:
+            # Left in place if late rows extended it meanwhile; the next run picks those up
+            session.exec(
+                delete(LogPartition).where(
+                    LogPartition.day == partition.day,
+                    LogPartition.last_id == partition.last_id,
+                )
+            )
+            session.commit()
+        return deleted
+
+    def _add_rollups(self, session: Session, rollups: Dict[RollupKey, int]) -> None:
+        for (bucket, service, level), count in rollups.items():
+            rollup = session.get(LogRollup, (bucket, service, level))
+            if rollup is None:
+                rollup = LogRollup(bucket=bucket, service=service, level=level, count=0)
+            rollup.count += count
+            session.add(rollup)
+
+    def _minute_expression(self):
+        dialect = engine.dialect.name
+        if dialect == "sqlite":
+            return func.strftime("%Y-%m-%d %H:%M:00", LogEntry.timestamp)
+        if dialect == "postgresql":
+            return func.date_trunc("minute", LogEntry.timestamp)
+        return None
+
+
+def iter_rollups(
+    session: Session,
+    service: Optional[str] = None,
+    level: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket_minutes: int = 1,
+) -> Iterable[Dict[str, Any]]:
+    """Rollup counts in ``[start, end]``, merged into ``bucket_minutes`` wide buckets."""
+    stmt = select(LogRollup)
+    if service:
+        stmt = stmt.where(LogRollup.service == service)
+    if level:
+        stmt = stmt.where(LogRollup.level == level)
+    if start:
+        stmt = stmt.where(LogRollup.bucket >= _minute(start))
+    if end:
+        stmt = stmt.where(LogRollup.bucket <= end)
+    stmt = stmt.order_by(LogRollup.bucket, LogRollup.service, LogRollup.level)
+
+    if bucket_minutes <= 1:
+        for rollup in session.exec(stmt.execution_options(yield_per=5000)):
+            yield {"bucket": ensure_utc(rollup.bucket), "service": rollup.service, "level": rollup.level, "count": rollup.count}
+        return
+
+    width = bucket_minutes * 60
+    merged: Dict[RollupKey, int] = {}
+    for rollup in session.exec(stmt.execution_options(yield_per=5000)):
+        epoch = ensure_utc(rollup.bucket).timestamp()
+        bucket = datetime.fromtimestamp(epoch - epoch % width, tz=timezone.utc)
+        key = (bucket, rollup.service, rollup.level)
+        merged[key] = merged.get(key, 0) + rollup.count
+    for (bucket, service, level), count in merged.items():
+        yield {"bucket": bucket, "service": service, "level": level, "count": count}
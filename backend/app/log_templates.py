@@ -0,0 +1,26 @@
+import re
+
+
+# Order matters: the longest, most specific shapes are masked first
+_MASKS = [
+    ("ts", r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"),
+    ("uuid", r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"),
+    ("ip", r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"),
+    ("hex", r"\b(?:0x)?(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}\b"),
+    ("dur", r"\b\d+(?:\.\d+)?(?:ms|us|µs|ns|s|m|h)\b"),
+    ("num", r"\d+(?:\.\d+)?"),
+]
+
+_MASK_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _MASKS))
+_SPACES = re.compile(r"\s+")
+
+
+def log_template(message: str) -> str:
+    """Mask the variable parts of a log message so lines of the same shape compare equal.
+
+    ``"Request completed in 120ms"`` and ``"Request completed in 87ms"`` both
+    become ``"Request completed in <dur>"``; timestamps, UUIDs, IPs, long hex
+    ids and any remaining numbers are masked the same way.
+    """
+    masked = _MASK_RE.sub(lambda match: f"<{match.lastgroup}>", message)
+    return _SPACES.sub(" ", masked).strip()
@@ -1,22 +1,29 @@
 ﻿import asyncio
-import json
 import threading
 import time
 from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
 
+from .analysis_jobs import AnalysisQueue
 from .config import settings
 from .db import init_db, engine
+from .embedding_worker import EmbeddingWorker
 from .log_collector import DockerLogCollector
 from .models import LogEntry
+from .pattern_engine import classify
 from .routes import router
 from .incident_manager import IncidentManager
-from .sse import LogBroadcaster
+from .ingestion import IngestionPipeline
+from .llm_cache import llm_cache
+from .llm_client import groq_client
+from .log_storage import LogStorage
+from .sse import LogBroadcaster, log_to_event
+from .vector_backfill import VectorBackfill
 from .vector_store import VectorStore
 
 
@@ -27,7 +34,8 @@ app.add_middleware(
     allow_origins=settings.cors_origins or ["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(router)
@@ -48,6 +56,7 @@ def seed_if_empty():
                 message="Service started",
                 raw="Service started",
                 tags={"seed": True},
+                signatures=classify("Service started")[1],
             ),
             LogEntry(
                 timestamp=now,
@@ -57,6 +66,7 @@ def seed_if_empty():
                 message="DB connection refused",
                 raw="DB connection refused",
                 tags={"seed": True},
+                signatures=classify("DB connection refused")[1],
             ),
         ]
         session.add_all(sample)
@@ -68,46 +78,59 @@ async def startup():
     init_db()
     seed_if_empty()
     app.state.loop = asyncio.get_event_loop()
+    groq_client.start()
+    app.state.llm = groq_client
+    llm_cache.open()
+    app.state.llm_cache = llm_cache
     app.state.broadcaster = LogBroadcaster()
     app.state.stop_event = threading.Event()
     app.state.vector_store = VectorStore()
+    app.state.vector_store.start_heartbeat()
+    app.state.analysis_jobs = AnalysisQueue(app.state.vector_store, app.state.broadcaster)
+    await app.state.analysis_jobs.start()
     incident_manager = IncidentManager()
+    with Session(engine) as session:
+        incident_manager.rebuild(session)
     app.state.incident_manager = incident_manager
 
-    with Session(engine) as session:
-        existing_logs = session.exec(select(LogEntry).order_by(LogEntry.id)).all()
-    app.state.vector_store.index_logs(existing_logs)
-
-    def on_log(log_data):
-        with Session(engine) as session:
-            entry = LogEntry(**log_data)
-            session.add(entry)
-            session.commit()
-            session.refresh(entry)
-            event = {
-                "id": entry.id,
-                "timestamp": entry.timestamp.isoformat(),
-                "service": entry.service,
-                "container_id": entry.container_id,
-                "level": entry.level,
-                "message": entry.message,
-                "raw": entry.raw,
-                "tags": entry.tags,
-            }
-
-        app.state.vector_store.index_log(entry)
-
-        if entry.level in {"ERROR", "WARN"}:
+    storage = LogStorage(vector_store=app.state.vector_store)
+    storage.backfill()
+    app.state.storage = storage
+
+    pipeline = IngestionPipeline(storage=storage)
+
+    def publish_batch(entries):
+        if not app.state.loop:
+            return
+        # One hop onto the event loop per batch rather than per entry
+        app.state.loop.call_soon_threadsafe(
+            app.state.broadcaster.publish_many,
+            [log_to_event(entry) for entry in entries],
+        )
+
+    backfill = VectorBackfill(app.state.vector_store)
+    app.state.vector_backfill = backfill
+    embedding_worker = EmbeddingWorker(app.state.vector_store, on_indexed=backfill.advance)
+    embedding_worker.start()
+    app.state.embedding_worker = embedding_worker
+
+    def index_batch(entries):
+        embedding_worker.submit(entries)
+
+    def scan_batch(entries):
+        incident_manager.observe(entries)
+        if any(entry.level in {"ERROR", "WARN"} for entry in entries):
             with Session(engine) as session:
                 incident_manager.scan(session)
 
-        if app.state.loop:
-            asyncio.run_coroutine_threadsafe(
-                app.state.broadcaster.publish(event),
-                app.state.loop,
-            )
+    pipeline.add_listener(publish_batch)
+    pipeline.add_listener(index_batch)
+    pipeline.add_listener(scan_batch)
+    pipeline.start()
+    app.state.ingestion = pipeline
+    backfill.start()
 
-    collector = DockerLogCollector(on_log=on_log)
+    collector = DockerLogCollector(on_log=pipeline.submit, try_log=pipeline.offer)
     collector.start()
     app.state.collector = collector
 
@@ -121,28 +144,61 @@ async def startup():
     thread.start()
     app.state.incident_thread = thread
 
+    def retention_loop():
+        while not app.state.stop_event.is_set():
+            try:
+                storage.apply_retention()
+            except Exception as exc:
+                storage.record_retention_failure(exc)
+            app.state.stop_event.wait(settings.retention_interval)
+
+    retention_thread = threading.Thread(target=retention_loop, daemon=True)
+    retention_thread.start()
+    app.state.retention_thread = retention_thread
+
 
 @app.on_event("shutdown")
 async def shutdown():
     app.state.stop_event.set()
     app.state.collector.stop()
+    app.state.ingestion.stop()
+    app.state.vector_backfill.stop()
+    app.state.embedding_worker.stop()
+    app.state.vector_store.stop_heartbeat()
+    await app.state.analysis_jobs.stop()
+    await app.state.llm.close()
+    app.state.llm_cache.close()
 
 
 @app.get("/api/stream/logs")
-async def stream_logs(service: Optional[str] = None, level: Optional[str] = None):
+async def stream_logs(
+    service: Optional[str] = None,
+    level: Optional[str] = None,
+    batch_ms: int = Query(0, ge=0, le=5000),
+    last_event_id: Optional[str] = Header(None),
+):
     broadcaster: LogBroadcaster = app.state.broadcaster
-    queue = await broadcaster.subscribe()
+    # Filtering happens in the broadcaster; named events (analysis jobs) reach
+    # every subscriber but never EventSource.onmessage
+    subscription = broadcaster.subscribe(service=service, level=level)
+    replay, truncated = [], False
+    if last_event_id and last_event_id.strip().isdigit():
+        try:
+            replay, truncated = await broadcaster.resume(subscription, int(last_event_id))
+        except BaseException:
+            broadcaster.unsubscribe(subscription)
+            raise
 
     async def event_generator():
         try:
-            while True:
-                event = await queue.get()
-                if service and event.get("service") != service:
-                    continue
-                if level and event.get("level") != level:
-                    continue
-                yield f"data: {json.dumps(event)}\n\n"
+            for frame in replay:
+                yield frame
+            if truncated:
+                # The browser reconnects with the last id it got and resumes from there
+                return
+            async for frame in subscription.frames(batch_ms / 1000.0):
+                yield frame
         finally:
-            await broadcaster.unsubscribe(queue)
+            broadcaster.unsubscribe(subscription)
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
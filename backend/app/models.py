@@ -1,11 +1,13 @@
-﻿from datetime import datetime
+﻿from datetime import date, datetime
 from typing import Optional, List, Dict, Any
 
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON
 
 
 class LogEntry(SQLModel, table=True):
+    __table_args__ = (Index("ix_logentry_timestamp_id", "timestamp", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     timestamp: datetime = Field(index=True)
     service: str = Field(index=True)
@@ -14,9 +16,12 @@ class LogEntry(SQLModel, table=True):
     message: str
     raw: str
     tags: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    signatures: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))
 
 
 class Incident(SQLModel, table=True):
+    __table_args__ = (Index("ix_incident_updated_at_id", "updated_at", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(index=True)
     updated_at: datetime = Field(index=True)
@@ -31,3 +36,59 @@ class Incident(SQLModel, table=True):
     ai_confidence: Optional[float] = None
     ai_actions: List[str] = Field(default_factory=list, sa_column=Column(JSON))
     ai_related_signals: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+
+
+class IncidentService(SQLModel, table=True):
+    # One row per (incident, service) so service filters can use an index
+    __table_args__ = (Index("ix_incidentservice_service_incident_id", "service", "incident_id"),)
+
+    incident_id: int = Field(foreign_key="incident.id", primary_key=True)
+    service: str = Field(primary_key=True)
+
+
+class CollectorCursor(SQLModel, table=True):
+    container_id: str = Field(primary_key=True)
+    last_timestamp: datetime
+    updated_at: Optional[datetime] = None
+    # Docker stamps lines in nanoseconds; last_timestamp only keeps microseconds
+    last_timestamp_ns: Optional[int] = None
+
+
+class IndexCheckpoint(SQLModel, table=True):
+    # High-water mark of a background indexing job: every log id <= last_id is done
+    name: str = Field(primary_key=True)
+    last_id: int = 0
+    updated_at: Optional[datetime] = None
+
+
+class LogPartition(SQLModel, table=True):
+    # One row per UTC day of log timestamps; ids of that day's rows lie in [first_id, last_id]
+    day: date = Field(primary_key=True)
+    first_id: int
+    last_id: int
+    row_count: int = 0
+    updated_at: Optional[datetime] = None
+
+
+class LogRollup(SQLModel, table=True):
+    bucket: datetime = Field(primary_key=True)
+    service: str = Field(primary_key=True)
+    level: str = Field(primary_key=True)
+    count: int = 0
+
+
+class AnalysisJob(SQLModel, table=True):
+    # AI analysis run in the background; kind is "incident" (incident_id) or "logs" (log_ids)
+    __table_args__ = (Index("ix_analysisjob_status_id", "status", "id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str
+    incident_id: Optional[int] = Field(default=None, index=True)
+    log_ids: List[int] = Field(default_factory=list, sa_column=Column(JSON))
+    force: bool = False
+    status: str = Field(default="queued")
+    result: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,143 @@
+import re
+from typing import Dict, FrozenSet, List, Optional, Pattern, Set, Tuple
+
+
+LEVEL_PATTERNS = {
+    "ERROR": [r"\bERROR\b", r"\bERR\b", r"Exception", r"Traceback", r"panic", r"fatal"],
+    "WARN": [r"\bWARN\b", r"\bWARNING\b", r"timeout", r"timed out"],
+    "DEBUG": [r"\bDEBUG\b"],
+    "INFO": [r"\bINFO\b"],
+}
+
+# Signature ids are stored on each LogEntry so detection never re-reads message text
+SIGNATURE_PATTERNS = {
+    "db_connection_refused": r"db connection refused",
+    "timeout": r"timeout",
+    "out_of_memory": r"out of memory|oom",
+    "port_in_use": r"address already in use|port .* in use",
+    "restart": r"restart|crash|exited",
+}
+
+DEFAULT_LEVEL = "INFO"
+
+_REGEX_META = set(".^$*+?{}[]()\\")
+
+
+def _required_literals(pattern: str) -> Optional[List[str]]:
+    """Lowercase substrings of which at least one must occur for ``pattern`` to match.
+
+    Only understands plain literals, ``\\b``, ``.*`` and top-level ``|``;
+    returns ``None`` for anything else so the pattern is always evaluated.
+    """
+    literals: List[str] = []
+    for branch in pattern.split("|"):
+        pieces = branch.replace(r"\b", "").split(".*")
+        if any(char in _REGEX_META for piece in pieces for char in piece):
+            return None
+        literal = max(pieces, key=len).lower()
+        if not literal.strip():
+            return None
+        literals.append(literal)
+    return literals
+
+
+class PatternEngine:
+    """Classifies a message against every level and signature rule in one regex.
+
+    All rules are compiled into a single case-insensitive alternation with one
+    named group per distinct pattern. Rules sharing the same pattern text (such
+    as ``timeout`` for both WARN and the timeout signature) share a group, so a
+    single hit resolves all of them. The alternation reports one group per
+    position, so on each hit the other candidate patterns are tried anchored
+    at the same position, and the scan resumes one character later, which
+    also catches matches nested inside a previous one.
+
+    A literal prefilter runs first: each pattern's required substrings are
+    checked against the lowercased message, and only the groups that can
+    possibly match are kept in the alternation (compiled once per distinct
+    candidate set). Lines with no candidates never reach the regex engine.
+    """
+
+    def __init__(
+        self,
+        level_patterns: Dict[str, List[str]],
+        signature_patterns: Dict[str, str],
+    ) -> None:
+        self.levels = list(level_patterns)
+        sources: Dict[str, Tuple[Optional[int], List[str]]] = {}
+        for rank, patterns in enumerate(level_patterns.values()):
+            for pattern in patterns:
+                level_rank, signatures = sources.get(pattern, (None, []))
+                sources[pattern] = (rank if level_rank is None else min(level_rank, rank), signatures)
+        for signature_id, pattern in signature_patterns.items():
+            level_rank, signatures = sources.get(pattern, (None, []))
+            sources[pattern] = (level_rank, signatures + [signature_id])
+
+        self._groups: Dict[str, Tuple[Optional[int], List[str]]] = {}
+        self._sources: Dict[str, str] = {}
+        self._patterns: Dict[str, Pattern[str]] = {}
+        self._literals: List[Tuple[str, str]] = []
+        self._unfiltered: List[str] = []
+        for index, (pattern, rules) in enumerate(sources.items()):
+            name = f"p{index}"
+            self._groups[name] = rules
+            self._sources[name] = pattern
+            self._patterns[name] = re.compile(pattern, re.IGNORECASE)
+            literals = _required_literals(pattern)
+            if literals is None:
+                self._unfiltered.append(name)
+            else:
+                self._literals.extend((literal, name) for literal in literals)
+        self._regex_cache: Dict[FrozenSet[str], Tuple[Pattern[str], List[str]]] = {}
+        self._signature_order = {signature_id: index for index, signature_id in enumerate(signature_patterns)}
+
+    def _compile(self, names: FrozenSet[str]) -> Tuple[Pattern[str], List[str]]:
+        # Keep declaration order so alternation priority is stable across subsets
+        ordered = [name for name in self._groups if name in names]
+        alternatives = [f"(?P<{name}>{self._sources[name]})" for name in ordered]
+        return re.compile("|".join(alternatives), re.IGNORECASE), ordered
+
+    def _candidates(self, message: str) -> Optional[Tuple[Pattern[str], List[str]]]:
+        lowered = message.lower()
+        names = frozenset([name for literal, name in self._literals if literal in lowered] + self._unfiltered)
+        if not names:
+            return None
+        candidates = self._regex_cache.get(names)
+        if candidates is None:
+            candidates = self._regex_cache[names] = self._compile(names)
+        return candidates
+
+    def classify(self, message: str) -> Tuple[str, List[str]]:
+        level_rank: Optional[int] = None
+        signatures: List[str] = []
+        candidates = self._candidates(message)
+        if candidates is None:
+            return DEFAULT_LEVEL, signatures
+        regex, names = candidates
+        search = regex.search
+        hits: Set[str] = set()
+        match = search(message)
+        while match and len(hits) < len(names):
+            start = match.start()
+            hits.add(match.lastgroup)
+            for name in names:
+                if name not in hits and self._patterns[name].match(message, start):
+                    hits.add(name)
+            match = search(message, start + 1)
+
+        for name in hits:
+            rank, matched = self._groups[name]
+            if rank is not None and (level_rank is None or rank < level_rank):
+                level_rank = rank
+            signatures.extend(matched)
+
+        level = self.levels[level_rank] if level_rank is not None else DEFAULT_LEVEL
+        signatures.sort(key=self._signature_order.__getitem__)
+        return level, signatures
+
+
+_default_engine = PatternEngine(LEVEL_PATTERNS, SIGNATURE_PATTERNS)
+
+
+def classify(message: str) -> Tuple[str, List[str]]:
+    return _default_engine.classify(message)
@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from .config import settings
+from .llm_client import estimate_tokens
+from .log_templates import log_template
+from .models import LogEntry
+from .vector_store import RagMatch
+
+
+# Lower sorts first when the budget forces a choice
+_LEVEL_PRIORITY = {"FATAL": 0, "CRITICAL": 0, "ERROR": 0, "WARN": 1, "WARNING": 1}
+
+
+@dataclass
+class EvidenceGroup:
+    service: str
+    level: str
+    template: str
+    message: str
+    count: int
+    first_seen: datetime
+    last_seen: datetime
+
+
+def _clip(message: str, limit: int) -> str:
+    message = " ".join(message.split())
+    return message if len(message) <= limit else message[: limit - 3] + "..."
+
+
+def group_logs(logs: Iterable[LogEntry]) -> List[EvidenceGroup]:
+    """Collapse logs of the same service, level and message template, in first-seen order."""
+    groups: dict = {}
+    for log in sorted(logs, key=lambda log: log.timestamp):
+        key = (log.service, log.level, log_template(log.message))
+        group = groups.get(key)
+        if group is None:
+            groups[key] = EvidenceGroup(
+                service=log.service,
+                level=log.level,
+                template=key[2],
+                message=log.message,
+                count=1,
+                first_seen=log.timestamp,
+                last_seen=log.timestamp,
+            )
+        else:
+            group.count += 1
+            group.last_seen = log.timestamp
+    return list(groups.values())
+
+
+def render_group(group: EvidenceGroup, max_chars: int) -> str:
+    message = _clip(group.message, max_chars)
+    if group.count == 1:
+        return f"[{group.first_seen.isoformat()}] {group.service} {group.level}: {message}"
+    return (
+        f"{group.service} {group.level}: {message} "
+        f"(x{group.count}, first seen {group.first_seen.isoformat()}, last seen {group.last_seen.isoformat()})"
+    )
+
+
+def _fit(candidates: Sequence[Tuple[tuple, int, str]], budget: int) -> Tuple[List[str], int]:
+    """Keep the best-ranked lines that fit ``budget`` tokens, returned in their original order."""
+    kept: List[Tuple[int, str]] = []
+    used = 0
+    for _, position, line in sorted(candidates, key=lambda candidate: candidate[0]):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            continue
+        kept.append((position, line))
+        used += cost
+    kept.sort()
+    return [line for _, line in kept], used
+
+
+def evidence_section(logs: Sequence[LogEntry], budget: int, max_chars: Optional[int] = None) -> Tuple[str, int, Set[str]]:
+    """Deduplicated evidence lines within ``budget`` tokens.
+
+    Repeats collapse into one ``xN, first seen / last seen`` line. When not
+    everything fits, errors beat warnings beat the rest, and among equals
+    the shapes seen fewest times (the novel ones) and then the most recent
+    win. Returns the text, its token estimate and the templates it covers.
+    """
+    max_chars = max_chars or settings.prompt_max_line_chars
+    groups = group_logs(logs)
+    candidates = [
+        (
+            (_LEVEL_PRIORITY.get(group.level.upper(), 2), group.count, -group.last_seen.timestamp()),
+            position,
+            render_group(group, max_chars),
+        )
+        for position, group in enumerate(groups)
+    ]
+    lines, used = _fit(candidates, budget)
+    omitted = len(groups) - len(lines)
+    if omitted:
+        lines.append(f"... {omitted} more distinct log shapes omitted")
+    return "\n".join(lines), used, {group.template for group in groups}
+
+
+def context_section(
+    rag_matches: Sequence[RagMatch],
+    budget: int,
+    skip_templates: Optional[Set[str]] = None,
+    max_chars: Optional[int] = None,
+) -> Tuple[str, int]:
+    """Retrieved context lines within ``budget`` tokens, best match first.
+
+    Lines whose template already appears in the direct evidence, or earlier
+    in the context, add nothing and are dropped.
+    """
+    max_chars = max_chars or settings.prompt_max_line_chars
+    seen = set(skip_templates or ())
+    candidates = []
+    for position, match in enumerate(rag_matches):
+        template = log_template(match.message)
+        if template in seen:
+            continue
+        seen.add(template)
+        line = (
+            f"[score={match.score:.3f}] [{match.timestamp}] {match.service} {match.level}: "
+            f"{_clip(match.message, max_chars)}"
+        )
+        candidates.append(((position,), position, line))
+    lines, used = _fit(candidates, budget)
+    return "\n".join(lines), used
+
+
+def build_sections(
+    logs: Sequence[LogEntry],
+    rag_matches: Optional[Sequence[RagMatch]] = None,
+    budget: Optional[int] = None,
+) -> Tuple[str, str]:
+    """Evidence and retrieved-context sections sharing ``PROMPT_TOKEN_BUDGET``.
+
+    Evidence may use up to two thirds of the budget; the context gets the
+    rest, including whatever the evidence left unused.
+    """
+    budget = budget or settings.prompt_token_budget
+    evidence, used, templates = evidence_section(logs, budget * 2 // 3)
+    context, _ = context_section(rag_matches or [], budget - used, skip_templates=templates)
+    return evidence, context
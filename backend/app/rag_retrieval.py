@@ -0,0 +1,130 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlmodel import Session, select
+
+from .config import settings
+from .db import engine
+from .log_templates import log_template
+from .models import LogEntry
+from .search_index import apply_keyword_search
+from .vector_store import RagMatch
+
+
+def lexical_matches(
+    session: Session,
+    *,
+    query_text: str,
+    services: Optional[Iterable[str]] = None,
+    exclude_ids: Optional[Set[int]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 20,
+) -> List[RagMatch]:
+    """Full-text matches on the distinctive words of ``query_text``, best first."""
+    stmt = select(LogEntry)
+    services = set(services or [])
+    if services:
+        stmt = stmt.where(LogEntry.service.in_(services))
+    if exclude_ids:
+        stmt = stmt.where(LogEntry.id.not_in(exclude_ids))
+    if start:
+        stmt = stmt.where(LogEntry.timestamp >= start)
+    if end:
+        stmt = stmt.where(LogEntry.timestamp <= end)
+    stmt = apply_keyword_search(stmt, query_text)
+    if stmt is None:
+        return []
+    try:
+        logs = session.exec(stmt.limit(limit)).all()
+    except Exception:
+        return []
+    return [
+        RagMatch(
+            log_id=log.id,
+            score=0.0,
+            service=log.service,
+            level=log.level,
+            timestamp=log.timestamp.isoformat(),
+            message=log.message,
+            container_id=log.container_id,
+        )
+        for log in logs
+    ]
+
+
+def fuse(rankings: List[List[RagMatch]], limit: int, k: int = 60) -> List[RagMatch]:
+    """Reciprocal-rank fusion of several ranked lists, one match per template.
+
+    Each log scores ``sum(1 / (k + rank))`` over the lists it appears in and
+    keeps that as its ``score``. Lines of the same service and message
+    template add nothing new to a prompt, so only the best of them is kept.
+    """
+    scores: Dict[int, float] = {}
+    matches: Dict[int, RagMatch] = {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking, start=1):
+            scores[match.log_id] = scores.get(match.log_id, 0.0) + 1.0 / (k + rank)
+            matches.setdefault(match.log_id, match)
+
+    fused: List[RagMatch] = []
+    seen: Set[Tuple[str, str]] = set()
+    for log_id in sorted(scores, key=lambda log_id: (-scores[log_id], -log_id)):
+        match = matches[log_id]
+        key = (match.service, log_template(match.message))
+        if key in seen:
+            continue
+        seen.add(key)
+        match.score = round(scores[log_id], 6)
+        fused.append(match)
+        if len(fused) >= limit:
+            break
+    return fused
+
+
+def retrieve_context(
+    vector_store,
+    *,
+    query_text: str,
+    services: Optional[Iterable[str]] = None,
+    exclude_ids: Optional[Set[int]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[RagMatch]:
+    """Historical log lines to ground an analysis prompt in.
+
+    With ``RAG_MODE=hybrid`` the dense vector search and a full-text search
+    on the exact error codes, hosts and frames in the query each return
+    ``RAG_CANDIDATES`` matches, fused by :func:`fuse`. Either side alone still
+    yields context when the other is unavailable. ``RAG_MODE=dense`` keeps
+    the vector search only. Call it without a session open: the full-text
+    side uses its own short session once the vector search has returned.
+    """
+    limit = limit or settings.rag_context_limit
+    services = set(services or [])
+    exclude_ids = set(exclude_ids or [])
+    if settings.rag_mode != "hybrid":
+        if not vector_store:
+            return []
+        return vector_store.search_related_logs(
+            query_text=query_text, services=services, exclude_ids=exclude_ids, start=start, end=end, limit=limit
+        )
+
+    candidates = max(limit, settings.rag_candidates)
+    dense: List[RagMatch] = []
+    if vector_store:
+        dense = vector_store.search_related_logs(
+            query_text=query_text, services=services, exclude_ids=exclude_ids, start=start, end=end, limit=candidates
+        )
+    with Session(engine) as session:
+        lexical = lexical_matches(
+            session,
+            query_text=query_text,
+            services=services,
+            exclude_ids=exclude_ids,
+            start=start,
+            end=end,
+            limit=candidates,
+        )
+    return fuse([dense, lexical], limit=limit, k=settings.rag_rrf_k)
@@ -1,27 +1,31 @@
-﻿from datetime import datetime
-from typing import List, Optional
+﻿import base64
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, Query, HTTPException, Request
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import exists, or_, tuple_
 from sqlmodel import Session, select
 
 from .db import get_session
-from .models import LogEntry, Incident
+from .models import AnalysisJob, LogEntry, Incident, IncidentService
 from .schemas import (
+    AnalysisJobRead,
     LogEntryRead,
+    LogRollupRead,
     IncidentRead,
     IncidentAnalyzeResponse,
     ContainerInfo,
     LogSelectionAnalyzeRequest,
     LogSelectionAnalyzeResponse,
 )
-from .ai_analyzer import (
-    analyze_incident,
-    analyze_log_selection,
-    build_log_selection_query,
-    build_retrieval_query,
-)
+from .analysis_jobs import AnalysisQueueFull, job_to_event, run_incident_analysis, run_log_analysis
 from .config import settings
+from .log_export import ExportError, check_export, export_logs, export_media, export_statement
+from .log_storage import iter_rollups
+from .search_index import apply_log_search
 
 
 router = APIRouter(prefix="/api")
@@ -36,6 +40,20 @@ def _parse_dt(value: Optional[str]) -> Optional[datetime]:
         return None
 
 
+def _encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/health")
 def health(request: Request):
     vector_store = getattr(request.app.state, "vector_store", None)
@@ -50,6 +68,7 @@ def health(request: Request):
         "vectordb": {
             "enabled": settings.vector_enabled,
             "provider": "qdrant",
+            "backend": vector_store.active_backend() if vector_store else None,
             "url": settings.qdrant_url,
             "collection": settings.vector_collection,
             "model": settings.vector_model,
@@ -58,6 +77,44 @@ def health(request: Request):
     }
 
 
+@router.get("/metrics")
+async def metrics(request: Request):
+    # The broadcaster's subscriber sets change on the event loop, so its
+    # snapshot is taken here; the other components may block on locks or
+    # the database and are read on a worker thread
+    broadcaster = getattr(request.app.state, "broadcaster", None)
+    stream = broadcaster.stats() if broadcaster else None
+    return {
+        "time": datetime.utcnow().isoformat(),
+        **await asyncio.to_thread(_component_stats, request.app.state),
+        "stream": stream,
+    }
+
+
+def _component_stats(state) -> Dict[str, Any]:
+    ingestion = getattr(state, "ingestion", None)
+    collector = getattr(state, "collector", None)
+    inventory = getattr(collector, "inventory", None)
+    storage = getattr(state, "storage", None)
+    backfill = getattr(state, "vector_backfill", None)
+    embedding = getattr(state, "embedding_worker", None)
+    vector_store = getattr(state, "vector_store", None)
+    llm = getattr(state, "llm", None)
+    llm_cache = getattr(state, "llm_cache", None)
+    analysis_jobs = getattr(state, "analysis_jobs", None)
+    return {
+        "ingestion": ingestion.stats() if ingestion else None,
+        "containers": inventory.stats() if inventory else None,
+        "storage": storage.stats() if storage else None,
+        "vector_backfill": backfill.stats() if backfill else None,
+        "embedding": embedding.stats() if embedding else None,
+        "vectors": vector_store.stats() if vector_store else None,
+        "llm": llm.stats() if llm else None,
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "analysis_jobs": analysis_jobs.stats() if analysis_jobs else None,
+    }
+
+
 @router.get("/containers", response_model=List[ContainerInfo])
 def containers(request: Request):
     collector = request.app.state.collector
@@ -66,46 +123,146 @@ def containers(request: Request):
 
 @router.get("/logs", response_model=List[LogEntryRead])
 def logs(
+    response: Response,
     service: Optional[str] = None,
     level: Optional[str] = None,
     q: Optional[str] = None,
     start: Optional[str] = None,
     end: Optional[str] = None,
+    order: str = Query("time", pattern="^(time|relevance)$"),
     limit: int = Query(200, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
 ):
+    if cursor and order == "relevance":
+        raise HTTPException(status_code=400, detail="cursor pagination requires order=time")
+
     stmt = select(LogEntry)
     if service:
         stmt = stmt.where(LogEntry.service == service)
     if level:
         stmt = stmt.where(LogEntry.level == level)
-    if q:
-        pattern = f"%{q.strip()}%"
-        stmt = stmt.where(
-            or_(
-                LogEntry.message.ilike(pattern),
-                LogEntry.raw.ilike(pattern),
-                LogEntry.service.ilike(pattern),
-                LogEntry.level.ilike(pattern),
-                LogEntry.container_id.ilike(pattern),
-            )
-        )
     start_dt = _parse_dt(start)
     end_dt = _parse_dt(end)
     if start_dt:
         stmt = stmt.where(LogEntry.timestamp >= start_dt)
     if end_dt:
         stmt = stmt.where(LogEntry.timestamp <= end_dt)
+    if q and q.strip():
+        stmt = apply_log_search(stmt, q, by_relevance=order == "relevance")
+    if cursor:
+        # Keyset pagination: seek past the last row of the previous page on (timestamp, id)
+        stmt = stmt.where(tuple_(LogEntry.timestamp, LogEntry.id) < _decode_cursor(cursor))
+
+    stmt = stmt.order_by(LogEntry.timestamp.desc(), LogEntry.id.desc())
+    results = session.exec(stmt.offset(0 if cursor else offset).limit(limit)).all()
+    if order == "time" and len(results) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(results[-1].timestamp, results[-1].id)
+    return results
 
-    stmt = stmt.order_by(LogEntry.timestamp.desc()).offset(offset).limit(limit)
-    return session.exec(stmt).all()
+
+@router.get("/logs/rollups", response_model=List[LogRollupRead])
+def log_rollups(
+    service: Optional[str] = None,
+    level: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    bucket_minutes: int = Query(1, ge=1, le=1440),
+    session: Session = Depends(get_session),
+):
+    return list(
+        iter_rollups(
+            session,
+            service=service,
+            level=level,
+            start=_parse_dt(start),
+            end=_parse_dt(end),
+            bucket_minutes=bucket_minutes,
+        )
+    )
 
 
-@router.post("/logs/analyze", response_model=LogSelectionAnalyzeResponse)
+@router.get("/logs/export")
+def log_export(
+    service: Optional[str] = None,
+    level: Optional[str] = None,
+    q: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    format: str = "ndjson",
+    compression: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+):
+    try:
+        check_export(format, compression)
+    except ExportError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    stmt = export_statement(service, level, _parse_dt(start), _parse_dt(end), q)
+    media_type, extension = export_media(format, compression)
+    filename = f"logs-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.{extension}"
+    return StreamingResponse(
+        export_logs(stmt, format, compression, limit=limit),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+async def _submit_job(request: Request, kind: str, **values) -> JSONResponse:
+    jobs = getattr(request.app.state, "analysis_jobs", None)
+    if not jobs:
+        raise HTTPException(status_code=503, detail="Background analysis is not available")
+    try:
+        job = await jobs.submit(kind, **values)
+    except AnalysisQueueFull:
+        raise HTTPException(status_code=503, detail="Analysis queue is full, retry later")
+    return JSONResponse(status_code=202, content=job_to_event(job))
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream_analysis(run, not_found: str) -> StreamingResponse:
+    """Run ``run(on_partial)`` and report it as ``partial`` events and one ``result`` or ``error``.
+
+    The analysis is not cancelled if the client goes away, so its result is
+    still cached and stored.
+    """
+
+    async def events():
+        partials: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(run(partials.put_nowait))
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        while not task.done():
+            getter = asyncio.ensure_future(partials.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield _sse("partial", getter.result())
+            else:
+                getter.cancel()
+        while not partials.empty():
+            yield _sse("partial", partials.get_nowait())
+        try:
+            result = task.result()
+        except Exception as exc:
+            yield _sse("error", {"detail": str(exc) or type(exc).__name__})
+            return
+        if result is None:
+            yield _sse("error", {"detail": not_found})
+        else:
+            yield _sse("result", result.model_dump(mode="json"))
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.post("/logs/analyze", response_model=LogSelectionAnalyzeResponse, responses={202: {"model": AnalysisJobRead}})
 async def analyze_logs(
     payload: LogSelectionAnalyzeRequest,
     request: Request,
+    force: bool = False,
+    background: bool = False,
+    stream: bool = False,
     session: Session = Depends(get_session),
 ):
     log_ids = [log_id for log_id in payload.log_ids if isinstance(log_id, int)]
@@ -114,33 +271,29 @@ async def analyze_logs(
     if len(log_ids) > 50:
         raise HTTPException(status_code=400, detail="Select at most 50 logs per analysis")
 
-    logs = session.exec(select(LogEntry).where(LogEntry.id.in_(log_ids))).all()
-    if not logs:
-        raise HTTPException(status_code=404, detail="Selected logs not found")
+    if background or stream:
+        if not session.exec(select(LogEntry.id).where(LogEntry.id.in_(log_ids)).limit(1)).first():
+            raise HTTPException(status_code=404, detail="Selected logs not found")
+        session.close()
+    if background:
+        return await _submit_job(request, "logs", log_ids=log_ids, force=force)
 
-    logs = sorted(logs, key=lambda log: log.timestamp)
     vector_store = getattr(request.app.state, "vector_store", None)
-    rag_matches = []
-    if vector_store:
-        rag_matches = vector_store.search_related_logs(
-            query_text=build_log_selection_query(logs),
-            services={log.service for log in logs},
-            exclude_ids={log.id for log in logs if log.id is not None},
-            limit=settings.rag_context_limit,
+    if stream:
+        return _stream_analysis(
+            lambda on_partial: run_log_analysis(vector_store, log_ids, force=force, on_partial=on_partial),
+            "Selected logs not found",
         )
 
-    result = await analyze_log_selection(logs, rag_matches=rag_matches)
-    return LogSelectionAnalyzeResponse(
-        summary=result.get("summary"),
-        likely_root_cause=result.get("likely_root_cause"),
-        confidence=result.get("confidence"),
-        recommended_actions=result.get("recommended_actions", []),
-        related_signals=result.get("related_signals", []),
-    )
+    result = await run_log_analysis(vector_store, log_ids, force=force)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Selected logs not found")
+    return result
 
 
 @router.get("/incidents", response_model=List[IncidentRead])
 def incidents(
+    response: Response,
     status: Optional[str] = None,
     severity: Optional[str] = None,
     service: Optional[str] = None,
@@ -149,6 +302,7 @@ def incidents(
     end: Optional[str] = None,
     limit: int = Query(200, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
 ):
     stmt = select(Incident)
@@ -156,6 +310,10 @@ def incidents(
         stmt = stmt.where(Incident.status == status)
     if severity:
         stmt = stmt.where(Incident.severity == severity)
+    if service:
+        stmt = stmt.where(
+            exists().where(IncidentService.incident_id == Incident.id, IncidentService.service == service)
+        )
     if q:
         pattern = f"%{q.strip()}%"
         stmt = stmt.where(
@@ -164,6 +322,7 @@ def incidents(
                 Incident.signature.ilike(pattern),
                 Incident.severity.ilike(pattern),
                 Incident.status.ilike(pattern),
+                exists().where(IncidentService.incident_id == Incident.id, IncidentService.service.ilike(pattern)),
             )
         )
     start_dt = _parse_dt(start)
@@ -173,27 +332,14 @@ def incidents(
     if end_dt:
         stmt = stmt.where(Incident.updated_at <= end_dt)
 
-    stmt = stmt.order_by(Incident.updated_at.desc())
-    results = session.exec(stmt).all()
-    if service:
-        results = [incident for incident in results if service in incident.services]
-    if q:
-        term = q.strip().lower()
-        results = [
-            incident
-            for incident in results
-            if any(
-                term in (field or '').lower()
-                for field in [
-                    incident.title,
-                    incident.signature,
-                    incident.severity,
-                    incident.status,
-                    ' '.join(incident.services or []),
-                ]
-            )
-        ]
-    return results[offset : offset + limit]
+    if cursor:
+        stmt = stmt.where(tuple_(Incident.updated_at, Incident.id) < _decode_cursor(cursor))
+
+    stmt = stmt.order_by(Incident.updated_at.desc(), Incident.id.desc())
+    results = session.exec(stmt.offset(0 if cursor else offset).limit(limit)).all()
+    if len(results) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(results[-1].updated_at, results[-1].id)
+    return results
 
 
 @router.get("/incidents/{incident_id}", response_model=IncidentRead)
@@ -204,42 +350,57 @@ def incident_detail(incident_id: int, session: Session = Depends(get_session)):
     return incident
 
 
-@router.post("/incidents/{incident_id}/analyze", response_model=IncidentAnalyzeResponse)
-async def analyze(incident_id: int, request: Request, session: Session = Depends(get_session)):
-    incident = session.get(Incident, incident_id)
-    if not incident:
-        raise HTTPException(status_code=404, detail="Incident not found")
-
-    logs: List[LogEntry] = []
-    if incident.evidence_log_ids:
-        logs = session.exec(select(LogEntry).where(LogEntry.id.in_(incident.evidence_log_ids))).all()
+@router.post(
+    "/incidents/{incident_id}/analyze",
+    response_model=IncidentAnalyzeResponse,
+    responses={202: {"model": AnalysisJobRead}},
+)
+async def analyze(
+    incident_id: int,
+    request: Request,
+    force: bool = False,
+    background: bool = False,
+    stream: bool = False,
+    session: Session = Depends(get_session),
+):
+    if background or stream:
+        if not session.get(Incident, incident_id):
+            raise HTTPException(status_code=404, detail="Incident not found")
+        session.close()
+    if background:
+        return await _submit_job(request, "incident", incident_id=incident_id, force=force)
 
     vector_store = getattr(request.app.state, "vector_store", None)
-    rag_matches = []
-    if vector_store:
-        rag_matches = vector_store.search_related_logs(
-            query_text=build_retrieval_query(incident, logs),
-            services=incident.services,
-            exclude_ids=set(incident.evidence_log_ids or []),
-            limit=settings.rag_context_limit,
+    if stream:
+        return _stream_analysis(
+            lambda on_partial: run_incident_analysis(vector_store, incident_id, force=force, on_partial=on_partial),
+            "Incident not found",
         )
 
-    result = await analyze_incident(incident, logs, rag_matches=rag_matches)
-    incident.ai_summary = result.get("summary")
-    incident.ai_root_cause = result.get("likely_root_cause")
-    incident.ai_confidence = result.get("confidence")
-    incident.ai_actions = result.get("recommended_actions", [])
-    incident.ai_related_signals = result.get("related_signals", [])
-    session.add(incident)
-    session.commit()
-    session.refresh(incident)
-
-    return IncidentAnalyzeResponse(
-        id=incident.id,
-        ai_summary=incident.ai_summary,
-        ai_root_cause=incident.ai_root_cause,
-        ai_confidence=incident.ai_confidence,
-        ai_actions=incident.ai_actions,
-        ai_related_signals=incident.ai_related_signals,
-        status=incident.status,
-    )
+    result = await run_incident_analysis(vector_store, incident_id, force=force)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return result
+
+
+@router.get("/analysis/jobs", response_model=List[AnalysisJobRead])
+def analysis_job_list(
+    status: Optional[str] = None,
+    incident_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    session: Session = Depends(get_session),
+):
+    stmt = select(AnalysisJob)
+    if status:
+        stmt = stmt.where(AnalysisJob.status == status)
+    if incident_id is not None:
+        stmt = stmt.where(AnalysisJob.incident_id == incident_id)
+    return session.exec(stmt.order_by(AnalysisJob.id.desc()).limit(limit)).all()
+
+
+@router.get("/analysis/jobs/{job_id}", response_model=AnalysisJobRead)
+def analysis_job_detail(job_id: int, session: Session = Depends(get_session)):
+    job = session.get(AnalysisJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job
@@ -14,6 +14,13 @@ class LogEntryRead(BaseModel):
     tags: Dict[str, Any]
 
 
+class LogRollupRead(BaseModel):
+    bucket: datetime
+    service: str
+    level: str
+    count: int
+
+
 class IncidentRead(BaseModel):
     id: int
     created_at: datetime
@@ -53,6 +60,20 @@ class LogSelectionAnalyzeResponse(BaseModel):
     related_signals: List[str] = Field(default_factory=list)
 
 
+class AnalysisJobRead(BaseModel):
+    id: int
+    kind: str
+    incident_id: Optional[int] = None
+    log_ids: List[int] = Field(default_factory=list)
+    force: bool = False
+    status: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 class ContainerInfo(BaseModel):
     id: str
     name: str
@@ -0,0 +1,239 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import column, false, func, literal_column, or_, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+
+from .models import LogEntry
+
+
+FTS_TABLE = "logentry_fts"
+FTS_COLUMNS = ("message", "raw", "service", "level", "container_id")
+
+_fts = table(FTS_TABLE, column("rowid"), column("rank"))
+
+_backend = "ilike"
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """Create the full-text index backing ``/api/logs?q=`` and keep it in sync.
+
+    SQLite gets an external-content FTS5 table over ``logentry`` maintained by
+    triggers; Postgres gets a generated ``tsvector`` column with a GIN index.
+    Anything else keeps the ILIKE scan.
+    """
+    global _backend
+    dialect = engine.dialect.name
+    try:
+        if dialect == "sqlite":
+            _ensure_sqlite_fts(engine)
+            _backend = "fts5"
+        elif dialect == "postgresql":
+            _ensure_postgres_tsvector(engine)
+            _backend = "tsvector"
+    except Exception:
+        _backend = "ilike"
+
+
+def search_backend() -> str:
+    return _backend
+
+
+def _ensure_sqlite_fts(engine: Engine) -> None:
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first()
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{columns}, content='logentry', content_rowid='id')"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON logentry BEGIN "
+                f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON logentry BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON logentry BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+                f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+            )
+        )
+        if not exists:
+            # Index rows written before the FTS table existed
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def _ensure_postgres_tsvector(engine: Engine) -> None:
+    document = " || ' ' || ".join(f"coalesce({column}, '')" for column in FTS_COLUMNS)
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "ALTER TABLE logentry ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED"
+            )
+        )
+        connection.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_logentry_search_vector ON logentry USING GIN (search_vector)")
+        )
+
+
+def parse_query(q: str) -> List[Tuple[List[str], bool]]:
+    """Split a search string into ``(words, is_prefix)`` terms.
+
+    ``"connection refused"`` is a phrase; ``refus*`` is an explicit prefix.
+    Bare words are matched as prefixes too, so typing part of a word still
+    finds it the way the old substring search did.
+    """
+    terms: List[Tuple[List[str], bool]] = []
+    for phrase, word in _TERM.findall(q):
+        if phrase:
+            words = re.findall(r"\w+", phrase)
+            prefix = False
+        else:
+            words = re.findall(r"\w+", word)
+            prefix = True
+        if words:
+            terms.append((words, prefix))
+    return terms
+
+
+def _fts5_query(terms: List[Tuple[List[str], bool]]) -> str:
+    return " ".join(f'"{" ".join(words)}"' + (" *" if prefix else "") for words, prefix in terms)
+
+
+def _tsquery(terms: List[Tuple[List[str], bool]]) -> str:
+    parts = []
+    for words, prefix in terms:
+        lexemes = [word.lower() for word in words]
+        if prefix:
+            lexemes[-1] += ":*"
+        parts.append(" <-> ".join(lexemes))
+    return " & ".join(parts)
+
+
+# Words of the retrieval query that say nothing about which logs are related
+_CONTEXT_STOPWORDS = {
+    "and", "for", "from", "the", "with", "incident", "severity", "services", "signature", "recent",
+    "evidence", "selected", "logs", "analysis", "unknown", "debug", "info", "warn", "warning",
+    "error", "critical", "high", "medium", "low",
+}
+_KEYWORD = re.compile(r"[\w][\w.:/@-]*")
+
+
+def _is_identifier(token: str) -> bool:
+    # Error codes, hosts, paths and stack frames: digits, separators or inner capitals
+    return any(ch.isdigit() for ch in token) or any(ch in "._:/@-" for ch in token) or token[1:] != token[1:].lower()
+
+
+def keyword_terms(query: str, max_terms: int = 24) -> List[Tuple[List[str], bool]]:
+    """Distinctive words of ``query`` as exact ``(words, False)`` phrase terms.
+
+    Identifier-like tokens (``ECONNREFUSED``, ``db-01.prod``,
+    ``OrderService.charge``, ``504``) come first, then the remaining words in
+    order of appearance, up to ``max_terms``.
+    """
+    identifiers: List[str] = []
+    words: List[str] = []
+    seen = set()
+    for token in _KEYWORD.findall(query):
+        token = token.strip(".:/@-")
+        key = token.lower()
+        if len(token) < 3 or key in seen or key in _CONTEXT_STOPWORDS:
+            continue
+        seen.add(key)
+        (identifiers if _is_identifier(token) else words).append(token)
+    terms: List[Tuple[List[str], bool]] = []
+    for token in identifiers + words:
+        parts = re.findall(r"\w+", token)
+        if parts:
+            terms.append((parts, False))
+    return terms[:max_terms]
+
+
+def apply_keyword_search(stmt: Select, query: str) -> Optional[Select]:
+    """Rank a ``select(LogEntry)`` by how well rows match any keyword of ``query``.
+
+    Used for the lexical half of RAG retrieval: terms are OR-ed and rows come
+    back best match first (bm25 on FTS5, ``ts_rank`` on Postgres). Returns
+    ``None`` when there are no usable terms or no full-text index, since an
+    ILIKE scan cannot rank.
+    """
+    terms = keyword_terms(query)
+    if not terms:
+        return None
+
+    if _backend == "fts5":
+        match = " OR ".join(f'"{" ".join(words)}"' for words, _ in terms)
+        return (
+            stmt.join(_fts, _fts.c.rowid == LogEntry.id)
+            .where(literal_column(FTS_TABLE).op("MATCH")(match))
+            .order_by(_fts.c.rank, LogEntry.timestamp.desc())
+        )
+
+    if _backend == "tsvector":
+        vector = literal_column("logentry.search_vector")
+        tsquery = func.to_tsquery("simple", " | ".join(f"({_tsquery([term])})" for term in terms))
+        return stmt.where(vector.op("@@")(tsquery)).order_by(
+            func.ts_rank(vector, tsquery).desc(), LogEntry.timestamp.desc()
+        )
+
+    return None
+
+
+def apply_log_search(stmt: Select, q: str, by_relevance: bool = False) -> Select:
+    """Restrict a ``select(LogEntry)`` to rows matching ``q``.
+
+    Filters already on ``stmt`` run in the same query. With ``by_relevance``
+    the best matches come first (ties newest first); otherwise the caller's
+    ordering is left alone. A blank ``q`` filters nothing, but one with no
+    searchable words in it matches no rows.
+    """
+    terms = parse_query(q)
+    if not terms:
+        # Only punctuation or operators ("---", '" * ()'): a search that can match nothing
+        return stmt.where(false()) if q.strip() else stmt
+
+    if _backend == "fts5":
+        stmt = stmt.join(_fts, _fts.c.rowid == LogEntry.id).where(
+            literal_column(FTS_TABLE).op("MATCH")(_fts5_query(terms))
+        )
+        if by_relevance:
+            stmt = stmt.order_by(_fts.c.rank, LogEntry.timestamp.desc())
+        return stmt
+
+    if _backend == "tsvector":
+        vector = literal_column("logentry.search_vector")
+        query = func.to_tsquery("simple", _tsquery(terms))
+        stmt = stmt.where(vector.op("@@")(query))
+        if by_relevance:
+            stmt = stmt.order_by(func.ts_rank(vector, query).desc(), LogEntry.timestamp.desc())
+        return stmt
+
+    pattern = f"%{q.strip()}%"
+    return stmt.where(
+        or_(
+            LogEntry.message.ilike(pattern),
+            LogEntry.raw.ilike(pattern),
+            LogEntry.service.ilike(pattern),
+            LogEntry.level.ilike(pattern),
+            LogEntry.container_id.ilike(pattern),
+        )
+    )
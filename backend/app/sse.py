@@ -1,28 +1,278 @@
 ﻿import asyncio
-from typing import Any, Dict, Set
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlmodel import Session, select
+
+from .config import settings
+from .db import engine
+from .models import LogEntry
+
+
+def log_to_event(entry: LogEntry) -> Dict[str, Any]:
+    return {
+        "id": entry.id,
+        "timestamp": entry.timestamp.isoformat(),
+        "service": entry.service,
+        "container_id": entry.container_id,
+        "level": entry.level,
+        "message": entry.message,
+        "raw": entry.raw,
+        "tags": entry.tags,
+    }
+
+
+class StreamEvent(NamedTuple):
+    """An event serialized once: its log id (if any), SSE event name, JSON data and full frame."""
+
+    id: Optional[int]
+    name: Optional[str]
+    data: str
+    frame: str
+
+
+def render_event(event: Dict[str, Any]) -> StreamEvent:
+    """Serialize ``event``; named events (``{"event", "data"}``) get an ``event:`` line, log events an ``id:``."""
+    name = event.get("event")
+    if name:
+        data = json.dumps(event["data"])
+        return StreamEvent(None, name, data, f"event: {name}\ndata: {data}\n\n")
+    data = json.dumps(event)
+    event_id = event.get("id")
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return StreamEvent(event_id, None, data, f"{prefix}data: {data}\n\n")
+
+
+def render_batch(events: List[StreamEvent]) -> str:
+    """One frame holding a JSON array of log events, tagged with the last id in it."""
+    last_id = events[-1].id
+    prefix = f"id: {last_id}\n" if last_id is not None else ""
+    return f"{prefix}data: [{','.join(event.data for event in events)}]\n\n"
+
+
+class Subscription:
+    """One stream consumer: its filter, a bounded queue of rendered events and counters."""
+
+    def __init__(self, service: Optional[str], level: Optional[str], maxsize: int) -> None:
+        self.service = service
+        self.level = level
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.connected_at = time.monotonic()
+        self.delivered = 0
+        self.dropped = 0
+        self.max_lag = 0
+        self.replayed = 0
+        # Live events up to this id were already sent during replay
+        self.skip_through: Optional[int] = None
+
+    @property
+    def key(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.service, self.level
+
+    def offer(self, event: StreamEvent) -> None:
+        # Never blocks the publisher: a consumer that falls behind loses its oldest events
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+        self.max_lag = max(self.max_lag, self.queue.qsize())
+
+    async def get(self) -> StreamEvent:
+        return await self.queue.get()
+
+    def _fresh(self, event: StreamEvent) -> bool:
+        return event.id is None or self.skip_through is None or event.id > self.skip_through
+
+    async def frames(self, batch_seconds: float = 0.0) -> AsyncIterator[str]:
+        """SSE frames for this subscriber, one per event or, with ``batch_seconds``, per window.
+
+        In batch mode the first event opens a window; log events that arrive
+        within it go out as one array frame, while named events keep their
+        own frames and their order relative to the batches. ``delivered``
+        counts the events in the frames handed to the response, so events
+        dropped from a full queue or skipped after a replay are not included.
+        """
+        while True:
+            first = await self.queue.get()
+            if not batch_seconds:
+                if self._fresh(first):
+                    self.delivered += 1
+                    yield first.frame
+                continue
+            await asyncio.sleep(batch_seconds)
+            pending = [first]
+            while not self.queue.empty():
+                pending.append(self.queue.get_nowait())
+            batch: List[StreamEvent] = []
+            for event in pending:
+                if not self._fresh(event):
+                    continue
+                if event.name is None:
+                    batch.append(event)
+                    continue
+                if batch:
+                    self.delivered += len(batch)
+                    yield render_batch(batch)
+                    batch = []
+                self.delivered += 1
+                yield event.frame
+            if batch:
+                self.delivered += len(batch)
+                yield render_batch(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "service": self.service,
+            "level": self.level,
+            "lag": self.queue.qsize(),
+            "max_lag": self.max_lag,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "replayed": self.replayed,
+            "connected_seconds": round(time.monotonic() - self.connected_at, 1),
+        }
+
+
+def _load_after(last_id: int, service: Optional[str], level: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    with Session(engine) as session:
+        stmt = select(LogEntry).where(LogEntry.id > last_id)
+        if service:
+            stmt = stmt.where(LogEntry.service == service)
+        if level:
+            stmt = stmt.where(LogEntry.level == level)
+        return [log_to_event(entry) for entry in session.exec(stmt.order_by(LogEntry.id).limit(limit)).all()]
 
 
 class LogBroadcaster:
-    def __init__(self) -> None:
-        self.subscribers: Set[asyncio.Queue] = set()
-        self.lock = asyncio.Lock()
-
-    async def subscribe(self) -> asyncio.Queue:
-        queue: asyncio.Queue = asyncio.Queue(maxsize=500)
-        async with self.lock:
-            self.subscribers.add(queue)
-        return queue
-
-    async def unsubscribe(self, queue: asyncio.Queue) -> None:
-        async with self.lock:
-            self.subscribers.discard(queue)
-
-    async def publish(self, event: Dict[str, Any]) -> None:
-        async with self.lock:
-            for queue in list(self.subscribers):
-                if queue.full():
-                    try:
-                        queue.get_nowait()
-                    except Exception:
-                        pass
-                await queue.put(event)
+    """Fans stream events out to ``/api/stream/logs`` subscribers.
+
+    Each event is rendered once, however many consumers receive it.
+    Subscribers are indexed by their ``(service, level)`` filter, so a log
+    event only touches the four buckets that can match it (no filter,
+    service only, level only, both); named events go to every subscriber.
+    Publishing never waits: events are handed over with ``put_nowait`` and
+    a full queue (``SSE_QUEUE_SIZE``) drops its oldest event. Everything
+    runs on the event loop; other threads publish through
+    ``loop.call_soon_threadsafe``.
+
+    The last ``SSE_REPLAY_SIZE`` log events are kept in a ring so a client
+    reconnecting with ``Last-Event-ID`` can be caught up; older gaps are
+    read back from the database (:meth:`resume`).
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, replay_size: Optional[int] = None) -> None:
+        self.maxsize = max(1, maxsize or settings.sse_queue_size)
+        self._routes: Dict[Tuple[Optional[str], Optional[str]], Set[Subscription]] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=max(1, replay_size or settings.sse_replay_size))
+        self.published = 0
+        self.unrouted = 0
+        self.disconnected_drops = 0
+        self.resumed = 0
+        self.replayed_from_memory = 0
+        self.replayed_from_db = 0
+
+    @property
+    def subscribers(self) -> List[Subscription]:
+        return [subscription for bucket in self._routes.values() for subscription in bucket]
+
+    def subscribe(self, service: Optional[str] = None, level: Optional[str] = None) -> Subscription:
+        subscription = Subscription(service or None, level or None, self.maxsize)
+        self._routes.setdefault(subscription.key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        bucket = self._routes.get(subscription.key)
+        if bucket is None:
+            return
+        bucket.discard(subscription)
+        if not bucket:
+            del self._routes[subscription.key]
+        self.disconnected_drops += subscription.dropped
+
+    def _targets(self, event: Dict[str, Any]) -> Iterable[Subscription]:
+        if event.get("event"):
+            return self.subscribers
+        service = event.get("service")
+        level = event.get("level")
+        targets: List[Subscription] = []
+        for key in {(None, None), (service, None), (None, level), (service, level)}:
+            bucket = self._routes.get(key)
+            if bucket:
+                targets.extend(bucket)
+        return targets
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.published += 1
+        if not event.get("event") and event.get("id") is not None:
+            self._recent.append(event)
+        targets = self._targets(event)
+        if not targets:
+            self.unrouted += 1
+            return
+        rendered = render_event(event)
+        for subscription in targets:
+            subscription.offer(rendered)
+
+    def publish_many(self, events: Iterable[Dict[str, Any]]) -> None:
+        for event in events:
+            self.publish(event)
+
+    async def resume(self, subscription: Subscription, last_id: int, limit: Optional[int] = None) -> Tuple[List[str], bool]:
+        """Frames for the subscriber's log events after ``last_id``, and whether the replay was cut short.
+
+        Call right after :meth:`subscribe`, before awaiting anything else, so
+        the ring snapshot and the live queue meet without a gap. Events the
+        ring no longer holds are read from the database, at most ``limit``
+        (``SSE_REPLAY_LIMIT``) rows; when that limit is hit the replay is
+        truncated and the caller should end the response so the client
+        reconnects from the last id it received.
+        """
+        limit = limit or settings.sse_replay_limit
+        self.resumed += 1
+        recent = [
+            event
+            for event in self._recent
+            if event["id"] > last_id
+            and (not subscription.service or event.get("service") == subscription.service)
+            and (not subscription.level or event.get("level") == subscription.level)
+        ]
+        rows: List[Dict[str, Any]] = []
+        truncated = False
+        if not self._recent or self._recent[0]["id"] > last_id + 1:
+            try:
+                rows = await asyncio.to_thread(_load_after, last_id, subscription.service, subscription.level, limit)
+            except Exception:
+                rows = []
+            truncated = len(rows) >= limit
+            self.replayed_from_db += len(rows)
+            if rows:
+                newest = rows[-1]["id"]
+                recent = [] if truncated else [event for event in recent if event["id"] > newest]
+        self.replayed_from_memory += len(recent)
+        replay = rows + recent
+        # With nothing replayed every queued live event is new, even when
+        # ``last_id`` is ahead of the log table (e.g. after a database reset)
+        subscription.skip_through = replay[-1]["id"] if replay else None
+        subscription.replayed = len(replay)
+        return [render_event(event).frame for event in replay], truncated
+
+    def stats(self) -> Dict[str, Any]:
+        subscribers = self.subscribers
+        return {
+            "subscribers": len(subscribers),
+            "filters": len(self._routes),
+            "queue_capacity": self.maxsize,
+            "published": self.published,
+            "unrouted": self.unrouted,
+            "dropped": self.disconnected_drops + sum(subscription.dropped for subscription in subscribers),
+            "replay_buffer": len(self._recent),
+            "resumed": self.resumed,
+            "replayed_from_memory": self.replayed_from_memory,
+            "replayed_from_db": self.replayed_from_db,
+            "clients": [subscription.stats() for subscription in subscribers],
+        }
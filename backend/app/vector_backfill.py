@@ -0,0 +1,186 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .config import settings
+from .db import engine
+from .models import IndexCheckpoint, LogEntry
+
+
+CHECKPOINT_NAME = "vector_index"
+
+
+class VectorBackfill:
+    """Indexes stored logs into the vector store in the background.
+
+    Rows are streamed in id order, ``VECTOR_BACKFILL_BATCH`` at a time, from
+    the ``vector_index`` high-water mark in ``indexcheckpoint`` up to the
+    newest id present when the job started; newer rows are indexed live by
+    the ingestion pipeline. Ids that already have a point in the collection
+    are skipped, so nothing is embedded twice, and the checkpoint is
+    committed after every chunk, so a crash or restart resumes where it
+    stopped. With ``VECTOR_BACKEND=auto`` an outage only redirects chunks to
+    the local index; with no reachable backend at all the job waits
+    ``VECTOR_BACKFILL_RETRY`` seconds and tries again.
+
+    Once the backfill has caught up, successful live batches keep moving the
+    checkpoint forward. A failed live batch freezes it, and the next start
+    re-covers the gap.
+    """
+
+    def __init__(self, vector_store, batch_size: Optional[int] = None, retry_seconds: Optional[float] = None) -> None:
+        self.vector_store = vector_store
+        self.batch_size = max(1, batch_size or settings.vector_backfill_batch)
+        self.retry_seconds = settings.vector_backfill_retry if retry_seconds is None else retry_seconds
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        self._lock = threading.Lock()
+        self.state = "idle"
+        self.checkpoint = 0
+        self.start_id = 0
+        self.target_id = 0
+        self.in_sync = False
+        self.live_high = 0
+        self.live_failed = False
+        self.indexed = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.retries = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> None:
+        if self.thread and self.thread.is_alive():
+            return
+        if not settings.vector_enabled:
+            self.state = "disabled"
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def advance(self, entries: Sequence[LogEntry], indexed: bool) -> None:
+        """Record the outcome of a live indexing batch."""
+        ids = [entry.id for entry in entries if entry.id is not None]
+        if not ids:
+            return
+        with self._lock:
+            if not indexed:
+                self.live_failed = True
+                self.in_sync = False
+                return
+            self.live_high = max(self.live_high, max(ids))
+            if not self.in_sync or self.live_high <= self.checkpoint:
+                return
+            self.checkpoint = self.live_high
+            last_id = self.checkpoint
+        self._save_checkpoint(last_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = max(self.target_id - self.start_id, 0)
+            done = min(max(self.checkpoint - self.start_id, 0), total)
+            elapsed = ((self.finished_at or time.monotonic()) - self.started_at) if self.started_at else 0.0
+            return {
+                "state": self.state,
+                "checkpoint": self.checkpoint,
+                "target_id": self.target_id,
+                "progress": round(done / total, 4) if total else 1.0,
+                "indexed": self.indexed,
+                "skipped": self.skipped,
+                "chunks": self.chunks,
+                "retries": self.retries,
+                "in_sync": self.in_sync,
+                "rows_per_sec": round(self.indexed / elapsed, 1) if elapsed > 0 else 0.0,
+            }
+
+    def _run(self) -> None:
+        with Session(engine) as session:
+            checkpoint = session.get(IndexCheckpoint, CHECKPOINT_NAME)
+            target_id = session.exec(select(func.max(LogEntry.id))).one() or 0
+        with self._lock:
+            self.checkpoint = checkpoint.last_id if checkpoint else 0
+            self.start_id = self.checkpoint
+            self.target_id = target_id
+            self.state = "running"
+            self.started_at = time.monotonic()
+
+        while not self.stop_event.is_set():
+            chunk = self._next_chunk()
+            if not chunk:
+                self._finish()
+                return
+            if not self._index_chunk(chunk):
+                with self._lock:
+                    self.state = "waiting"
+                    self.retries += 1
+                self.stop_event.wait(self.retry_seconds)
+                with self._lock:
+                    self.state = "running"
+                continue
+            self._save_checkpoint(chunk[-1].id)
+            with self._lock:
+                self.checkpoint = max(self.checkpoint, chunk[-1].id)
+                self.chunks += 1
+
+        with self._lock:
+            self.state = "stopped"
+
+    def _finish(self) -> None:
+        # Everything above target_id came through live batches; if none of
+        # them failed the checkpoint can jump straight to the newest one.
+        with self._lock:
+            self.state = "done"
+            self.finished_at = time.monotonic()
+            self.in_sync = not self.live_failed
+            if not self.in_sync or self.live_high <= self.checkpoint:
+                return
+            self.checkpoint = self.live_high
+            last_id = self.checkpoint
+        self._save_checkpoint(last_id)
+
+    def _next_chunk(self) -> List[LogEntry]:
+        with self._lock:
+            after, target_id = self.checkpoint, self.target_id
+        stmt = (
+            select(LogEntry)
+            .where(LogEntry.id > after, LogEntry.id <= target_id)
+            .order_by(LogEntry.id)
+            .limit(self.batch_size)
+        )
+        with Session(engine) as session:
+            return list(session.exec(stmt).all())
+
+    def _index_chunk(self, chunk: List[LogEntry]) -> bool:
+        missing = self.vector_store.missing_ids([entry.id for entry in chunk])
+        if missing is None:
+            return False
+        pending = [entry for entry in chunk if entry.id in missing]
+        if pending and self.vector_store.index_logs(pending) < len(pending):
+            return False
+        with self._lock:
+            self.indexed += len(pending)
+            self.skipped += len(chunk) - len(pending)
+        return True
+
+    def _save_checkpoint(self, last_id: int) -> None:
+        with Session(engine) as session:
+            checkpoint = session.get(IndexCheckpoint, CHECKPOINT_NAME)
+            if checkpoint is None:
+                checkpoint = IndexCheckpoint(name=CHECKPOINT_NAME)
+            if last_id <= checkpoint.last_id:
+                return
+            checkpoint.last_id = last_id
+            checkpoint.updated_at = datetime.now(timezone.utc)
+            session.add(checkpoint)
+            session.commit()
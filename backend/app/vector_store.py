@@ -1,10 +1,19 @@
+import threading
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from threading import Lock
-from typing import Iterable, List, Optional, Sequence, Set
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
 
 from qdrant_client import QdrantClient, models
+from sqlmodel import Session, select
 
 from .config import settings
+from .db import engine
+from .embedding_cache import EmbeddingCache
+from .local_vector_index import LocalVectorIndex
+from .log_templates import log_template
 from .models import LogEntry
 
 
@@ -19,21 +28,117 @@ class RagMatch:
     container_id: str
 
 
-def _document_text(log: LogEntry) -> str:
-    return f"service={log.service} level={log.level} message={log.message} raw={log.raw}"
+def _document_text(log: LogEntry, template: Optional[str] = None) -> str:
+    # Embedded on the message template, so lines that differ only in ids,
+    # numbers or timestamps share one cached vector
+    template = log_template(log.message) if template is None else template
+    return f"service={log.service} level={log.level} message={template}"
+
+
+def _payload(log: LogEntry, template: str) -> Dict[str, Any]:
+    return {
+        "log_id": log.id,
+        "service": log.service,
+        "level": log.level,
+        "timestamp": log.timestamp.isoformat(),
+        "container_id": log.container_id,
+        "message": log.message,
+        "raw": log.raw,
+        "template": template,
+    }
+
+
+# Backing the server-side filters of search_related_logs
+PAYLOAD_INDEXES = {
+    "service": models.PayloadSchemaType.KEYWORD,
+    "level": models.PayloadSchemaType.KEYWORD,
+    "timestamp": models.PayloadSchemaType.DATETIME,
+}
+
+
+def _search_filter(
+    services: Set[str],
+    exclude_ids: Set[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> Optional[models.Filter]:
+    must: List[models.Condition] = []
+    must_not: List[models.Condition] = []
+    if services:
+        must.append(models.FieldCondition(key="service", match=models.MatchAny(any=sorted(services))))
+    if start or end:
+        must.append(models.FieldCondition(key="timestamp", range=models.DatetimeRange(gte=start, lte=end)))
+    if exclude_ids:
+        must_not.append(models.HasIdCondition(has_id=sorted(exclude_ids)))
+    if not must and not must_not:
+        return None
+    return models.Filter(must=must or None, must_not=must_not or None)
+
+
+class VectorStoreBusy(RuntimeError):
+    pass
 
 
 class VectorStore:
+    """Qdrant-backed semantic index of log lines.
+
+    The client keeps a pool of ``VECTOR_POOL_SIZE`` HTTP connections and is
+    shared by all threads without a global lock. Reads (searches, point
+    lookups) and writes (upserts) draw from separate in-flight limits,
+    ``VECTOR_MAX_READS`` and ``VECTOR_MAX_WRITES``, so a bulk backfill can
+    never starve RAG lookups; a call that cannot get a slot within
+    ``VECTOR_TIMEOUT`` fails fast instead of queueing. Readiness comes from
+    a heartbeat thread that pings Qdrant every
+    ``VECTOR_HEARTBEAT_INTERVAL`` seconds, so ``/api/health`` never waits on
+    a round trip.
+
+    ``VECTOR_BACKEND`` picks where vectors live: ``qdrant`` only, ``local``
+    only (a :class:`LocalVectorIndex` under ``LOCAL_VECTOR_PATH``, for nodes
+    without Qdrant), or ``auto``, which mirrors every batch into the local
+    index and searches it whenever Qdrant is down. Batches that only reached
+    the local index are queued and pushed to Qdrant, with their stored
+    vectors, as soon as the heartbeat sees it again.
+    """
+
     def __init__(self) -> None:
         self._client: Optional[QdrantClient] = None
         self._connect_lock = Lock()
-        self._operation_lock = Lock()
+        self._collection_lock = Lock()
         self._vector_name: Optional[str] = None
         self._collection_ready = False
+        self._embedder = None
+        self._embedder_lock = Lock()
+        self._slots = {
+            "read": threading.BoundedSemaphore(max(1, settings.vector_max_reads)),
+            "write": threading.BoundedSemaphore(max(1, settings.vector_max_writes)),
+        }
+        self._stats_lock = Lock()
+        self._in_flight = {"read": 0, "write": 0}
+        self.rejected = 0
+        self.cache = EmbeddingCache()
         self.available = False
 
+        self.backend = settings.vector_backend
+        self.local: Optional[LocalVectorIndex] = None
+        if settings.vector_enabled and self.backend in {"local", "auto"}:
+            try:
+                self.local = LocalVectorIndex(settings.local_vector_path)
+            except Exception:
+                self.local = None
+        self._resync_thread: Optional[threading.Thread] = None
+        self.resynced = 0
+        self.local_searches = 0
+
+        self.heartbeat_interval = settings.vector_heartbeat_interval
+        self.last_heartbeat: Optional[float] = None
+        self.last_heartbeat_at: Optional[datetime] = None
+        self.last_heartbeat_ms = 0.0
+        self.heartbeat_failures = 0
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
     def _ensure_client(self) -> Optional[QdrantClient]:
-        if not settings.vector_enabled:
+        if not settings.vector_enabled or self.backend == "local":
             self.available = False
             return None
 
@@ -44,7 +149,11 @@ class VectorStore:
             if self._client:
                 return self._client
 
-            client = QdrantClient(url=settings.qdrant_url, timeout=settings.vector_timeout)
+            client = QdrantClient(
+                url=settings.qdrant_url,
+                timeout=settings.vector_timeout,
+                pool_size=settings.vector_pool_size,
+            )
             client.set_model(settings.vector_model)
             client.get_collections()
             self._vector_name = client.get_vector_field_name()
@@ -52,70 +161,293 @@ class VectorStore:
             self.available = True
             return client
 
-    def is_available(self) -> bool:
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if self._embedder is None:
+            with self._embedder_lock:
+                if self._embedder is None:
+                    from fastembed import TextEmbedding
+
+                    self._embedder = TextEmbedding(model_name=settings.vector_model)
+        return [vector.tolist() for vector in self._embedder.embed(texts)]
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        return self.cache.embed(settings.vector_model, texts, self._embed_texts)
+
+    @contextmanager
+    def _slot(self, kind: str) -> Iterator[None]:
+        semaphore = self._slots[kind]
+        if not semaphore.acquire(timeout=settings.vector_timeout):
+            with self._stats_lock:
+                self.rejected += 1
+            raise VectorStoreBusy(f"too many in-flight vector {kind}s")
+        with self._stats_lock:
+            self._in_flight[kind] += 1
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self._in_flight[kind] -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "available": self.available,
+                "backend": self.backend,
+                "active": self.active_backend(),
+                "in_flight_reads": self._in_flight["read"],
+                "in_flight_writes": self._in_flight["write"],
+                "rejected": self.rejected,
+                "last_heartbeat_at": self.last_heartbeat_at.isoformat() if self.last_heartbeat_at else None,
+                "last_heartbeat_ms": round(self.last_heartbeat_ms, 3),
+                "heartbeat_failures": self.heartbeat_failures,
+                "cache": self.cache.stats(),
+                "local": self.local.stats() if self.local else None,
+                "local_searches": self.local_searches,
+                "resynced": self.resynced,
+            }
+
+    def active_backend(self) -> Optional[str]:
+        """Where searches currently go: ``qdrant``, ``local`` or ``None``."""
+        if not settings.vector_enabled:
+            return None
+        if self.backend != "local" and self.available:
+            return "qdrant"
+        return "local" if self.local else None
+
+    def start_heartbeat(self) -> None:
+        if not settings.vector_enabled or self.backend == "local":
+            return
+        if self._heartbeat_thread and self._heartbeat_thread.is_alive():
+            return
+        self._heartbeat_stop.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop_heartbeat(self) -> None:
+        self._heartbeat_stop.set()
+
+    def _heartbeat_loop(self) -> None:
+        while not self._heartbeat_stop.is_set():
+            self.heartbeat()
+            self._heartbeat_stop.wait(self.heartbeat_interval)
+
+    def heartbeat(self) -> bool:
+        started = time.perf_counter()
         try:
             client = self._ensure_client()
             if not client:
                 return False
-            with self._operation_lock:
+            with self._slot("read"):
                 client.get_collections()
             self.available = True
-            return True
+            if self.local and self.local.pending_count():
+                self._start_resync()
         except Exception:
             self.available = False
+            with self._stats_lock:
+                self.heartbeat_failures += 1
+        with self._stats_lock:
+            self.last_heartbeat = time.monotonic()
+            self.last_heartbeat_at = datetime.now(timezone.utc)
+            self.last_heartbeat_ms = (time.perf_counter() - started) * 1000
+        return self.available
+
+    def is_available(self) -> bool:
+        if not settings.vector_enabled:
             return False
+        if self.backend == "local":
+            return self.local is not None
+        # Served from the heartbeat; only ping inline when it is not running or has stalled
+        fresh = self.last_heartbeat is not None and time.monotonic() - self.last_heartbeat < self.heartbeat_interval * 3
+        available = self.available if fresh else self.heartbeat()
+        return available or self.local is not None
+
+    def _start_resync(self) -> None:
+        with self._connect_lock:
+            if self._resync_thread and self._resync_thread.is_alive():
+                return
+            self._resync_thread = threading.Thread(target=self._resync, daemon=True)
+            self._resync_thread.start()
+
+    def _resync(self) -> None:
+        """Push points indexed only locally during an outage to Qdrant."""
+        while not self._heartbeat_stop.is_set():
+            ids = self.local.pending(settings.vector_backfill_batch)
+            if not ids:
+                return
+            vectors = self.local.vectors_for(ids)
+            with Session(engine) as session:
+                logs = list(session.exec(select(LogEntry).where(LogEntry.id.in_(ids))).all())
+            # Rows removed by retention since then are simply dropped from the queue
+            logs = [log for log in logs if log.id in vectors]
+            if logs and not self._upsert(
+                logs, [log_template(log.message) for log in logs], [vectors[log.id] for log in logs], wait=True
+            ):
+                return
+            self.local.clear_pending(ids)
+            with self._stats_lock:
+                self.resynced += len(logs)
+
+    def _ensure_collection(self, client: QdrantClient) -> None:
+        if self._collection_ready:
+            return
+        with self._collection_lock:
+            if self._collection_ready:
+                return
+            if not client.collection_exists(settings.vector_collection):
+                client.create_collection(
+                    settings.vector_collection,
+                    vectors_config=client.get_fastembed_vector_params(),
+                )
+            # Also added to collections created before the indexes existed
+            indexed = client.get_collection(settings.vector_collection).payload_schema or {}
+            for field_name, schema in PAYLOAD_INDEXES.items():
+                if field_name not in indexed:
+                    client.create_payload_index(
+                        settings.vector_collection,
+                        field_name=field_name,
+                        field_schema=schema,
+                    )
+            self._collection_ready = True
+
+    def missing_ids(self, ids: Sequence[int]) -> Optional[Set[int]]:
+        """Ids among ``ids`` with no point in the collection; ``None`` if no backend is reachable."""
+        if not ids:
+            return set()
+        if self.local and (self.backend == "local" or not self.available):
+            return set(ids) - self.local.contains(ids)
+        try:
+            client = self._ensure_client()
+            if not client:
+                return None
+            self._ensure_collection(client)
+            with self._slot("read"):
+                points = client.retrieve(
+                    settings.vector_collection,
+                    ids=list(ids),
+                    with_payload=False,
+                    with_vectors=False,
+                )
+            return set(ids) - {point.id for point in points}
+        except VectorStoreBusy:
+            return None
+        except Exception:
+            self._collection_ready = False
+            self.available = False
+            return None
 
     def index_log(self, log: LogEntry) -> bool:
         return self.index_logs([log]) > 0
 
-    def index_logs(self, logs: Sequence[LogEntry]) -> int:
+    def index_logs(self, logs: Sequence[LogEntry], wait: bool = True) -> int:
         valid_logs = [log for log in logs if log.id is not None]
         if not valid_logs:
             return 0
 
-        try:
-            client = self._ensure_client()
-            if not client:
+        use_qdrant = self.backend != "local" and (self.local is None or self.available)
+        if use_qdrant and not self.local:
+            try:
+                if not self._ensure_client():
+                    return 0
+            except Exception:
+                self.available = False
                 return 0
+        elif not self.local:
+            return 0
 
-            with self._operation_lock:
-                if not self._collection_ready:
-                    client.create_collection(
-                        settings.vector_collection,
-                        vectors_config=client.get_fastembed_vector_params(),
-                    )
-                    self._collection_ready = True
+        try:
+            templates = [log_template(log.message) for log in valid_logs]
+            vectors = self.embed([_document_text(log, template) for log, template in zip(valid_logs, templates)])
+        except Exception:
+            return 0
+
+        stored_locally = False
+        if self.local:
+            try:
+                self.local.add([(log.id, log.timestamp, log.service, vector) for log, vector in zip(valid_logs, vectors)])
+                stored_locally = True
+            except Exception:
+                stored_locally = False
 
+        if use_qdrant and self._upsert(valid_logs, templates, vectors, wait):
+            return len(valid_logs)
+        if not stored_locally:
+            return 0
+        if self.backend != "local":
+            # Sent to Qdrant by the resync once the heartbeat sees it again
+            self.local.mark_pending(log.id for log in valid_logs)
+        return len(valid_logs)
+
+    def _upsert(
+        self,
+        logs: Sequence[LogEntry],
+        templates: Sequence[str],
+        vectors: Sequence[List[float]],
+        wait: bool,
+    ) -> bool:
+        try:
+            client = self._ensure_client()
+            if not client:
+                return False
+            vector_name = self._vector_name or client.get_vector_field_name()
+            self._ensure_collection(client)
+            with self._slot("write"):
                 client.upsert(
                     collection_name=settings.vector_collection,
+                    wait=wait,
                     points=[
-                        models.PointStruct(
-                            id=log.id,
-                            vector={
-                                self._vector_name or client.get_vector_field_name(): models.Document(
-                                    text=_document_text(log),
-                                    model=settings.vector_model,
-                                )
-                            },
-                            payload={
-                                "log_id": log.id,
-                                "service": log.service,
-                                "level": log.level,
-                                "timestamp": log.timestamp.isoformat(),
-                                "container_id": log.container_id,
-                                "message": log.message,
-                                "raw": log.raw,
-                            },
-                        )
-                        for log in valid_logs
+                        models.PointStruct(id=log.id, vector={vector_name: vector}, payload=_payload(log, template))
+                        for log, template, vector in zip(logs, templates, vectors)
                     ],
                 )
             self.available = True
-            return len(valid_logs)
+            return True
+        except VectorStoreBusy:
+            return False
         except Exception:
             self._collection_ready = False
             self.available = False
+            return False
+
+    def delete_before(self, cutoff: datetime) -> int:
+        """Remove the vectors of logs timestamped before ``cutoff``, as retention deletes their rows.
+
+        Qdrant points are deleted by a filter on the indexed ``timestamp``
+        payload, so points missed while Qdrant was down go with the next run.
+        Returns the number of rows removed from the local index.
+        """
+        if not settings.vector_enabled:
             return 0
+        removed = 0
+        if self.local:
+            try:
+                removed = self.local.delete_before(cutoff)
+            except Exception:
+                removed = 0
+        if self.backend == "local":
+            return removed
+        try:
+            client = self._ensure_client()
+            if not client:
+                return removed
+            self._ensure_collection(client)
+            with self._slot("write"):
+                client.delete(
+                    collection_name=settings.vector_collection,
+                    points_selector=models.FilterSelector(
+                        filter=models.Filter(
+                            must=[models.FieldCondition(key="timestamp", range=models.DatetimeRange(lt=cutoff))]
+                        )
+                    ),
+                    wait=False,
+                )
+        except VectorStoreBusy:
+            pass
+        except Exception:
+            self._collection_ready = False
+            self.available = False
+        return removed
 
     def search_related_logs(
         self,
@@ -123,26 +455,51 @@ class VectorStore:
         query_text: str,
         services: Optional[Iterable[str]] = None,
         exclude_ids: Optional[Set[int]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
         limit: int = 6,
     ) -> List[RagMatch]:
         if not query_text.strip():
             return []
 
+        services = set(services or [])
+        exclude_ids = set(exclude_ids or [])
+        if self.backend != "local" and (self.local is None or self.available):
+            matches = self._search_qdrant(query_text, services, exclude_ids, start, end, limit)
+            if matches is not None or not self.local:
+                return matches or []
+        if not self.local:
+            return []
+        try:
+            return self._search_local(query_text, services, exclude_ids, start, end, limit)
+        except Exception:
+            return []
+
+    def _search_qdrant(
+        self,
+        query_text: str,
+        services: Set[str],
+        exclude_ids: Set[int],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        limit: int,
+    ) -> Optional[List[RagMatch]]:
+        """Matches from Qdrant; ``None`` when it could not be asked (down or out of read slots)."""
         try:
             client = self._ensure_client()
             if not client:
-                return []
-
-            service_filter = set(services or [])
-            excluded = exclude_ids or set()
-            search_limit = max(limit * 4, limit)
+                return None
 
-            with self._operation_lock:
+            query_filter = _search_filter(services, exclude_ids, start, end)
+            query_vector = self.embed([query_text])[0]
+            self._ensure_collection(client)
+            with self._slot("read"):
                 response = client.query_points(
                     collection_name=settings.vector_collection,
-                    query=models.Document(text=query_text, model=settings.vector_model),
+                    query=query_vector,
                     using=self._vector_name or client.get_vector_field_name(),
-                    limit=search_limit,
+                    query_filter=query_filter,
+                    limit=limit,
                     with_payload=True,
                 )
 
@@ -150,30 +507,64 @@ class VectorStore:
             for hit in response.points:
                 meta = hit.payload or {}
                 log_id = meta.get("log_id")
-                service = meta.get("service", "")
                 if not isinstance(log_id, int):
                     continue
-                if service_filter and service not in service_filter:
-                    continue
-                if log_id in excluded:
-                    continue
-
                 matches.append(
                     RagMatch(
                         log_id=log_id,
                         score=float(hit.score or 0.0),
-                        service=service,
+                        service=meta.get("service", ""),
                         level=meta.get("level", ""),
                         timestamp=meta.get("timestamp", ""),
                         message=meta.get("message", ""),
                         container_id=meta.get("container_id", ""),
                     )
                 )
-                if len(matches) >= limit:
-                    break
 
             self.available = True
             return matches
+        except VectorStoreBusy:
+            # Saturated, not down: this query goes to the local index if there is one
+            return None
         except Exception:
             self.available = False
+            return None
+
+    def _search_local(
+        self,
+        query_text: str,
+        services: Set[str],
+        exclude_ids: Set[int],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        limit: int,
+    ) -> List[RagMatch]:
+        query_vector = self.embed([query_text])[0]
+        # Over-fetch a little: rows deleted by retention keep their vectors until that run ends
+        hits = self.local.search(query_vector, limit * 2, services, exclude_ids, start, end)
+        with self._stats_lock:
+            self.local_searches += 1
+        if not hits:
             return []
+        with Session(engine) as session:
+            rows = session.exec(select(LogEntry).where(LogEntry.id.in_([log_id for log_id, _ in hits]))).all()
+        logs = {log.id: log for log in rows}
+        matches: List[RagMatch] = []
+        for log_id, score in hits:
+            log = logs.get(log_id)
+            if log is None:
+                continue
+            matches.append(
+                RagMatch(
+                    log_id=log_id,
+                    score=score,
+                    service=log.service,
+                    level=log.level,
+                    timestamp=log.timestamp.isoformat(),
+                    message=log.message,
+                    container_id=log.container_id,
+                )
+            )
+            if len(matches) >= limit:
+                break
+        return matches
@@ -0,0 +1,98 @@
+"""Texts sent to the embedding model for a realistic log stream.
+
+Compares the previous document text (full message plus raw line, so every
+line is unique) against template-normalized text served through the
+``EmbeddingCache``. When fastembed is installed the model is also timed on
+both workloads. Run from ``backend/``::
+
+    python -m benchmarks.embedding_cache [--lines 20000] [--batch 64]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from app.embedding_cache import EmbeddingCache
+from app.log_templates import log_template
+
+
+SHAPES = [
+    lambda rng: f"Request completed in {rng.randint(5, 900)}ms",
+    lambda rng: f"GET /api/orders/{rng.randint(1000, 99999)} 200 {rng.randint(2, 80)}ms",
+    lambda rng: "Worker heartbeat ok",
+    lambda rng: f"User login succeeded for user_id={rng.randint(1, 50000)}",
+    lambda rng: f"Cache hit ratio={rng.random():.2f}",
+    lambda rng: f"Timeout while waiting for upstream after {rng.randint(1, 30)}s",
+    lambda rng: f"DB connection refused from 10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}:5432",
+    lambda rng: f"job {rng.getrandbits(64):016x} finished with code {rng.choice([0, 0, 0, 1, 137])}",
+]
+SERVICES = ["service-a", "service-b", "payments", "gateway"]
+
+
+def _stream(lines: int, seed: int):
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc)
+    for index in range(lines):
+        service = rng.choice(SERVICES)
+        level = rng.choice(["INFO", "INFO", "INFO", "WARN", "ERROR"])
+        message = rng.choice(SHAPES)(rng)
+        raw = f"{(start + timedelta(milliseconds=index * 37)).isoformat()} {message}"
+        yield service, level, message, raw
+
+
+def _load_model() -> Optional[Callable[[List[str]], List[List[float]]]]:
+    try:
+        from fastembed import TextEmbedding
+    except ImportError:
+        return None
+    model = TextEmbedding(model_name="BAAI/bge-small-en-v1.5")
+    return lambda texts: [vector.tolist() for vector in model.embed(texts)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = list(_stream(args.lines, args.seed))
+    legacy_texts = [f"service={s} level={l} message={m} raw={r}" for s, l, m, r in rows]
+    template_texts = [f"service={s} level={l} message={log_template(m)}" for s, l, m, _ in rows]
+
+    model = _load_model()
+    embed = model or (lambda texts: [[0.0] for _ in texts])
+
+    sent: List[int] = []
+
+    def counting(texts: List[str]) -> List[List[float]]:
+        sent.append(len(texts))
+        return embed(texts)
+
+    cache = EmbeddingCache(path="")
+    started = time.perf_counter()
+    for start in range(0, len(template_texts), args.batch):
+        cache.embed("bench", template_texts[start : start + args.batch], counting)
+    cached_seconds = time.perf_counter() - started
+
+    print(f"lines:                 {args.lines}")
+    print(f"legacy texts embedded: {len(set(legacy_texts)):>8}")
+    print(f"cached texts embedded: {sum(sent):>8}  (distinct templates: {len(set(template_texts))})")
+    print(f"cache hit rate:        {cache.stats()['hit_rate']:>8.2%}")
+
+    if model is None:
+        print("fastembed not installed; skipping model timing")
+        return
+    started = time.perf_counter()
+    for start in range(0, len(legacy_texts), args.batch):
+        model(legacy_texts[start : start + args.batch])
+    legacy_seconds = time.perf_counter() - started
+    print(f"legacy model time:     {legacy_seconds:>8.2f}s")
+    print(f"cached model time:     {cached_seconds:>8.2f}s")
+    print(f"speedup:               {legacy_seconds / cached_seconds:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Lines/sec for level inference plus signature matching.
+
+Compares the previous approach (``re.search`` per level pattern, then every
+signature regex and the restart regex again during detection) against the
+single-pass ``PatternEngine``. Run from ``backend/``::
+
+    python -m benchmarks.pattern_engine [--lines 200000]
+"""
+
+import argparse
+import random
+import re
+import time
+from typing import Callable, List, Tuple
+
+from app.pattern_engine import LEVEL_PATTERNS, SIGNATURE_PATTERNS, classify
+
+
+SAMPLE_MESSAGES = [
+    "Request completed in 120ms",
+    "GET /api/orders/8812 200 14ms",
+    "Worker heartbeat ok",
+    "Cache warm-up complete",
+    "User login succeeded for user_id=4411",
+    "Task completed successfully",
+    "DB connection refused",
+    "Timeout while waiting for upstream",
+    "Unhandled exception in handler",
+    "Out of memory while allocating buffer",
+    "WARNING: retrying request after 500ms",
+    "Error: listen EADDRINUSE: address already in use :::3001",
+    "Container exited with code 137, restarting",
+    "DEBUG cache hit ratio=0.93",
+    "Traceback (most recent call last):",
+]
+
+
+def legacy_classify(message: str) -> Tuple[str, List[str]]:
+    level = "INFO"
+    for candidate, patterns in LEVEL_PATTERNS.items():
+        if any(re.search(pattern, message, re.IGNORECASE) for pattern in patterns):
+            level = candidate
+            break
+    signatures = [
+        signature_id
+        for signature_id, pattern in SIGNATURE_PATTERNS.items()
+        if re.search(pattern, message, re.IGNORECASE)
+    ]
+    return level, signatures
+
+
+def _measure(fn: Callable[[str], Tuple[str, List[str]]], lines: List[str]) -> float:
+    started = time.perf_counter()
+    for line in lines:
+        fn(line)
+    return len(lines) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lines = [rng.choice(SAMPLE_MESSAGES) for _ in range(args.lines)]
+
+    mismatches = [message for message in SAMPLE_MESSAGES if legacy_classify(message) != classify(message)]
+    if mismatches:
+        raise SystemExit(f"PatternEngine disagrees with the legacy matcher on: {mismatches}")
+
+    legacy = _measure(legacy_classify, lines)
+    engine = _measure(classify, lines)
+    print(f"lines:          {args.lines}")
+    print(f"legacy re.search: {legacy:>12,.0f} lines/sec")
+    print(f"PatternEngine:    {engine:>12,.0f} lines/sec")
+    print(f"speedup:          {engine / legacy:>12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
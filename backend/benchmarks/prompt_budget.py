@@ -0,0 +1,90 @@
+"""Prompt size for an incident whose evidence is an error burst.
+
+Compares the previous prompt sections (the last 50 evidence lines and every
+RAG line, verbatim) against ``prompt_builder.build_sections``, which
+collapses repeats and fits a token budget. Run from ``backend/``::
+
+    python -m benchmarks.prompt_budget [--evidence 200] [--budget 3000]
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.llm_client import estimate_tokens
+from app.models import LogEntry
+from app.prompt_builder import build_sections
+from app.vector_store import RagMatch
+
+
+BURST = [
+    lambda rng: f"DB connection refused from 10.0.3.{rng.randint(1, 9)}:5432 after {rng.randint(1, 30)}s",
+    lambda rng: f"Timeout while waiting for upstream inventory-svc after {rng.randint(1, 30)}s",
+    lambda rng: f"POST /api/orders/{rng.randint(1000, 99999)} 503 {rng.randint(100, 900)}ms",
+]
+NOISE = [
+    lambda rng: "Worker heartbeat ok",
+    lambda rng: f"Cache hit ratio={rng.random():.2f}",
+    lambda rng: f"Retrying charge for order {rng.randint(1000, 99999)} (attempt {rng.randint(1, 5)})",
+]
+
+
+def _evidence(count: int, rng: random.Random):
+    start = datetime.now(timezone.utc)
+    for index in range(count):
+        burst = rng.random() < 0.85
+        yield LogEntry(
+            id=index + 1,
+            timestamp=start + timedelta(milliseconds=index * 250),
+            service="payments" if burst else rng.choice(["payments", "gateway"]),
+            container_id="c",
+            level="ERROR" if burst else rng.choice(["INFO", "WARN"]),
+            message=rng.choice(BURST if burst else NOISE)(rng),
+            raw="",
+            tags={},
+        )
+
+
+def _rag(count: int, rng: random.Random):
+    return [
+        RagMatch(
+            log_id=10_000 + index,
+            score=1.0 / (index + 1),
+            service="payments",
+            level="ERROR",
+            timestamp=(datetime.now(timezone.utc) - timedelta(days=rng.randint(1, 9))).isoformat(),
+            message=rng.choice(BURST + NOISE)(rng),
+            container_id="c",
+        )
+        for index in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--evidence", type=int, default=200)
+    parser.add_argument("--rag", type=int, default=6)
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    logs = list(_evidence(args.evidence, rng))
+    matches = _rag(args.rag, rng)
+
+    legacy_logs = "\n".join(f"[{log.timestamp.isoformat()}] {log.service} {log.level}: {log.message}" for log in logs[-50:])
+    legacy_rag = "\n".join(
+        f"[score={m.score:.3f}] [{m.timestamp}] {m.service} {m.level}: {m.message}" for m in matches
+    )
+    evidence, context = build_sections(logs, matches, budget=args.budget)
+
+    legacy_tokens = estimate_tokens(legacy_logs) + estimate_tokens(legacy_rag)
+    budget_tokens = estimate_tokens(evidence) + estimate_tokens(context)
+    print(f"evidence lines:        {args.evidence} (legacy prompt keeps the last 50)")
+    print(f"legacy sections:       {legacy_tokens:>6} tokens, {len(logs[-50:]) + len(matches)} lines")
+    print(f"budgeted sections:     {budget_tokens:>6} tokens, {len((evidence + chr(10) + context).splitlines())} lines")
+    print(f"reduction:             {1 - budget_tokens / legacy_tokens:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+
+# Settings are read on import, so point everything at throwaway locations first
+_tmp = tempfile.mkdtemp(prefix="lognexa-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["VECTOR_ENABLED"] = "false"
+os.environ["LOCAL_VECTOR_PATH"] = f"{_tmp}/vectors"
+os.environ["LLM_CACHE_PATH"] = ""
+os.environ["GROQ_API_KEY"] = ""
+os.environ["DOCKER_HOST"] = "unix:///nonexistent.sock"
+
+from datetime import datetime, timedelta, timezone  # noqa: E402
+
+import pytest  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from qdrant_client import QdrantClient, models  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+from app.models import LogEntry  # noqa: E402
+from app.vector_store import VectorStore  # noqa: E402
+
+
+init_db()
+
+
+@pytest.fixture
+def db():
+    """An emptied database; yields the engine."""
+    with Session(engine) as session:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            session.exec(delete(table))
+        session.commit()
+    yield engine
+
+
+@pytest.fixture
+def make_logs(db):
+    """Insert logs from ``(service, level, message)`` tuples, one millisecond apart; returns the rows."""
+
+    def make(specs, start=None):
+        start = start or datetime(2026, 1, 1, tzinfo=timezone.utc)
+        rows = [
+            LogEntry(
+                timestamp=start + timedelta(milliseconds=index),
+                service=service,
+                container_id=f"{service}-1",
+                level=level,
+                message=message,
+                raw=message,
+                tags={"n": index},
+            )
+            for index, (service, level, message) in enumerate(specs)
+        ]
+        with Session(engine) as session:
+            session.add_all(rows)
+            session.commit()
+            for row in rows:
+                session.refresh(row)
+                session.expunge(row)
+        return rows
+
+    return make
+
+
+@pytest.fixture
+def vector_store(monkeypatch, tmp_path):
+    """A VectorStore over an in-memory Qdrant and a local index; ``client_up = False`` takes Qdrant down."""
+    monkeypatch.setattr(settings, "vector_enabled", True)
+    monkeypatch.setattr(settings, "vector_backend", "auto")
+    monkeypatch.setattr(settings, "local_vector_path", str(tmp_path / "vectors"))
+    client = QdrantClient(location=":memory:")
+    client.create_collection(
+        settings.vector_collection,
+        vectors_config={"v": models.VectorParams(size=3, distance=models.Distance.COSINE)},
+    )
+    store = VectorStore()
+    store.client_up = True
+
+    def ensure_client():
+        if not store.client_up:
+            raise ConnectionError("qdrant is down")
+        return client
+
+    store._ensure_client = ensure_client
+    store._vector_name = "v"
+    store.available = True
+    store.qdrant = client
+    return store
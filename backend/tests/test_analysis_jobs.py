@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+
+from sqlmodel import Session
+
+from app.analysis_jobs import _load_incident, _load_logs
+from app.db import engine
+from app.models import Incident
+
+
+class _VectorStore:
+    """Records whether a database connection was checked out during the vector lookup."""
+
+    def __init__(self):
+        self.checked_out = []
+
+    def search_related_logs(self, **kwargs):
+        self.checked_out.append(engine.pool.checkedout())
+        return []
+
+
+def test_incident_context_is_retrieved_after_the_session_closes(make_logs):
+    logs = make_logs([("api", "ERROR", "db timeout on host-7"), ("api", "ERROR", "db timeout on host-7 again")])
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        incident = Incident(
+            created_at=now,
+            updated_at=now,
+            severity="high",
+            services=["api"],
+            title="db timeouts",
+            signature="timeout",
+            evidence_log_ids=[logs[0].id],
+        )
+        session.add(incident)
+        session.commit()
+        incident_id = incident.id
+    vector_store = _VectorStore()
+    incident, evidence, matches = _load_incident(vector_store, incident_id)
+    assert vector_store.checked_out == [0]
+    assert incident.services == ["api"]
+    assert [log.id for log in evidence] == [logs[0].id]
+    assert [match.log_id for match in matches] == [logs[1].id]
+
+
+def test_log_context_is_retrieved_after_the_session_closes(make_logs):
+    logs = make_logs([("api", "ERROR", "refused 10.0.0.1"), ("api", "INFO", "ok")])
+    vector_store = _VectorStore()
+    selected, _ = _load_logs(vector_store, [logs[1].id, logs[0].id])
+    assert vector_store.checked_out == [0]
+    assert [log.id for log in selected] == [logs[0].id, logs[1].id]
+    assert _load_logs(vector_store, [10**9]) is None
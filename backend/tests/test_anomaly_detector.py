@@ -0,0 +1,131 @@
+import random
+import re
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session
+
+from app.anomaly_detector import DetectedIncident, StreamingDetector, detect_incidents
+from app.db import engine
+from app.models import LogEntry
+from app.pattern_engine import classify
+
+
+# The detector before it kept window counters: regexes over every row in the window
+LEGACY_PATTERNS = [
+    (re.compile(r"db connection refused", re.IGNORECASE), "Database connection refused", "high"),
+    (re.compile(r"timeout", re.IGNORECASE), "Upstream timeout", "medium"),
+    (re.compile(r"out of memory|oom", re.IGNORECASE), "Out of memory", "high"),
+    (re.compile(r"address already in use|port .* in use", re.IGNORECASE), "Port binding failure", "high"),
+]
+
+
+def _legacy_detect(rows, now, window_minutes=5):
+    since = now - timedelta(minutes=window_minutes)
+    logs = [log for log in rows if log.timestamp.replace(tzinfo=timezone.utc) >= since]
+    incidents = []
+    error_logs = {}
+    for log in logs:
+        if log.level == "ERROR":
+            error_logs.setdefault(log.service, []).append(log)
+    for service, entries in error_logs.items():
+        if len(entries) >= 5:
+            incidents.append(
+                DetectedIncident(
+                    signature=f"error_burst:{service}",
+                    title=f"Error burst detected in {service}",
+                    severity="high" if len(entries) >= 10 else "medium",
+                    services=[service],
+                    evidence_log_ids=[e.id for e in entries[-20:]],
+                )
+            )
+    for pattern, title, severity in LEGACY_PATTERNS:
+        matched = [log for log in logs if pattern.search(log.message)]
+        if len(matched) >= 3:
+            incidents.append(
+                DetectedIncident(
+                    signature=f"sig:{pattern.pattern}",
+                    title=title,
+                    severity=severity,
+                    services=sorted({log.service for log in matched}),
+                    evidence_log_ids=[e.id for e in matched[-20:]],
+                )
+            )
+    restart_logs = [log for log in logs if re.search(r"restart|crash|exited", log.message, re.IGNORECASE)]
+    if len(restart_logs) >= 3:
+        incidents.append(
+            DetectedIncident(
+                signature="restart_pattern",
+                title="Repeated restarts detected",
+                severity="medium",
+                services=sorted({log.service for log in restart_logs}),
+                evidence_log_ids=[e.id for e in restart_logs[-20:]],
+            )
+        )
+    return [asdict(incident) for incident in incidents]
+
+
+MESSAGES = [
+    "request ok",
+    "DB connection refused by 10.0.0.5",
+    "Timeout waiting for upstream",
+    "OOM killer invoked",
+    "port 8080 in use",
+    "container exited with code 137",
+    "worker crash detected",
+    "ERROR boom",
+    "Address already in use",
+]
+
+
+@pytest.fixture
+def window_rows(db):
+    """1500 random rows in id order spread over the last 400 seconds, half with stored signatures."""
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc)
+    # Nothing lands within ten seconds of the five-minute cutoff, so a few
+    # seconds of test runtime cannot move a row across it
+    offsets = sorted((rng.uniform(0, 290) if rng.random() < 0.75 else rng.uniform(310, 400)) for _ in range(1500))
+    rows = []
+    for offset in reversed(offsets):
+        message = rng.choice(MESSAGES)
+        rows.append(
+            LogEntry(
+                timestamp=now - timedelta(seconds=offset),
+                service=rng.choice(["api", "worker", "db"]),
+                container_id="c-1",
+                level=rng.choice(["ERROR", "INFO", "WARN"]),
+                message=message,
+                raw=message,
+                tags={},
+                signatures=classify(message)[1] if rng.random() < 0.5 else None,
+            )
+        )
+    with Session(engine) as session:
+        session.add_all(rows)
+        session.commit()
+        for row in rows:
+            session.refresh(row)
+            session.expunge(row)
+    return now, rows
+
+
+def test_detect_incidents_matches_legacy(window_rows):
+    now, rows = window_rows
+    with Session(engine) as session:
+        detected = [asdict(incident) for incident in detect_incidents(session)]
+    expected = _legacy_detect(rows, now)
+    assert detected == expected
+    assert {incident["signature"] for incident in expected} >= {"restart_pattern", "error_burst:api", "sig:timeout"}
+
+
+def test_streaming_matches_legacy_as_the_window_slides(window_rows):
+    now, rows = window_rows
+    detector = StreamingDetector()
+    for start in range(0, len(rows), 50):
+        detector.observe(rows[start : start + 50])
+    for later in (0, 60, 200, 500):
+        at = now + timedelta(seconds=later)
+        assert [asdict(incident) for incident in detector.detect(now=at)] == _legacy_detect(rows, at)
+    assert detector.detect(now=now + timedelta(seconds=500)) == []
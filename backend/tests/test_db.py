@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app.db import INCIDENT_SERVICES_CHECKPOINT, _backfill_incident_services, engine
+from app.models import Incident, IncidentService, IndexCheckpoint
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _add_incidents(*services):
+    with Session(engine) as session:
+        incidents = [
+            Incident(created_at=NOW, updated_at=NOW, severity="high", services=names, title="t", signature=f"sig{i}")
+            for i, names in enumerate(services)
+        ]
+        session.add_all(incidents)
+        session.commit()
+        return [incident.id for incident in incidents]
+
+
+def _links():
+    with Session(engine) as session:
+        return {(row.incident_id, row.service) for row in session.exec(select(IncidentService))}
+
+
+def _incident_selects(run):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM incident " in statement and "incidentservice" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def test_backfill_links_legacy_incidents_once(db):
+    first, empty = _add_incidents(["api", "db", "api"], [])
+
+    _backfill_incident_services()
+
+    assert _links() == {(first, "api"), (first, "db")}
+    with Session(engine) as session:
+        assert session.get(IndexCheckpoint, INCIDENT_SERVICES_CHECKPOINT).last_id == empty
+    # The empty incident is covered by the checkpoint, so a restart scans nothing
+    assert _incident_selects(_backfill_incident_services) == []
+
+
+def test_backfill_resumes_after_checkpoint(db):
+    (first,) = _add_incidents(["api"])
+    _backfill_incident_services()
+    (second,) = _add_incidents(["worker"])
+
+    assert len(_incident_selects(_backfill_incident_services)) == 1
+    assert _links() == {(first, "api"), (second, "worker")}
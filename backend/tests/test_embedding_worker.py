@@ -0,0 +1,44 @@
+import queue
+import threading
+
+from app.embedding_worker import EmbeddingWorker
+from app.models import LogEntry
+from app.vector_backfill import VectorBackfill
+
+
+def _entries(ids):
+    return [LogEntry(id=log_id, timestamp=None, service="api", container_id="c", level="INFO", message="m", raw="") for log_id in ids]
+
+
+def test_drops_shed_the_rest_of_the_call_and_freeze_the_checkpoint(db):
+    backfill = VectorBackfill(vector_store=None)
+    backfill.in_sync = True
+    reports = []
+
+    def on_indexed(batch, indexed):
+        reports.append(([entry.id for entry in batch], indexed))
+        backfill.advance(batch, indexed)
+
+    worker = EmbeddingWorker(vector_store=None, on_indexed=on_indexed, max_queue=10)
+    # Stands in for the batching thread without draining the queue
+    worker.thread = threading.current_thread()
+    refused = {3}
+    put_nowait = worker.queue.put_nowait
+
+    def put(entry):
+        # The queue is full for entry 3 only, as if it drained right after
+        if entry.id in refused:
+            raise queue.Full
+        put_nowait(entry)
+
+    worker.queue.put_nowait = put
+
+    assert worker.submit(_entries([1, 2, 3, 4, 5])) == 2
+    assert reports == [([3, 4, 5], False)]
+    assert [worker.queue.get_nowait().id for _ in range(worker.queue.qsize())] == [1, 2]
+    assert (worker.stats()["enqueued"], worker.stats()["dropped"]) == (2, 3)
+
+    # Older batches still in flight finish afterwards; the checkpoint stays put
+    on_indexed(_entries([1, 2]), True)
+    assert backfill.checkpoint == 0
+    assert not backfill.in_sync
@@ -0,0 +1,91 @@
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.db import engine
+from app.ingestion import IngestionPipeline, _is_transient
+from app.models import LogEntry
+
+
+def _row(message):
+    return {
+        "timestamp": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "service": "api",
+        "container_id": "api-1",
+        "level": "INFO",
+        "message": message,
+        "raw": message or "",
+        "tags": {},
+        "signatures": [],
+    }
+
+
+def _operational(message):
+    return OperationalError("INSERT", {}, sqlite3.OperationalError(message))
+
+
+@pytest.mark.parametrize(
+    "message,transient",
+    [
+        ("database is locked", True),
+        ("database table is locked", True),
+        ("server closed the connection unexpectedly", True),
+        ("deadlock detected", True),
+        ("no such table: logentry", False),
+        ("table logentry has no column named message", False),
+    ],
+)
+def test_only_lock_and_connection_errors_are_transient(message, transient):
+    assert _is_transient(_operational(message)) is transient
+
+
+def test_rejected_rows_are_dropped_alone(db):
+    pipeline = IngestionPipeline()
+    # message is NOT NULL, so these two rows fail the multi-row insert
+    batch = [_row(f"m{i}") for i in range(10)]
+    batch[3]["message"] = None
+    batch[8]["message"] = None
+
+    entries = pipeline.flush(batch)
+
+    expected = [f"m{i}" for i in range(10) if i not in (3, 8)]
+    assert [entry.message for entry in entries] == expected
+    with Session(engine) as session:
+        assert session.exec(select(LogEntry.message).order_by(LogEntry.id)).all() == expected
+    stats = pipeline.stats()
+    assert (stats["written"], stats["failed"], stats["retries"]) == (8, 2, 0)
+
+
+def test_schema_errors_are_not_retried(db, monkeypatch):
+    monkeypatch.setattr(settings, "ingest_retry_backoff_ms", 0)
+    pipeline = IngestionPipeline()
+    calls = []
+
+    def write(batch):
+        calls.append(len(batch))
+        raise _operational("no such table: logentry")
+
+    pipeline._write = write
+    assert pipeline.flush([_row("a"), _row("b")]) == []
+    assert calls == [2, 1, 1]
+    assert (pipeline.stats()["failed"], pipeline.stats()["retries"]) == (2, 0)
+
+
+def test_transient_errors_are_retried_without_splitting(db, monkeypatch):
+    monkeypatch.setattr(settings, "ingest_retry_backoff_ms", 0)
+    monkeypatch.setattr(settings, "ingest_write_retries", 2)
+    pipeline = IngestionPipeline()
+    calls = []
+
+    def write(batch):
+        calls.append(len(batch))
+        raise _operational("database is locked")
+
+    pipeline._write = write
+    assert pipeline.flush([_row("a"), _row("b")]) == []
+    assert calls == [2, 2, 2]
+    assert (pipeline.stats()["failed"], pipeline.stats()["retries"]) == (2, 2)
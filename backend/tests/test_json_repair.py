@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from app.json_repair import PartialJSON, parse_analysis, parse_partial
+
+RESPONSE = (
+    '{"summary": "Pool \\"main\\" exhausted, caf\\u00e9 \\ud83d\\ude80 \\\\ retried\\nthen failed",'
+    ' "likely_root_cause": "max_connections=20 on db-1",'
+    ' "confidence": 0.85,'
+    ' "recommended_actions": ["Raise the pool size", "Add a 5s timeout"],'
+    ' "related_signals": [],'
+    ' "ok": true}'
+)
+
+
+def _is_prefix(partial, final):
+    """Whether ``partial`` is what a truncated ``final`` may honestly show: nothing invented or altered."""
+    if isinstance(final, dict):
+        return isinstance(partial, dict) and all(key in final and _is_prefix(value, final[key]) for key, value in partial.items())
+    if isinstance(final, list):
+        return (
+            isinstance(partial, list)
+            and len(partial) <= len(final)
+            and all(item == final[index] for index, item in enumerate(partial[:-1]))
+            and (not partial or _is_prefix(partial[-1], final[len(partial) - 1]))
+        )
+    if isinstance(final, str):
+        return isinstance(partial, str) and final.startswith(partial)
+    return partial == final
+
+
+def test_every_truncation_is_a_prefix_of_the_full_object():
+    final = json.loads(RESPONSE)
+    for cut in range(len(RESPONSE) + 1):
+        partial = parse_partial(RESPONSE[:cut])
+        assert partial is None or _is_prefix(partial, final), (cut, RESPONSE[:cut], partial)
+    assert parse_partial(RESPONSE) == final
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        # Partway through a key
+        ('{"summary": "ok", "likely_ro', {"summary": "ok"}),
+        ('{"summary": "ok", "', {"summary": "ok"}),
+        # Partway through a number, or a number that may still grow
+        ('{"summary": "ok", "confidence": 0.', {"summary": "ok"}),
+        ('{"summary": "ok", "confidence": 8', {"summary": "ok"}),
+        ('{"summary": "ok", "confidence": 85, "x', {"summary": "ok", "confidence": 85}),
+        ('{"summary": "ok", "n": [1, 2', {"summary": "ok", "n": [1]}),
+        ('{"summary": "ok", "n": [12', {"summary": "ok", "n": []}),
+        # Partway through an escape
+        ('{"summary": "a\\', {"summary": "a"}),
+        ('{"summary": "caf\\u00', {"summary": "caf"}),
+        ('{"summary": "go \\ud83d', {"summary": "go "}),
+        ('{"summary": "go \\ud83d\\ude', {"summary": "go "}),
+        ('{"summary": "go \\ud83d\\ude80', {"summary": "go \U0001F680"}),
+        ('{"summary": "a \\\\', {"summary": "a \\"}),
+        # Partway through a literal
+        ('{"summary": "ok", "done": tr', {"summary": "ok"}),
+    ],
+)
+def test_parse_partial_cuts(text, expected):
+    assert parse_partial(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ('Sure! Here it is:\n```json\n{"summary": "x"}\n```\nAnything else?', {"summary": "x"}),
+        ('{"summary": "x", "related_signals": ["a", "b",],}', {"summary": "x", "related_signals": ["a", "b"]}),
+        ('{"summary": "line one\nline two\ttabbed"}', {"summary": "line one\nline two\ttabbed"}),
+        ('{"summary": "x"} {"summary": "second"}', {"summary": "x"}),
+        ("no json here", None),
+        ("[1, 2, 3]", None),
+        ('{"summary": }', None),
+    ],
+)
+def test_parse_partial_malformed(text, expected):
+    assert parse_partial(text) == expected
+
+
+def test_feed_reports_only_changes():
+    parser = PartialJSON()
+    updates = [parser.feed(RESPONSE[index : index + 3]) for index in range(0, len(RESPONSE), 3)]
+    changes = [update for update in updates if update is not None]
+    assert len(changes) < len(updates)
+    assert all(a != b for a, b in zip(changes, changes[1:]))
+    summaries = [change["summary"] for change in changes if "summary" in change]
+    assert all(later.startswith(earlier) for earlier, later in zip(summaries, summaries[1:]))
+    assert parser.value == json.loads(RESPONSE)
+    assert parser.feed("") is None
+
+
+def test_parse_analysis_repairs_and_coerces():
+    analysis = parse_analysis(
+        'Analysis:\n{"summary": " Pool exhausted ", "root_cause": "pool too small", "confidence": "85%",'
+        ' "actions": "1. Raise the pool size\\n2) Add a timeout\\n", "related_signals": "db-1 latency",'
+    )
+    assert analysis == {
+        "summary": "Pool exhausted",
+        "likely_root_cause": "pool too small",
+        "confidence": 0.85,
+        "recommended_actions": ["Raise the pool size", "Add a timeout"],
+        "related_signals": ["db-1 latency"],
+    }
+
+
+@pytest.mark.parametrize("confidence,expected", [(0.4, 0.4), (85, 0.85), ("0.9", 0.9), (250, 1.0), (-1, 0.0), ("high", None)])
+def test_parse_analysis_confidence(confidence, expected):
+    assert parse_analysis(json.dumps({"summary": "x", "confidence": confidence}))["confidence"] == expected
+
+
+def test_parse_analysis_truncated_mid_number_drops_it():
+    assert parse_analysis('{"summary": "x", "confidence": 8')["confidence"] is None
+
+
+@pytest.mark.parametrize("text", ["", "I could not analyze these logs.", '{"confidence": 0.5, "recommended_actions": ["x"]}', '{"sum'])
+def test_parse_analysis_rejects_unusable_responses(text):
+    with pytest.raises(ValueError):
+        parse_analysis(text)
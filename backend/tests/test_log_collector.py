@@ -0,0 +1,112 @@
+from datetime import datetime, timezone
+
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.ingestion import IngestionPipeline
+from app.log_collector import DockerLogCollector, _load_cursors
+from app.models import CollectorCursor, LogEntry
+
+
+def _source():
+    return {"id": "abcdef1234567890", "short_id": "abcdef123456", "service": "api", "tags": {}}
+
+
+def _line(second, nanos, message):
+    return f"2026-01-01T00:00:{second:02d}.{nanos:09d}Z {message}\n".encode()
+
+
+def _accepted(collector, source, lines):
+    logs = [collector._normalize_line(source, line) for line in lines]
+    return [log for log in logs if log]
+
+
+def _messages(logs):
+    return [log["message"] for log in logs]
+
+
+def test_live_lines_that_tie_or_go_back_are_kept():
+    collector = DockerLogCollector(on_log=lambda log: None)
+    source = _source()
+    collector._stream_window(source)
+    # Three traceback lines within one microsecond, then stderr landing before stdout
+    logs = _accepted(
+        collector,
+        source,
+        [
+            _line(1, 500000123, "Traceback (most recent call last):"),
+            _line(1, 500000456, 'File "app.py", line 1'),
+            _line(1, 500000789, "ValueError: boom"),
+            _line(2, 0, "stdout"),
+            _line(2, 0, "same stamp"),
+            _line(1, 900000000, "stderr, a little late"),
+        ],
+    )
+    assert _messages(logs) == [
+        "Traceback (most recent call last):",
+        'File "app.py", line 1',
+        "ValueError: boom",
+        "stdout",
+        "same stamp",
+        "stderr, a little late",
+    ]
+    assert collector.cursors["abcdef123456"] == int(datetime(2026, 1, 1, 0, 0, 2, tzinfo=timezone.utc).timestamp()) * 10**9
+
+
+def test_reconnect_skips_only_the_replayed_lines():
+    collector = DockerLogCollector(on_log=lambda log: None)
+    source = _source()
+    collector._stream_window(source)
+    _accepted(collector, source, [_line(1, 100, "a"), _line(1, 200, "b")])
+
+    # The stream drops and reopens from the start of second 1
+    collector._stream_window(source)
+    logs = _accepted(
+        collector,
+        source,
+        [_line(1, 100, "a"), _line(1, 200, "b"), _line(1, 201, "c"), _line(1, 200, "d, same stamp as b"), _line(1, 50, "e")],
+    )
+    assert _messages(logs) == ["c", "d, same stamp as b", "e"]
+
+
+def test_stream_window_starts_at_the_cursor_second():
+    collector = DockerLogCollector(on_log=lambda log: None)
+    source = _source()
+    assert collector._stream_window(source) == {"tail": 10}
+    _accepted(collector, source, [_line(7, 900000000, "a")])
+    since = int(datetime(2026, 1, 1, 0, 0, 7, tzinfo=timezone.utc).timestamp())
+    assert collector._stream_window(source) == {"tail": "all", "since": since}
+
+
+def test_restart_resumes_after_the_last_stored_line(db):
+    pipeline = IngestionPipeline()
+    first = DockerLogCollector(on_log=lambda log: None)
+    source = _source()
+    first._stream_window(source)
+    pipeline.flush(_accepted(first, source, [_line(3, 0, "one"), _line(3, 250000123, "two")]))
+
+    # A new process loads the cursors committed with the rows. Docker's
+    # ``since`` is whole seconds, so the reconnect replays all of second 3;
+    # "three" shares a microsecond with "two" but is a different line
+    second = DockerLogCollector(on_log=lambda log: None)
+    second.cursors = _load_cursors()
+    source = _source()
+    second._stream_window(source)
+    replayed = _accepted(second, source, [_line(3, 0, "one"), _line(3, 250000123, "two"), _line(3, 250000456, "three")])
+    pipeline.flush(replayed)
+
+    with Session(engine) as session:
+        messages = session.exec(select(LogEntry.message).order_by(LogEntry.id)).all()
+    assert messages == ["one", "two", "three"]
+
+
+def test_cursor_stored_without_nanoseconds_covers_its_microsecond(db):
+    with Session(engine) as session:
+        session.add(CollectorCursor(container_id="abcdef123456", last_timestamp=datetime(2026, 1, 1, 0, 0, 3, 250000)))
+        session.commit()
+    collector = DockerLogCollector(on_log=lambda log: None)
+    collector.cursors = _load_cursors()
+    source = _source()
+    collector._stream_window(source)
+    logs = _accepted(collector, source, [_line(3, 250000123, "stored"), _line(3, 250001000, "new")])
+    assert _messages(logs) == ["new"]
@@ -0,0 +1,130 @@
+import gzip
+import io
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db import engine
+from app.log_export import ExportError, check_export, export_logs, export_statement, iter_batches
+
+
+def _ndjson(chunks):
+    return [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines()]
+
+
+def _logs(make_logs, count):
+    return make_logs([("api" if i % 2 else "worker", "ERROR" if i % 5 == 0 else "INFO", f"line {i}") for i in range(count)])
+
+
+def test_batches_cover_every_row_once_in_order(make_logs):
+    rows = _logs(make_logs, 23)
+    batches = list(iter_batches(export_statement(), batch_size=5))
+    assert [len(batch) for batch in batches] == [5, 5, 5, 5, 3]
+    assert [row[0] for batch in batches for row in batch] == [row.id for row in rows]
+
+
+def test_batches_page_past_equal_timestamps(make_logs):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows = make_logs([("api", "INFO", f"same {i}") for i in range(7)], start=start)
+    # Same timestamp everywhere: only the id half of the keyset separates pages
+    with engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE logentry SET timestamp = (SELECT MIN(timestamp) FROM logentry)")
+    ids = [row[0] for batch in iter_batches(export_statement(), batch_size=3) for row in batch]
+    assert ids == [row.id for row in rows]
+
+
+def test_limit_and_filters(make_logs):
+    _logs(make_logs, 20)
+    rows = [row for batch in iter_batches(export_statement(service="api", level="INFO"), batch_size=3, limit=4) for row in batch]
+    assert len(rows) == 4
+    assert {(row.service, row.level) for row in rows} == {("api", "INFO")}
+
+
+def test_ndjson_matches_stored_rows(make_logs):
+    rows = make_logs([("api", "ERROR", 'quote " and newline \n and é')])
+    [line] = _ndjson(export_logs(export_statement()))
+    assert line == {
+        "id": rows[0].id,
+        "timestamp": rows[0].timestamp.replace(tzinfo=None).isoformat(),
+        "service": "api",
+        "container_id": "api-1",
+        "level": "ERROR",
+        "message": 'quote " and newline \n and é',
+        "raw": 'quote " and newline \n and é',
+        "tags": {"n": 0},
+    }
+
+
+def test_gzip_round_trip(make_logs):
+    _logs(make_logs, 12)
+    plain = b"".join(export_logs(export_statement()))
+    assert gzip.decompress(b"".join(export_logs(export_statement(), compression="gzip"))) == plain
+
+
+def test_no_read_transaction_held_between_batches(make_logs, monkeypatch):
+    _logs(make_logs, 10)
+    monkeypatch.setattr("app.log_export.settings.export_batch_size", 2)
+    chunks = export_logs(export_statement())
+    next(chunks)
+    # The export is paused mid-stream, as with a slow client; a writer must still commit at once
+    path = engine.url.database
+    writer = sqlite3.connect(path, timeout=0.2)
+    writer.execute("UPDATE logentry SET message = 'changed' WHERE id = (SELECT MAX(id) FROM logentry)")
+    writer.commit()
+    writer.close()
+    assert len(_ndjson(chunks)) == 8
+
+
+def test_rejects_unknown_options():
+    with pytest.raises(ExportError):
+        check_export("csv", None)
+    with pytest.raises(ExportError):
+        check_export("arrow", "gzip")
+
+
+@pytest.mark.parametrize("fmt,compression", [("arrow", None), ("arrow", "zstd"), ("parquet", None), ("parquet", "zstd")])
+def test_arrow_formats(make_logs, monkeypatch, fmt, compression):
+    pa = pytest.importorskip("pyarrow")
+    rows = _logs(make_logs, 11)
+    monkeypatch.setattr("app.log_export.settings.export_batch_size", 4)
+    check_export(fmt, compression)
+    data = b"".join(export_logs(export_statement(), fmt, compression))
+    if fmt == "arrow":
+        table = pa.ipc.open_stream(data).read_all()
+    else:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(data))
+        assert pq.ParquetFile(io.BytesIO(data)).num_row_groups == 3
+    assert table.column("id").to_pylist() == [row.id for row in rows]
+    assert json.loads(table.column("tags")[0].as_py()) == {"n": 0}
+    first = table.column("timestamp")[0].as_py()
+    assert first == rows[0].timestamp.replace(tzinfo=timezone.utc)
+    assert table.column("timestamp")[1].as_py() - first == timedelta(milliseconds=1)
+
+
+def test_zstd_ndjson(make_logs):
+    zstandard = pytest.importorskip("zstandard")
+    _logs(make_logs, 5)
+    plain = b"".join(export_logs(export_statement()))
+    compressed = b"".join(export_logs(export_statement(), compression="zstd"))
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(compressed) == plain
+
+
+def test_export_route_streams_attachment(make_logs):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.routes import router
+
+    _logs(make_logs, 6)
+    app = FastAPI()
+    app.include_router(router)
+    response = TestClient(app).get("/api/logs/export?service=api&limit=2")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "attachment" in response.headers["content-disposition"]
+    assert [row["service"] for row in map(json.loads, response.text.splitlines())] == ["api", "api"]
+    assert TestClient(app).get("/api/logs/export?format=csv").status_code == 400
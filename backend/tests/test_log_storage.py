@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from qdrant_client import models
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.db import engine
+from app.local_vector_index import LocalVectorIndex
+from app.log_storage import LogStorage
+from app.log_templates import log_template
+from app.models import LogEntry, LogPartition
+from app.vector_store import _payload
+
+
+def _index(store, rows):
+    vectors = [[1.0, float(index % 3), 0.5] for index, _ in enumerate(rows)]
+    store.local.add([(row.id, row.timestamp, row.service, vector) for row, vector in zip(rows, vectors)])
+    store.qdrant.upsert(
+        settings.vector_collection,
+        points=[
+            models.PointStruct(id=row.id, vector={"v": vector}, payload=_payload(row, log_template(row.message)))
+            for row, vector in zip(rows, vectors)
+        ],
+    )
+
+
+def _qdrant_ids(store):
+    points, _ = store.qdrant.scroll(settings.vector_collection, limit=1000, with_payload=False)
+    return {point.id for point in points}
+
+
+def _rows(make_logs, now):
+    old = make_logs([("api", "INFO", f"old {i}") for i in range(7)], start=now - timedelta(days=10))
+    new = make_logs([("api", "ERROR", f"new {i}") for i in range(4)], start=now - timedelta(hours=1))
+    return old, new
+
+
+def test_retention_drops_rows_partitions_and_vectors(make_logs, vector_store):
+    now = datetime.now(timezone.utc)
+    old, new = _rows(make_logs, now)
+    _index(vector_store, old + new)
+    vector_store.local.mark_pending(row.id for row in old[:3] + new[:1])
+    storage = LogStorage(retention_days=3, rollup_retention_days=0, delete_batch=2, vector_store=vector_store)
+    storage.backfill()
+
+    assert storage.apply_retention(now) == len(old)
+
+    new_ids = {row.id for row in new}
+    with Session(engine) as session:
+        assert set(session.exec(select(LogEntry.id)).all()) == new_ids
+        assert len(session.exec(select(LogPartition)).all()) == 1
+    assert vector_store.local.contains(row.id for row in old + new) == new_ids
+    assert vector_store.local.pending(10) == [new[0].id]
+    assert _qdrant_ids(vector_store) == new_ids
+    assert storage.stats()["dropped_vectors"] == len(old)
+
+    # The compacted local index is what a restart loads
+    reopened = LocalVectorIndex(settings.local_vector_path)
+    assert reopened.count == len(new)
+    assert {log_id for log_id, _ in reopened.search([1.0, 0.0, 0.5], limit=20)} == new_ids
+    assert reopened.vectors_for([new[1].id]) == vector_store.local.vectors_for([new[1].id])
+
+
+def test_vectors_missed_while_qdrant_is_down_go_with_the_next_run(make_logs, vector_store):
+    now = datetime.now(timezone.utc)
+    old, new = _rows(make_logs, now)
+    _index(vector_store, old + new)
+    storage = LogStorage(retention_days=3, rollup_retention_days=0, vector_store=vector_store)
+    storage.backfill()
+
+    vector_store.client_up = False
+    storage.apply_retention(now)
+    assert vector_store.local.count == len(new)
+    assert len(_qdrant_ids(vector_store)) == len(old) + len(new)
+
+    vector_store.client_up = True
+    storage.apply_retention(now + timedelta(minutes=1))
+    assert _qdrant_ids(vector_store) == {row.id for row in new}
+
+
+def test_failed_retention_runs_are_reported(make_logs):
+    now = datetime.now(timezone.utc)
+    _rows(make_logs, now)
+    storage = LogStorage(retention_days=3, rollup_retention_days=0)
+    storage.backfill()
+
+    def fail(partition, cutoff):
+        raise RuntimeError("database is locked")
+
+    storage._delete_day = fail
+    with pytest.raises(RuntimeError) as error:
+        storage.apply_retention(now)
+    storage.record_retention_failure(error.value)
+
+    stats = storage.stats()
+    assert (stats["retention_failures"], stats["last_retention_error"]) == (1, "RuntimeError: database is locked")
+    assert (stats["retention_runs"], stats["expired_days"]) == (0, 0)
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.db import engine
+from app.models import Incident, LogEntry
+from app.routes import _decode_cursor, _encode_cursor, router
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def _add_logs(count, first=0):
+    # Three rows share each timestamp, so pages regularly end inside a tie
+    with Session(engine) as session:
+        session.add_all(
+            LogEntry(
+                timestamp=START + timedelta(seconds=(first + i) // 3),
+                service=f"s{(first + i) % 2}",
+                container_id="c",
+                level="INFO",
+                message=f"m{first + i}",
+                raw="",
+                tags={},
+            )
+            for i in range(count)
+        )
+        session.commit()
+
+
+def _pages(client, path, params):
+    ids, pages, cursor = [], [], None
+    while True:
+        response = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        page = [row["id"] for row in response.json()]
+        pages.append(page)
+        ids.extend(page)
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.parametrize(
+    "timestamp",
+    [
+        datetime(2026, 3, 1, 12, 30, 5, 123456, tzinfo=timezone.utc),
+        datetime(2026, 3, 1, 12, 30, 5),
+    ],
+)
+def test_cursor_round_trip(timestamp):
+    cursor = _encode_cursor(timestamp, 42)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor) == (timestamp, 42)
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "", _encode_cursor(START, 1)[:-3], "WyJub3QgYSBkYXRlIiwgMV0"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_log_pages_have_no_gaps_or_duplicates(client):
+    _add_logs(100)
+    for params in ({"limit": 7}, {"limit": 10, "service": "s1"}):
+        ids, pages = _pages(client, "/api/logs", params)
+        expected = [row["id"] for row in client.get("/api/logs", params={**params, "limit": 1000}).json()]
+        assert ids == expected
+        assert len(set(ids)) == len(ids)
+        assert all(len(page) <= params["limit"] for page in pages)
+    assert len(_pages(client, "/api/logs", {"limit": 7})[0]) == 100
+
+
+def test_log_pages_ignore_rows_inserted_while_paging(client):
+    _add_logs(30)
+    first = client.get("/api/logs", params={"limit": 10})
+    # Newer rows arrive between pages; with offsets the next page would repeat the tail of this one
+    _add_logs(12, first=30)
+    second = client.get("/api/logs", params={"limit": 10, "cursor": first.headers["x-next-cursor"]})
+    first_ids = [row["id"] for row in first.json()]
+    second_ids = [row["id"] for row in second.json()]
+    assert not set(first_ids) & set(second_ids)
+    assert min(first_ids) - 1 == max(second_ids)
+
+
+def test_incident_pages_have_no_gaps_or_duplicates(client):
+    with Session(engine) as session:
+        for i in range(45):
+            updated = START + timedelta(seconds=i // 4)
+            session.add(
+                Incident(
+                    created_at=updated,
+                    updated_at=updated,
+                    severity="high",
+                    services=["api"],
+                    title=f"t{i}",
+                    signature=f"sig{i}",
+                    evidence_log_ids=[],
+                )
+            )
+        session.commit()
+    ids, _ = _pages(client, "/api/incidents", {"limit": 6})
+    assert ids == [row["id"] for row in client.get("/api/incidents", params={"limit": 1000}).json()]
+    assert len(set(ids)) == 45
+
+
+def test_cursor_rejects_relevance_order(client):
+    assert client.get("/api/logs", params={"q": "m1", "order": "relevance", "cursor": _encode_cursor(START, 1)}).status_code == 400
+    assert client.get("/api/logs", params={"cursor": "garbage"}).status_code == 400
@@ -0,0 +1,60 @@
+import random
+import re
+
+import pytest
+
+from app.pattern_engine import LEVEL_PATTERNS, SIGNATURE_PATTERNS, PatternEngine, classify
+
+
+def _legacy_classify(message, level_patterns=LEVEL_PATTERNS, signature_patterns=SIGNATURE_PATTERNS):
+    """The per-rule ``re.search`` loops that PatternEngine replaced."""
+    level = "INFO"
+    for candidate, patterns in level_patterns.items():
+        if any(re.search(pattern, message, re.IGNORECASE) for pattern in patterns):
+            level = candidate
+            break
+    signatures = [signature_id for signature_id, pattern in signature_patterns.items() if re.search(pattern, message, re.IGNORECASE)]
+    return level, signatures
+
+
+FRAGMENTS = [
+    "ERROR", "error", "ERRORS", "err", "ERR:", "Exception", "exceptional", "Traceback", "panic", "FATAL",
+    "WARN", "warning", "Timeout", "timed out", "DEBUG", "info", "db connection refused", "DB Connection Refused",
+    "out of memory", "OOM", "room", "bloom", "address already in use", "port 8080 in use", "port", "in use",
+    "restart", "restarting", "crash", "exited", "ok", "request", "GET /health 200", "-", "42ms", "été",
+]
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "",
+        "all good",
+        "ERROR: db connection refused",
+        "WARN: request timed out after 30s, then ERROR",
+        "debug info",  # DEBUG is declared before INFO
+        "ERRORS are not ERROR",
+        "worker crash, restarting (OOM)",
+        "bloom filter in room 3",  # "oom" only inside other words
+        "port 80 is not in use yet, port 81 in use",
+        "connection timeout; TIMEOUT again",
+        "Traceback (most recent call last): Exception",
+    ],
+)
+def test_classify_matches_legacy_regexes(message):
+    assert classify(message) == _legacy_classify(message)
+
+
+def test_classify_matches_legacy_regexes_on_random_lines():
+    rng = random.Random(3)
+    for _ in range(5000):
+        message = " ".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 6)))
+        assert classify(message) == _legacy_classify(message), message
+
+
+def test_patterns_without_literals_skip_the_prefilter():
+    levels = {"ERROR": [r"\d{3} failed", r"\bERROR\b"], "INFO": [r"\bINFO\b"]}
+    signatures = {"http_5xx": r"5\d\d", "error": r"\bERROR\b"}
+    engine = PatternEngine(levels, signatures)
+    for message in ["GET / 503 failed", "ERROR 500", "INFO 200", "nothing here", "404 failed INFO"]:
+        assert engine.classify(message) == _legacy_classify(message, levels, signatures), message
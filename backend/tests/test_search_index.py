@@ -0,0 +1,87 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models import LogEntry
+from app.routes import router
+from app.search_index import _fts5_query, apply_log_search, keyword_terms, parse_query, search_backend
+
+
+@pytest.mark.parametrize(
+    "q,terms",
+    [
+        ("refus", [(["refus"], True)]),
+        ("refus*", [(["refus"], True)]),
+        ('"connection refused"', [(["connection", "refused"], False)]),
+        ('"connection refused" db-1', [(["connection", "refused"], False), (["db", "1"], True)]),
+        ('"conn refused', [(["conn"], True), (["refused"], True)]),
+        ('" * ()', []),
+        ("   ", []),
+    ],
+)
+def test_parse_query(q, terms):
+    assert parse_query(q) == terms
+
+
+def test_fts5_query_quotes_every_term():
+    assert _fts5_query(parse_query('"connection refused" OR NEAR(x')) == '"connection refused" "OR" * "NEAR x" *'
+
+
+def test_keyword_terms_put_identifiers_first():
+    terms = keyword_terms("Incident severity high: timeout calling OrderService.charge on db-01.prod ECONNREFUSED 504")
+    assert terms[:4] == [(["OrderService", "charge"], False), (["db", "01", "prod"], False), (["ECONNREFUSED"], False), (["504"], False)]
+    assert (["timeout"], False) in terms
+    assert (["high"], False) not in terms
+
+
+def _search(q, by_relevance=False):
+    stmt = select(LogEntry) if by_relevance else select(LogEntry).order_by(LogEntry.id)
+    stmt = apply_log_search(stmt, q, by_relevance=by_relevance)
+    with Session(engine) as session:
+        return [row.message for row in session.exec(stmt).all()]
+
+
+def test_fts_search(make_logs):
+    assert search_backend() == "fts5"
+    make_logs(
+        [
+            ("payments", "ERROR", "DB connection refused on host db-1"),
+            ("payments", "ERROR", "connection pool refused request"),
+            ("worker", "ERROR", "ECONNREFUSED 10.0.0.1:5432"),
+            ("worker", "INFO", "heartbeat ok"),
+        ]
+    )
+    # Bare words match as prefixes, like the substring search they replaced
+    assert _search("refus") == ["DB connection refused on host db-1", "connection pool refused request"]
+    assert _search("heart") == ["heartbeat ok"]
+    assert _search('"connection refused"') == ["DB connection refused on host db-1"]
+    assert _search("econnrefused") == ["ECONNREFUSED 10.0.0.1:5432"]
+    assert _search("db-1") == ["DB connection refused on host db-1"]
+    # Other columns are indexed too
+    assert _search("worker heart") == ["heartbeat ok"]
+    # FTS5 syntax in user input is quoted, never parsed
+    assert _search("refused OR NEAR(") == []
+    assert _search("") == _search("   ")
+    assert len(_search("")) == 4
+    # Non-empty input without a searchable word matches nothing rather than everything
+    assert _search('"') == _search("---") == _search('" * ()') == []
+
+
+def test_relevance_order(make_logs):
+    make_logs([("api", "ERROR", "refused once"), ("api", "ERROR", "refused refused refused twice over")])
+    assert _search("refused", by_relevance=True)[0] == "refused refused refused twice over"
+
+
+def test_logs_endpoint_returns_nothing_for_a_query_without_words(make_logs):
+    make_logs([("api", "INFO", "--- separator ---"), ("api", "INFO", "ok")])
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    for q in ("---", '" * ()'):
+        for order in ("time", "relevance"):
+            response = client.get("/api/logs", params={"q": q, "order": order})
+            assert response.status_code == 200
+            assert response.json() == []
+    assert len(client.get("/api/logs", params={"q": " "}).json()) == 2
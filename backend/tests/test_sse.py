@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes import router
+from app.sse import LogBroadcaster, log_to_event
+
+
+def _data(frame):
+    return json.loads(frame.split("data: ", 1)[1])
+
+
+def _ids(frames):
+    ids = []
+    for frame in frames:
+        data = _data(frame)
+        ids.extend(event["id"] for event in (data if isinstance(data, list) else [data]))
+    return ids
+
+
+async def _take(subscription, count, batch_seconds=0.0):
+    frames = subscription.frames(batch_seconds)
+    return [await asyncio.wait_for(anext(frames), 1.0) for _ in range(count)]
+
+
+def _broadcaster(rows, ring):
+    broadcaster = LogBroadcaster(replay_size=ring)
+    broadcaster.publish_many(log_to_event(row) for row in rows)
+    return broadcaster
+
+
+def test_resume_from_ring(make_logs):
+    rows = make_logs([("api", "INFO", f"line {i}") for i in range(6)])
+
+    async def run():
+        broadcaster = _broadcaster(rows, ring=3)
+        subscription = broadcaster.subscribe()
+        frames, truncated = await broadcaster.resume(subscription, rows[3].id)
+        return broadcaster, frames, truncated
+
+    broadcaster, frames, truncated = asyncio.run(run())
+    assert _ids(frames) == [rows[4].id, rows[5].id]
+    assert not truncated
+    assert (broadcaster.replayed_from_memory, broadcaster.replayed_from_db) == (2, 0)
+
+
+def test_resume_hands_off_from_database_to_live_events(make_logs):
+    rows = make_logs([("api" if i % 2 else "worker", "INFO", f"line {i}") for i in range(7)])
+
+    async def run():
+        # The ring only holds the last three rows, so the gap after rows[0] comes from the database
+        broadcaster = _broadcaster(rows, ring=3)
+        subscription = broadcaster.subscribe(service="api")
+        frames, truncated = await broadcaster.resume(subscription, rows[0].id)
+        # rows[5] was both replayed and (in a race with the replay) queued live
+        broadcaster.publish(log_to_event(rows[5]))
+        [new] = make_logs([("api", "INFO", "after resume")])
+        broadcaster.publish(log_to_event(new))
+        return broadcaster, frames, truncated, new, await _take(subscription, 1)
+
+    broadcaster, frames, truncated, new, live = asyncio.run(run())
+    assert _ids(frames) == [rows[1].id, rows[3].id, rows[5].id]
+    assert not truncated
+    assert broadcaster.replayed_from_db == 3
+    assert _ids(live) == [new.id]
+
+
+def test_resume_truncates_long_database_gaps(make_logs):
+    rows = make_logs([("api", "INFO", f"line {i}") for i in range(6)])
+
+    async def run():
+        broadcaster = _broadcaster(rows[4:], ring=2)
+        subscription = broadcaster.subscribe()
+        return subscription, await broadcaster.resume(subscription, rows[0].id, limit=2)
+
+    subscription, (frames, truncated) = asyncio.run(run())
+    assert _ids(frames) == [rows[1].id, rows[2].id]
+    assert truncated
+    assert subscription.skip_through == rows[2].id
+
+
+def test_resume_past_the_newest_id_skips_nothing(make_logs):
+    rows = make_logs([("api", "INFO", f"line {i}") for i in range(3)])
+
+    async def run():
+        broadcaster = _broadcaster(rows[:2], ring=10)
+        subscription = broadcaster.subscribe()
+        # e.g. the browser kept an id from before the database was reset
+        frames, truncated = await broadcaster.resume(subscription, 10**9)
+        broadcaster.publish(log_to_event(rows[2]))
+        return frames, truncated, await _take(subscription, 1)
+
+    frames, truncated, live = asyncio.run(run())
+    assert frames == []
+    assert not truncated
+    assert _ids(live) == [rows[2].id]
+
+
+def test_batches_keep_named_events_in_order(make_logs):
+    rows = make_logs([("api", "INFO", f"line {i}") for i in range(3)])
+
+    async def run():
+        broadcaster = LogBroadcaster()
+        subscription = broadcaster.subscribe()
+        broadcaster.publish(log_to_event(rows[0]))
+        broadcaster.publish(log_to_event(rows[1]))
+        broadcaster.publish({"event": "analysis", "data": {"id": 1}})
+        broadcaster.publish(log_to_event(rows[2]))
+        return subscription, await _take(subscription, 3, batch_seconds=0.01)
+
+    subscription, (batch, named, tail) = asyncio.run(run())
+    assert subscription.delivered == 4
+    assert batch.startswith(f"id: {rows[1].id}\n")
+    assert [event["id"] for event in _data(batch)] == [rows[0].id, rows[1].id]
+    assert named == 'event: analysis\ndata: {"id": 1}\n\n'
+    assert [event["id"] for event in _data(tail)] == [rows[2].id]
+
+
+def test_delivered_counts_frames_sent_not_events_queued(make_logs):
+    rows = make_logs([("api", "INFO", f"line {i}") for i in range(5)])
+
+    async def run():
+        broadcaster = LogBroadcaster(maxsize=2)
+        subscription = broadcaster.subscribe()
+        broadcaster.publish_many(log_to_event(row) for row in rows)
+        queued = subscription.delivered
+        return queued, subscription, await _take(subscription, 2)
+
+    queued, subscription, frames = asyncio.run(run())
+    assert queued == 0
+    assert _ids(frames) == [rows[3].id, rows[4].id]
+    assert (subscription.delivered, subscription.dropped) == (2, 3)
+
+
+def test_metrics_reads_the_broadcaster_on_the_event_loop(db):
+    class Broadcaster(LogBroadcaster):
+        def stats(self):
+            asyncio.get_running_loop()
+            return super().stats()
+
+    app = FastAPI()
+    app.include_router(router)
+    app.state.broadcaster = Broadcaster()
+    response = TestClient(app).get("/api/metrics")
+    assert response.status_code == 200
+    assert response.json()["stream"]["subscribers"] == 0
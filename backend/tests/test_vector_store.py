@@ -0,0 +1,22 @@
+from app.config import settings
+
+
+def test_saturated_qdrant_reads_fall_back_to_the_local_index(make_logs, vector_store, monkeypatch):
+    monkeypatch.setattr(settings, "vector_timeout", 0.01)
+    rows = make_logs([("api", "ERROR", f"pool exhausted {i}") for i in range(3)])
+    vector_store.local.add([(row.id, row.timestamp, row.service, [1.0, float(i), 0.5]) for i, row in enumerate(rows)])
+    vector_store.embed = lambda texts: [[1.0, 0.0, 0.5] for _ in texts]
+
+    slots = vector_store._slots["read"]
+    held = 0
+    while slots.acquire(blocking=False):
+        held += 1
+    try:
+        matches = vector_store.search_related_logs(query_text="pool exhausted", limit=2)
+    finally:
+        for _ in range(held):
+            slots.release()
+
+    assert [match.log_id for match in matches] == [rows[0].id, rows[1].id]
+    stats = vector_store.stats()
+    assert (stats["rejected"], stats["local_searches"], stats["available"]) == (1, 1, True)
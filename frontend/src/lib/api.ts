@@ -44,6 +44,20 @@ export interface LogSelectionAnalyzeResponse {
   related_signals?: string[]
 }
 
+export interface AnalysisJob {
+  id: number
+  kind: 'incident' | 'logs'
+  incident_id?: number | null
+  log_ids: number[]
+  force: boolean
+  status: 'queued' | 'running' | 'done' | 'failed'
+  result?: IncidentAnalyzeResponse | LogSelectionAnalyzeResponse | null
+  error?: string | null
+  created_at: string
+  started_at?: string | null
+  finished_at?: string | null
+}
+
 export interface ContainerInfo {
   id: string
   name: string
@@ -84,6 +98,28 @@ async function request<T>(path: string, options?: RequestInit): Promise<T> {
   return res.json()
 }
 
+async function requestPage<T>(path: string): Promise<{ items: T[]; nextCursor: string | null }> {
+  const res = await fetch(`${API_BASE}${path}`, {
+    headers: { 'Content-Type': 'application/json' }
+  })
+  if (!res.ok) {
+    const message = await res.text()
+    throw new Error(message || 'Request failed')
+  }
+  return { items: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') }
+}
+
+function toQueryString(query: object) {
+  const params = new URLSearchParams()
+  Object.entries(query).forEach(([key, value]) => {
+    if (value !== undefined && value !== '') {
+      params.set(key, String(value))
+    }
+  })
+  const qs = params.toString()
+  return qs ? `?${qs}` : ''
+}
+
 export function getHealth() {
   return request<HealthResponse>('/health')
 }
@@ -100,6 +136,7 @@ export interface LogQuery {
   end?: string
   limit?: number
   offset?: number
+  cursor?: string
 }
 
 export function getLogs(query: LogQuery) {
@@ -122,6 +159,7 @@ export interface IncidentQuery {
   end?: string
   limit?: number
   offset?: number
+  cursor?: string
 }
 
 export function getIncidents(query: IncidentQuery) {
@@ -135,18 +173,39 @@ export function getIncidents(query: IncidentQuery) {
   return request<Incident[]>(`/incidents${qs ? `?${qs}` : ''}`)
 }
 
+export interface LogRollup {
+  bucket: string
+  service: string
+  level: string
+  count: number
+}
+
+export interface LogRollupQuery {
+  service?: string
+  level?: string
+  start?: string
+  end?: string
+  bucket_minutes?: number
+}
+
+export function getLogRollups(query: LogRollupQuery) {
+  return request<LogRollup[]>(`/logs/rollups${toQueryString(query)}`)
+}
+
 export async function getAllLogs(query: LogQuery, pageSize = 500, maxPages = 200) {
   const all: LogEntry[] = []
-  let offset = 0
+  let cursor: string | null = null
   let pageCount = 0
 
   while (true) {
-    const page = await getLogs({ ...query, limit: pageSize, offset })
-    all.push(...page)
+    const page: { items: LogEntry[]; nextCursor: string | null } = await requestPage<LogEntry>(
+      `/logs${toQueryString({ ...query, limit: pageSize, offset: undefined, cursor: cursor ?? undefined })}`
+    )
+    all.push(...page.items)
     pageCount += 1
-    if (page.length < pageSize) break
+    cursor = page.nextCursor
+    if (!cursor) break
     if (pageCount >= maxPages) break
-    offset += pageSize
   }
 
   return all
@@ -154,16 +213,18 @@ export async function getAllLogs(query: LogQuery, pageSize = 500, maxPages = 200
 
 export async function getAllIncidents(query: IncidentQuery, pageSize = 200, maxPages = 200) {
   const all: Incident[] = []
-  let offset = 0
+  let cursor: string | null = null
   let pageCount = 0
 
   while (true) {
-    const page = await getIncidents({ ...query, limit: pageSize, offset })
-    all.push(...page)
+    const page: { items: Incident[]; nextCursor: string | null } = await requestPage<Incident>(
+      `/incidents${toQueryString({ ...query, limit: pageSize, offset: undefined, cursor: cursor ?? undefined })}`
+    )
+    all.push(...page.items)
     pageCount += 1
-    if (page.length < pageSize) break
+    cursor = page.nextCursor
+    if (!cursor) break
     if (pageCount >= maxPages) break
-    offset += pageSize
   }
 
   return all
@@ -173,24 +234,86 @@ export function getIncident(id: number) {
   return request<Incident>(`/incidents/${id}`)
 }
 
-export function analyzeIncident(id: number) {
-  return request<IncidentAnalyzeResponse>(`/incidents/${id}/analyze`, { method: 'POST' })
+export function startIncidentAnalysis(id: number, force = false) {
+  return request<AnalysisJob>(
+    `/incidents/${id}/analyze${toQueryString({ background: true, force: force || undefined })}`,
+    { method: 'POST' }
+  )
 }
 
-export function analyzeSelectedLogs(logIds: number[]) {
-  return request<LogSelectionAnalyzeResponse>('/logs/analyze', {
+export function startLogAnalysis(logIds: number[], force = false) {
+  return request<AnalysisJob>(`/logs/analyze${toQueryString({ background: true, force: force || undefined })}`, {
     method: 'POST',
     body: JSON.stringify({ log_ids: logIds })
   })
 }
 
-export function createLogStream(onMessage: (log: LogEntry) => void) {
-  const url = import.meta.env.VITE_SSE_URL || '/api/stream/logs'
+export function getAnalysisJob(id: number) {
+  return request<AnalysisJob>(`/analysis/jobs/${id}`)
+}
+
+// Polls a background analysis until it finishes; the request that queued it returns at once
+export async function waitForAnalysisJob<T extends IncidentAnalyzeResponse | LogSelectionAnalyzeResponse>(
+  job: AnalysisJob,
+  intervalMs = 1000
+): Promise<T> {
+  let current = job
+  while (current.status === 'queued' || current.status === 'running') {
+    await new Promise((resolve) => setTimeout(resolve, intervalMs))
+    current = await getAnalysisJob(current.id)
+  }
+  if (current.status === 'failed' || !current.result) {
+    throw new Error(current.error || 'Analysis failed')
+  }
+  return current.result as T
+}
+
+export async function streamIncidentAnalysis(
+  id: number,
+  onPartial: (summary: string) => void,
+  force = false
+): Promise<IncidentAnalyzeResponse> {
+  const res = await fetch(`${API_BASE}/incidents/${id}/analyze${toQueryString({ stream: true, force: force || undefined })}`, {
+    method: 'POST'
+  })
+  if (!res.ok || !res.body) {
+    const message = await res.text()
+    throw new Error(message || 'Request failed')
+  }
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary >= 0) {
+      const frame = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      boundary = buffer.indexOf('\n\n')
+      const event = frame.match(/^event: (.*)$/m)?.[1]
+      const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] ?? 'null')
+      if (event === 'partial') onPartial(data.summary)
+      else if (event === 'result') return data
+      else if (event === 'error') throw new Error(data?.detail || 'Analysis failed')
+    }
+  }
+  throw new Error('Analysis stream ended without a result')
+}
+
+export function createLogStream(onMessage: (log: LogEntry) => void, options: { batchMs?: number } = {}) {
+  const url = `${import.meta.env.VITE_SSE_URL || '/api/stream/logs'}${toQueryString({ batch_ms: options.batchMs || undefined })}`
+  // EventSource resends the last frame id as Last-Event-ID on reconnect, so the server replays the gap
   const source = new EventSource(url)
   source.onmessage = (event) => {
     try {
       const data = JSON.parse(event.data)
-      onMessage(data)
+      if (Array.isArray(data)) {
+        data.forEach(onMessage)
+      } else {
+        onMessage(data)
+      }
     } catch {
       // ignore
     }
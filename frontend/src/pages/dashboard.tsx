@@ -3,7 +3,7 @@ import { useQuery } from '@tanstack/react-query'
 import { motion } from 'framer-motion'
 import { AlertCircle, Bug, Activity, ShieldAlert } from 'lucide-react'
 
-import { getAllIncidents, getAllLogs } from '../lib/api'
+import { getAllIncidents, getAllLogs, getLogRollups } from '../lib/api'
 import { useUiStore } from '../lib/store'
 import { getTimeBounds, parseApiDate } from '../lib/time'
 import { KpiCard } from '../components/kpi-card'
@@ -27,16 +27,18 @@ export function DashboardPage() {
   const normalizedSearch = search.trim()
   const { start, end } = getTimeBounds(timeRange, customStart, customEnd)
 
+  // Per-minute rollups answer every chart unless a search needs the raw lines
   const logsQuery = useQuery({
     queryKey: ['dashboard-logs', selectedService, timeRange, customStart, customEnd, normalizedSearch],
-    queryFn: () =>
-      getAllLogs({
-        service: selectedService !== 'all' ? selectedService : undefined,
-        q: normalizedSearch || undefined,
-        start,
-        end,
-        limit: 500,
-      }),
+    queryFn: async () => {
+      const service = selectedService !== 'all' ? selectedService : undefined
+      if (!normalizedSearch) {
+        const rollups = await getLogRollups({ service, start, end })
+        return rollups.map((rollup) => ({ timestamp: rollup.bucket, service: rollup.service, level: rollup.level, count: rollup.count }))
+      }
+      const logs = await getAllLogs({ service, q: normalizedSearch, start, end, limit: 500 })
+      return logs.map((log) => ({ timestamp: log.timestamp, service: log.service, level: log.level, count: 1 }))
+    },
     refetchInterval: 10000,
   })
 
@@ -64,13 +66,14 @@ export function DashboardPage() {
   const incidents = incidentsQuery.data || []
 
   const metrics = useMemo(() => {
-    const errors = logs.filter((log) => log.level === 'ERROR').length
-    const warnings = logs.filter((log) => log.level === 'WARN').length
+    const total = logs.reduce((sum, log) => sum + log.count, 0)
+    const errors = logs.filter((log) => log.level === 'ERROR').reduce((sum, log) => sum + log.count, 0)
+    const warnings = logs.filter((log) => log.level === 'WARN').reduce((sum, log) => sum + log.count, 0)
     const active = incidents.filter((incident) => incident.status === 'open').length
-    const errorRate = logs.length ? Math.round((errors / logs.length) * 100) : 0
+    const errorRate = total ? Math.round((errors / total) * 100) : 0
 
     return {
-      total: logs.length,
+      total,
       errors,
       warnings,
       active,
@@ -104,8 +107,8 @@ export function DashboardPage() {
         buckets[key] = { time: key, total: 0, errors: 0 }
       }
 
-      buckets[key].total += 1
-      if (log.level === 'ERROR') buckets[key].errors += 1
+      buckets[key].total += log.count
+      if (log.level === 'ERROR') buckets[key].errors += log.count
     })
 
     return Object.values(buckets)
@@ -128,7 +131,7 @@ export function DashboardPage() {
       if (!map[log.service]) {
         map[log.service] = { service: log.service, total: 0 }
       }
-      map[log.service].total += 1
+      map[log.service].total += log.count
     })
 
     return Object.values(map).sort((a, b) => b.total - a.total)
@@ -139,7 +142,7 @@ export function DashboardPage() {
 
     logs.forEach((log) => {
       const level = (log.level || 'INFO').toUpperCase()
-      map[level] = (map[level] || 0) + 1
+      map[level] = (map[level] || 0) + log.count
     })
 
     return Object.entries(map).map(([level, value]) => ({ level, value }))
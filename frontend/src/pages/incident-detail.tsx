@@ -3,7 +3,7 @@ import { useMutation, useQuery, useQueryClient } from '@tanstack/react-query'
 import { useParams } from '@tanstack/react-router'
 import { toast } from 'sonner'
 
-import { analyzeIncident, getIncident, getLogs } from '../lib/api'
+import { getIncident, getLogs, startIncidentAnalysis, waitForAnalysisJob } from '../lib/api'
 import { IncidentDetail } from '../components/incident-detail'
 import { parseApiDate } from '../lib/time'
 
@@ -25,7 +25,7 @@ export function IncidentDetailPage() {
   })
 
   const analyzeMutation = useMutation({
-    mutationFn: () => analyzeIncident(incidentId),
+    mutationFn: async () => waitForAnalysisJob(await startIncidentAnalysis(incidentId)),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['incident', incidentId] })
       queryClient.invalidateQueries({ queryKey: ['incidents'] })
@@ -9,7 +9,14 @@ import { oneDark } from '@codemirror/theme-one-dark'
 import { highlightSelectionMatches, SearchQuery, setSearchQuery, searchKeymap } from '@codemirror/search'
 import { keymap } from '@codemirror/view'
 
-import { analyzeSelectedLogs, createLogStream, getLogs, type LogEntry } from '../lib/api'
+import {
+  createLogStream,
+  getLogs,
+  startLogAnalysis,
+  waitForAnalysisJob,
+  type LogEntry,
+  type LogSelectionAnalyzeResponse,
+} from '../lib/api'
 import { useUiStore } from '../lib/store'
 import { formatDateTime, getTimeBounds, parseApiDate } from '../lib/time'
 import { AiAnalysisCard } from '../components/ai-analysis-card'
@@ -172,7 +179,7 @@ export function LogsPage() {
   )
 
   const analyzeSelectionMutation = useMutation({
-    mutationFn: () => analyzeSelectedLogs(selectedIds),
+    mutationFn: async () => waitForAnalysisJob<LogSelectionAnalyzeResponse>(await startLogAnalysis(selectedIds)),
     onSuccess: () => {
       setAnalysisOpen(true)
       toast.success('Selected logs analyzed')